@@ -0,0 +1,271 @@
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.transaction import message_key
+from app.parsers.base import Transaction, TransactionType
+
+logger = logging.getLogger(__name__)
+
+# Tipos que cuentan como gasto para los presupuestos (el abono es ingreso)
+SPENDING_TYPES = frozenset({TransactionType.COMPRA, TransactionType.GIRO, TransactionType.TRANSFERENCIA})
+
+# Fracciones del límite en que se avisa (80% y 100%)
+DEFAULT_THRESHOLDS = (0.8, 1.0)
+
+# (usuario, mes "YYYY-MM", categoría, tipo)
+AggregateKey = Tuple[str, str, Optional[str], TransactionType]
+
+
+@dataclass
+class Totals:
+    total: int = 0
+    count: int = 0
+
+
+@dataclass
+class Budget:
+    """Límite mensual de gasto; category None = gasto total del mes"""
+    user_id: str
+    category: Optional[str]
+    limit: int
+    thresholds: Tuple[float, ...] = DEFAULT_THRESHOLDS
+
+
+@dataclass
+class BudgetAlert:
+    """Un gasto cruzó un umbral del presupuesto"""
+    user_id: str
+    month: str
+    category: Optional[str]
+    limit: int
+    spent: int
+    threshold: float
+
+
+@dataclass
+class _Entry:
+    """Aporte de una transacción a los agregados (para poder revertirlo)"""
+    key: AggregateKey
+    amount: int
+
+
+def month_of(date: datetime) -> str:
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+def source_key(account: str, transaction: Transaction) -> str:
+    """Clave de una transacción por su email de origen
+
+    (cuenta, message_key), igual que DEDUP_COLUMNS de
+    app/models/transaction.py: no usa el UID, así un cambio de UIDVALIDITY
+    no duplica totales ni repite alertas.
+    """
+    return f"{account.lower()}/{message_key(transaction)}"
+
+
+class AggregateStore:
+    """Totales por (usuario, mes, categoría, tipo) actualizados con cada transacción
+
+    En vez de recalcular desde todas las transacciones en cada request del
+    dashboard, cada transacción nueva suma su monto (add), un cambio de
+    categoría mueve el monto (recategorize) y un borrado lo resta (remove).
+    El gasto por (usuario, mes, categoría) se mantiene aparte, así evaluar
+    los presupuestos es O(1) por transacción y las alertas salen en el
+    momento.
+
+    Las transacciones se identifican por `key`: al sincronizar una cuenta,
+    source_key(cuenta, transacción); sin key, message_key (Message-ID o
+    hash del contenido). El email_id no sirve de clave: es un UID que se
+    repite entre buzones y cambia con el UIDVALIDITY. Volver a agregar una
+    clave ya vista la reemplaza.
+    """
+
+    def __init__(self, on_alert: Optional[Callable[[BudgetAlert], None]] = None):
+        self.on_alert = on_alert
+        self._totals: Dict[AggregateKey, Totals] = defaultdict(Totals)
+        # (usuario, mes) -> claves con movimientos, para las consultas del mes
+        self._months: Dict[Tuple[str, str], set] = defaultdict(set)
+        # (usuario, mes, categoría) -> gasto; categoría None = todo el mes
+        self._spent: Dict[Tuple[str, str, Optional[str]], int] = defaultdict(int)
+        self._budgets: Dict[Tuple[str, Optional[str]], Budget] = {}
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # Actualizaciones
+    # =========================================================================
+
+    def add(self, user_id: str, transaction: Transaction, key: Optional[str] = None) -> List[BudgetAlert]:
+        """Suma una transacción nueva (o reemplaza la que tenía la misma clave)"""
+        key = key or message_key(transaction)
+        amount = int(transaction.amount)
+        aggregate_key = (user_id, month_of(transaction.date), transaction.category, transaction.type)
+        with self._lock:
+            previous = self._entries.pop((user_id, key), None)
+            entry = _Entry(aggregate_key, amount)
+            self._entries[(user_id, key)] = entry
+            alerts = self._replace(previous, entry)
+        self._notify(alerts)
+        return alerts
+
+    def add_many(
+        self,
+        user_id: str,
+        transactions: Iterable[Transaction],
+        key: Optional[Callable[[Transaction], str]] = None
+    ) -> List[BudgetAlert]:
+        """Suma varias transacciones; `key` calcula la clave de cada una (default: message_key)"""
+        alerts = []
+        for transaction in transactions:
+            alerts.extend(self.add(user_id, transaction, key(transaction) if key else None))
+        return alerts
+
+    def recategorize(self, user_id: str, key: str, category: Optional[str]) -> List[BudgetAlert]:
+        """Mueve el monto de una transacción a otra categoría"""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                raise KeyError(f"Transacción desconocida: {key}")
+            previous = _Entry(entry.key, entry.amount)
+            user, month, _, tx_type = entry.key
+            entry.key = (user, month, category, tx_type)
+            alerts = self._replace(previous, entry)
+        self._notify(alerts)
+        return alerts
+
+    def remove(self, user_id: str, key: str) -> bool:
+        """Resta una transacción borrada; retorna False si no estaba"""
+        with self._lock:
+            entry = self._entries.pop((user_id, key), None)
+            if entry is None:
+                return False
+            self._apply(entry, -1)
+            return True
+
+    # =========================================================================
+    # Presupuestos
+    # =========================================================================
+
+    def set_budget(
+        self,
+        user_id: str,
+        category: Optional[str],
+        limit: int,
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS
+    ) -> Budget:
+        """Define el límite mensual de una categoría (None = gasto total)"""
+        if limit <= 0:
+            raise ValueError("El límite debe ser positivo")
+        budget = Budget(user_id, category, limit, tuple(sorted(thresholds)))
+        with self._lock:
+            self._budgets[(user_id, category)] = budget
+        return budget
+
+    def remove_budget(self, user_id: str, category: Optional[str]) -> None:
+        with self._lock:
+            self._budgets.pop((user_id, category), None)
+
+    # =========================================================================
+    # Consultas
+    # =========================================================================
+
+    def spent(self, user_id: str, month: str, category: Optional[str] = None) -> int:
+        """Gasto del mes en la categoría (None = gasto total del mes), O(1)"""
+        return self._spent.get((user_id, month, category), 0)
+
+    def totals(self, user_id: str, month: str, type: Optional[TransactionType] = None) -> Totals:
+        """Total y cantidad del mes, opcionalmente de un tipo"""
+        result = Totals()
+        with self._lock:
+            for key in self._months.get((user_id, month), ()):
+                if type is not None and key[3] != type:
+                    continue
+                totals = self._totals[key]
+                result.total += totals.total
+                result.count += totals.count
+        return result
+
+    def by_category(self, user_id: str, month: str, types: Iterable[TransactionType] = SPENDING_TYPES) -> Dict[Optional[str], int]:
+        """Total del mes por categoría (por defecto, solo gasto)"""
+        types = frozenset(types)
+        result: Dict[Optional[str], int] = defaultdict(int)
+        with self._lock:
+            for key in self._months.get((user_id, month), ()):
+                if key[3] in types:
+                    result[key[2]] += self._totals[key].total
+        return dict(result)
+
+    # =========================================================================
+    # Internos
+    # =========================================================================
+
+    def _replace(self, previous: Optional[_Entry], entry: _Entry) -> List[BudgetAlert]:
+        """Revierte `previous` (si hay) y suma `entry`
+
+        Los umbrales se evalúan contra el gasto de antes del reemplazo: un
+        re-sync idéntico o un cambio de categoría no repiten las alertas
+        que ya se habían cruzado.
+        """
+        before = {spent_key: self._spent.get(spent_key, 0) for spent_key in self._spent_keys(entry)}
+        if previous:
+            self._apply(previous, -1)
+        return self._apply(entry, 1, before)
+
+    def _spent_keys(self, entry: _Entry) -> List[Tuple[str, str, Optional[str]]]:
+        """Gastos a los que aporta la entrada: su categoría y el total del mes (scope None)"""
+        user_id, month, category, tx_type = entry.key
+        if tx_type not in SPENDING_TYPES:
+            return []
+        scopes = (category, None) if category is not None else (None,)
+        return [(user_id, month, scope) for scope in scopes]
+
+    def _apply(
+        self,
+        entry: _Entry,
+        sign: int,
+        before: Optional[Dict[Tuple[str, str, Optional[str]], int]] = None
+    ) -> List[BudgetAlert]:
+        """Suma (sign=1) o resta (sign=-1) el aporte; retorna las alertas cruzadas
+
+        `before` es el gasto desde el que se evalúan los umbrales (default: el actual).
+        """
+        user_id, month, category, tx_type = entry.key
+        totals = self._totals[entry.key]
+        totals.total += sign * entry.amount
+        totals.count += sign
+        if totals.count:
+            self._months[(user_id, month)].add(entry.key)
+        else:
+            del self._totals[entry.key]
+            self._months[(user_id, month)].discard(entry.key)
+
+        alerts = []
+        for spent_key in self._spent_keys(entry):
+            current = self._spent[spent_key]
+            after = current + sign * entry.amount
+            self._spent[spent_key] = after
+            budget = self._budgets.get((user_id, spent_key[2]))
+            if budget and sign > 0:
+                start = before.get(spent_key, current) if before is not None else current
+                alerts.extend(self._crossed(budget, month, start, after))
+        return alerts
+
+    def _crossed(self, budget: Budget, month: str, before: int, after: int) -> List[BudgetAlert]:
+        return [
+            BudgetAlert(budget.user_id, month, budget.category, budget.limit, after, threshold)
+            for threshold in budget.thresholds
+            if before < budget.limit * threshold <= after
+        ]
+
+    def _notify(self, alerts: List[BudgetAlert]) -> None:
+        if not self.on_alert:
+            return
+        for alert in alerts:
+            try:
+                self.on_alert(alert)
+            except Exception as e:
+                logger.error(f"Error notificando alerta de presupuesto: {e}")
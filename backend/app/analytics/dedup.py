@@ -0,0 +1,151 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.parsers.base import Transaction, TransactionType
+
+# Diferencia máxima entre las fechas de dos notificaciones del mismo movimiento
+DEFAULT_TOLERANCE = timedelta(minutes=5)
+
+DUPLICATE = "duplicate"
+TRANSFER = "transfer"
+
+
+@dataclass
+class DedupMatch:
+    """Coincidencia de una transacción con otra ya indexada"""
+    kind: str
+    index: int
+    other: int
+
+
+@dataclass
+class DedupResult:
+    """Duplicados y transferencias internas de un conjunto de transacciones"""
+    # índice del duplicado -> índice del original
+    duplicates: Dict[int, int] = field(default_factory=dict)
+    # (transferencia realizada, abono recibido) entre cuentas propias
+    transfers: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def internal(self) -> Set[int]:
+        """Índices de las transacciones que son transferencias internas"""
+        return {index for pair in self.transfers for index in pair}
+
+    def unique(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Transacciones sin los duplicados"""
+        return [t for i, t in enumerate(transactions) if i not in self.duplicates]
+
+    def spending(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Transacciones sin duplicados ni transferencias internas (lo que cuenta como gasto o ingreso)"""
+        skipped = self.internal | self.duplicates.keys()
+        return [t for i, t in enumerate(transactions) if i not in skipped]
+
+
+class DedupIndex:
+    """Índice hash + buckets de tiempo para detectar el mismo movimiento dos veces
+
+    Un movimiento puede llegar repetido (email reenviado, dos buzones
+    vinculados) o como par "Transferencia realizada" / "Abono en tu cuenta"
+    entre cuentas propias. Cada transacción se indexa por su clave y por el
+    bucket de `tolerance` de su fecha; una coincidencia solo puede estar en
+    el mismo bucket o en los vecinos, así cada add es O(1) en promedio y un
+    lote completo O(n), sin comparar todos los pares.
+
+    - Duplicado: mismo banco, tipo, cuenta y monto con fechas a menos de
+      `tolerance`. El primero agregado queda como original.
+    - Transferencia interna: una transferencia y un abono del mismo monto,
+      en cuentas distintas, dentro de `tolerance`. Cada abono se empareja
+      con una sola transferencia.
+    """
+
+    def __init__(self, tolerance: timedelta = DEFAULT_TOLERANCE):
+        if tolerance <= timedelta(0):
+            raise ValueError("tolerance debe ser positiva")
+        self.tolerance = tolerance
+        self._width = tolerance.total_seconds()
+        self._count = 0
+        # (clave, bucket) -> [(índice, timestamp, cuenta)]
+        self._movements: Dict[Tuple[Hashable, int], List[Tuple[int, float, Optional[str]]]] = defaultdict(list)
+        # Transferencias y abonos aún sin pareja, por (tipo, monto, bucket)
+        self._unpaired: Dict[Tuple[Hashable, int], List[Tuple[int, float, Optional[str]]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, transaction: Transaction) -> Optional[DedupMatch]:
+        """Indexa la transacción y retorna su coincidencia, si tiene"""
+        index = self._count
+        self._count += 1
+        timestamp = transaction.date.timestamp()
+        bucket = int(timestamp // self._width)
+        account = transaction.last_digits
+        amount = int(transaction.amount)
+
+        key = (transaction.bank, transaction.type, account, amount)
+        original = self._find_duplicate(key, bucket, timestamp)
+        if original is not None:
+            return DedupMatch(DUPLICATE, index, original)
+        self._movements[(key, bucket)].append((index, timestamp, account))
+
+        counterpart = _COUNTERPARTS.get(transaction.type)
+        if counterpart is None:
+            return None
+        partner = self._pop_partner((counterpart, amount), bucket, timestamp, account)
+        if partner is not None:
+            return DedupMatch(TRANSFER, index, partner)
+        self._unpaired[((transaction.type, amount), bucket)].append((index, timestamp, account))
+        return None
+
+    def _find_duplicate(self, key: Hashable, bucket: int, timestamp: float) -> Optional[int]:
+        for index, other_timestamp, _ in self._candidates(self._movements, key, bucket):
+            if abs(other_timestamp - timestamp) <= self._width:
+                return index
+        return None
+
+    def _pop_partner(self, key: Hashable, bucket: int, timestamp: float, account: Optional[str]) -> Optional[int]:
+        """Saca del índice la primera pareja en la ventana y en otra cuenta"""
+        for neighbor in (bucket, bucket - 1, bucket + 1):
+            entries = self._unpaired.get((key, neighbor), [])
+            for position, (index, other_timestamp, other_account) in enumerate(entries):
+                if abs(other_timestamp - timestamp) > self._width:
+                    continue
+                if account is not None and account == other_account:
+                    continue
+                del entries[position]
+                return index
+        return None
+
+    def _candidates(self, table, key: Hashable, bucket: int) -> Iterable[Tuple[int, float, Optional[str]]]:
+        """Entradas del bucket y sus vecinos (las únicas que pueden estar en la ventana)"""
+        for neighbor in (bucket, bucket - 1, bucket + 1):
+            yield from table.get((key, neighbor), ())
+
+
+# Tipo con el que se empareja cada lado de una transferencia interna
+_COUNTERPARTS = {
+    TransactionType.TRANSFERENCIA: TransactionType.ABONO,
+    TransactionType.ABONO: TransactionType.TRANSFERENCIA,
+}
+
+
+def find_duplicates(transactions: Iterable[Transaction], tolerance: timedelta = DEFAULT_TOLERANCE) -> DedupResult:
+    """Detecta duplicados y transferencias internas en un lote (O(n))"""
+    index = DedupIndex(tolerance)
+    result = DedupResult()
+    for transaction in transactions:
+        match = index.add(transaction)
+        if match is None:
+            continue
+        if match.kind == DUPLICATE:
+            result.duplicates[match.index] = match.other
+        else:
+            result.transfers.append(_transfer_pair(match, transaction))
+    return result
+
+
+def _transfer_pair(match: DedupMatch, transaction: Transaction) -> Tuple[int, int]:
+    if transaction.type == TransactionType.TRANSFERENCIA:
+        return (match.index, match.other)
+    return (match.other, match.index)
@@ -0,0 +1,238 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.parsers.base import Transaction
+
+# Columnas de texto codificadas como diccionario (valor -> código entero)
+CATEGORICAL_COLUMNS = ('type', 'bank', 'merchant', 'account', 'category')
+
+# Atributo de Transaction de cada columna categórica
+TRANSACTION_ATTRIBUTES = {
+    'type': 'type',
+    'bank': 'bank',
+    'merchant': 'merchant',
+    'account': 'last_digits',
+    'category': 'category',
+}
+
+# Código de los valores None
+MISSING = -1
+
+DateLike = Union[datetime, np.datetime64, str]
+
+
+@dataclass
+class Group:
+    """Total y cantidad de transacciones de un grupo"""
+    key: object
+    total: int
+    count: int
+
+
+class Dictionary:
+    """Valores distintos de una columna categórica; el código es la posición"""
+
+    def __init__(self, values: Sequence = ()):
+        self.values: List = list(values)
+        self._codes: Dict = {value: code for code, value in enumerate(self.values)}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value) -> int:
+        """Código del valor, agregándolo si es nuevo"""
+        if value is None:
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def code(self, value) -> Optional[int]:
+        """Código del valor sin agregarlo (None si no existe)"""
+        if value is None:
+            return MISSING
+        return self._codes.get(value)
+
+    def decode(self, code: int):
+        return None if code == MISSING else self.values[code]
+
+
+class TransactionFrame:
+    """Transacciones en columnas NumPy para agregaciones vectorizadas
+
+    Los montos van en int64, las fechas en datetime64[s] (más el mes como
+    entero, porque convertir a datetime64[M] es caro) y type, bank,
+    merchant, account (últimos 4 dígitos) y category como códigos enteros
+    sobre un Dictionary por columna. Los filtros retornan un frame nuevo que
+    comparte los diccionarios; las agregaciones usan bincount, sin loops de
+    Python por transacción.
+    """
+
+    def __init__(
+        self,
+        amount: np.ndarray,
+        date: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        dictionaries: Dict[str, Dictionary],
+        month: Optional[np.ndarray] = None
+    ):
+        self.amount = amount
+        self.date = date
+        self.codes = codes
+        self.dictionaries = dictionaries
+        # Meses desde 1970-01
+        self.month = date.astype('datetime64[M]').astype(np.int32) if month is None else month
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> 'TransactionFrame':
+        transactions = list(transactions)
+        dictionaries = {column: Dictionary() for column in CATEGORICAL_COLUMNS}
+        codes = {}
+        for column in CATEGORICAL_COLUMNS:
+            attribute = TRANSACTION_ATTRIBUTES[column]
+            encode = dictionaries[column].encode
+            codes[column] = np.fromiter(
+                (encode(getattr(t, attribute)) for t in transactions),
+                dtype=np.int32, count=len(transactions)
+            )
+        amount = np.fromiter((int(t.amount) for t in transactions), dtype=np.int64, count=len(transactions))
+        date = np.array([t.date for t in transactions], dtype='datetime64[s]')
+        return cls(amount, date, codes, dictionaries)
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def labels(self, column: str) -> List:
+        """Valores de la columna por fila (decodificados)"""
+        dictionary = self.dictionaries[column]
+        return [dictionary.decode(code) for code in self.codes[column].tolist()]
+
+    # =========================================================================
+    # Filtros
+    # =========================================================================
+
+    def filter(self, mask: np.ndarray) -> 'TransactionFrame':
+        """Frame con las filas donde mask es True"""
+        return TransactionFrame(
+            self.amount[mask],
+            self.date[mask],
+            {column: codes[mask] for column, codes in self.codes.items()},
+            self.dictionaries,
+            self.month[mask]
+        )
+
+    def mask(
+        self,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None,
+        min_amount: Optional[int] = None,
+        max_amount: Optional[int] = None,
+        **values
+    ) -> np.ndarray:
+        """
+        Máscara booleana de las filas que cumplen todas las condiciones
+
+        Args:
+            start: Fecha desde (inclusive)
+            end: Fecha hasta (exclusive)
+            min_amount: Monto mínimo (inclusive)
+            max_amount: Monto máximo (inclusive)
+            **values: Columna categórica -> valor o lista de valores
+                (ej: type=TransactionType.COMPRA, merchant=["LIDER", "JUMBO"])
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.date >= np.datetime64(start, 's')
+        if end is not None:
+            mask &= self.date < np.datetime64(end, 's')
+        if min_amount is not None:
+            mask &= self.amount >= min_amount
+        if max_amount is not None:
+            mask &= self.amount <= max_amount
+        for column, value in values.items():
+            if column not in self.dictionaries:
+                raise ValueError(f"Columna desconocida: {column}")
+            wanted = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            dictionary = self.dictionaries[column]
+            # Tabla código -> bool: más rápido que np.isin para pocos valores
+            table = np.zeros(len(dictionary) + 1, dtype=bool)
+            for code in map(dictionary.code, wanted):
+                if code is not None:
+                    table[code - MISSING] = True
+            mask &= table[self.codes[column] - MISSING]
+        return mask
+
+    def where(self, **conditions) -> 'TransactionFrame':
+        """Atajo de filter(mask(...))"""
+        return self.filter(self.mask(**conditions))
+
+    # =========================================================================
+    # Agregaciones
+    # =========================================================================
+
+    def total(self) -> int:
+        return int(self.amount.sum())
+
+    def group_by(self, column: str) -> List[Group]:
+        """Total y cantidad por valor de la columna, de mayor a menor total"""
+        dictionary = self.dictionaries[column]
+        totals, counts = self._bincount(self.codes[column] - MISSING, len(dictionary) + 1)
+        slots = np.flatnonzero(counts)
+        slots = slots[np.argsort(-totals[slots], kind='stable')]
+        keys = [None, *dictionary.values]
+        return [
+            Group(keys[slot], total, count)
+            for slot, total, count in zip(slots.tolist(), totals[slots].tolist(), counts[slots].tolist())
+        ]
+
+    def monthly(self, column: Optional[str] = None) -> List[Group]:
+        """
+        Total y cantidad por mes ("YYYY-MM"), en orden cronológico
+
+        Con `column` agrupa por (mes, valor de la columna), ej:
+        monthly('category') para el gasto mensual por categoría.
+        """
+        if not len(self):
+            return []
+        first = int(self.month.min())
+        n_months = int(self.month.max()) - first + 1
+        if column is None:
+            width = 1
+            slots = self.month - first
+            keys = None
+        else:
+            dictionary = self.dictionaries[column]
+            width = len(dictionary) + 1
+            slots = (self.month - first) * width + (self.codes[column] - MISSING)
+            keys = [None, *dictionary.values]
+        totals, counts = self._bincount(slots, n_months * width)
+
+        found = np.flatnonzero(counts)
+        month_labels = np.datetime_as_string(
+            (found // width + first).astype('datetime64[M]'), unit='M'
+        ).tolist()
+        if keys is not None:
+            month_labels = list(zip(month_labels, [keys[code] for code in (found % width).tolist()]))
+        return [
+            Group(label, total, count)
+            for label, total, count in zip(month_labels, totals[found].tolist(), counts[found].tolist())
+        ]
+
+    def by_category(self) -> List[Group]:
+        return self.group_by('category')
+
+    def _bincount(self, slots: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Suma de montos y cantidad por slot
+
+        bincount suma en float64: exacto mientras los totales no pasen 2**53
+        pesos, holgado para gastos personales.
+        """
+        counts = np.bincount(slots, minlength=size)
+        totals = np.rint(np.bincount(slots, weights=self.amount, minlength=size)).astype(np.int64)
+        return totals, counts
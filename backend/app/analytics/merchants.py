@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.parsers.base import Transaction
+
+# Procesadores de pago que anteponen su nombre al del comercio ("DP *IKEA.COM")
+PROCESSOR_PREFIXES = frozenset({'DP', 'MERPAGO', 'MP', 'PAYU', 'PAYPAL', 'SQ', 'SUMUP', 'FLOW', 'KHIPU'})
+
+# Palabras que marcan una sucursal al final del nombre ("LIDER EXPRESS
+# PROVIDENCIA 123", "HIPER VINA CENTRO")
+BRANCH_WORDS = frozenset({'CENTRO', 'MALL', 'SUC', 'SUCURSAL', 'LOCAL', 'TIENDA', 'EXPRESS'})
+
+# Comunas y ciudades que pueden seguir al nombre del comercio. Solo se
+# quitan como frase completa al final: palabras sueltas como LA, EL, ALTO o
+# PUERTO también forman parte de nombres de comercios ("CAFE EL ALTO")
+LOCALITIES = frozenset({
+    'CL', 'CHILE', 'STGO', 'SANTIAGO', 'VINA', 'VINA DEL MAR', 'VALPARAISO', 'QUILPUE',
+    'CONCEPCION', 'PROVIDENCIA', 'LAS CONDES', 'NUNOA', 'MAIPU', 'LA FLORIDA', 'PUENTE ALTO',
+    'RANCAGUA', 'TEMUCO', 'ANTOFAGASTA', 'LA SERENA', 'VALDIVIA', 'PUERTO MONTT', 'ARICA',
+    'IQUIQUE', 'TALCA', 'CHILLAN', 'VITACURA', 'RECOLETA', 'INDEPENDENCIA', 'ESTACION CENTRAL',
+    'LA REINA', 'LO BARNECHEA', 'SAN MIGUEL',
+})
+# Largo máximo (en palabras) de una localidad
+_LOCALITY_WORDS = max(len(locality.split(' ')) for locality in LOCALITIES)
+
+NON_WORD_RE = re.compile(r"[^A-Z0-9&.]+")
+DIGITS_RE = re.compile(r'^\d+$')
+HAS_DIGIT_RE = re.compile(r'\d')
+
+# Máximo de nombres crudos recordados en el LRU de resoluciones
+DEFAULT_CACHE_SIZE = 4096
+
+
+def normalize_merchant(name: str) -> str:
+    """
+    Forma canónica del nombre de un comercio
+
+    Mayúsculas, sin tildes ni puntuación, sin el prefijo del procesador de
+    pago, sin números de local y sin la sucursal o localidad del final:
+    "Hiper Viña Centro" -> "HIPER", "DP     *IKEA.COM" -> "IKEA.COM",
+    "UBER *TRIP" -> "UBER TRIP", "AMAZON *MK12AB" -> "AMAZON".
+    """
+    if not name:
+        return ""
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(char for char in name if not unicodedata.combining(char)).upper()
+
+    if '*' in name:
+        prefix, _, rest = name.partition('*')
+        if prefix.strip() in PROCESSOR_PREFIXES:
+            # "DP *IKEA" es IKEA pagado por dLocal
+            name = rest
+        elif HAS_DIGIT_RE.search(rest):
+            # "AMAZON *MK12AB": lo que sigue es un número de orden
+            name = prefix
+        else:
+            # "UBER *TRIP" y "UBER *EATS" son servicios distintos
+            name = f"{prefix} {rest}"
+
+    tokens = [token.strip('.') for token in NON_WORD_RE.split(name)]
+    tokens = [token for token in tokens if token]
+    while len(tokens) > 1:
+        if tokens[-1] in BRANCH_WORDS or DIGITS_RE.match(tokens[-1]):
+            tokens.pop()
+            continue
+        size = _trailing_locality(tokens)
+        if not size:
+            break
+        del tokens[-size:]
+    return ' '.join(tokens)
+
+
+def _trailing_locality(tokens: List[str]) -> int:
+    """Palabras de la localidad con que terminan los tokens (0 si no hay), dejando al menos una"""
+    for size in range(min(_LOCALITY_WORDS, len(tokens) - 1), 0, -1):
+        if ' '.join(tokens[-size:]) in LOCALITIES:
+            return size
+    return 0
+
+
+class MerchantCatalog:
+    """Comercios canónicos y la categoría que el usuario les asignó
+
+    Un nombre crudo se resuelve a un comercio solo si su forma normalizada
+    es exactamente la de un nombre registrado ("HIPER LIDER VINA" ->
+    "HIPER LIDER"): la primera palabra sola no basta, "UBER EATS" no es
+    "UBER TRIP". Las resoluciones se recuerdan en un LRU por nombre crudo,
+    así los comercios frecuentes no se vuelven a normalizar.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        # Nombre normalizado -> id canónico
+        self._merchants: Dict[str, str] = {}
+        self._categories: Dict[str, str] = {}
+        self._cache: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def register(self, name: str, merchant_id: Optional[str] = None, category: Optional[str] = None) -> str:
+        """
+        Registra un comercio; retorna su id canónico
+
+        Args:
+            name: Nombre del comercio, se normaliza
+            merchant_id: Id canónico (default: el nombre normalizado)
+            category: Categoría a asignar a sus transacciones
+        """
+        normalized = normalize_merchant(name)
+        if not normalized:
+            raise ValueError(f"Nombre de comercio vacío: {name!r}")
+        merchant_id = merchant_id or normalized
+        self._merchants[normalized] = merchant_id
+        if category:
+            self._categories[merchant_id] = category
+        self._cache.clear()
+        return merchant_id
+
+    def learn(self, name: str, category: str) -> str:
+        """Guarda la categoría que eligió el usuario para un comercio"""
+        merchant_id = self.resolve(name) or self.register(name)
+        self._categories[merchant_id] = category
+        return merchant_id
+
+    def resolve(self, name: Optional[str]) -> Optional[str]:
+        """Id canónico del comercio, o None si no está registrado"""
+        if not name:
+            return None
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+
+        merchant_id = self._merchants.get(normalize_merchant(name))
+
+        self._cache[name] = merchant_id
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return merchant_id
+
+    def category(self, name: Optional[str]) -> Optional[str]:
+        """Categoría del comercio, o None si hay que preguntarle al usuario"""
+        merchant_id = self.resolve(name)
+        return self._categories.get(merchant_id) if merchant_id else None
+
+    def categorize(self, transactions: Iterable[Transaction]) -> List[Transaction]:
+        """Asigna la categoría a las transacciones sin categoría; retorna las que quedan pendientes"""
+        pending = []
+        for transaction in transactions:
+            if transaction.category:
+                continue
+            transaction.category = self.category(transaction.merchant)
+            if transaction.category is None:
+                pending.append(transaction)
+        return pending
+
+    def decisions(self) -> List[Tuple[str, str]]:
+        """(comercio, categoría) guardados, para persistirlos"""
+        return sorted(self._categories.items())
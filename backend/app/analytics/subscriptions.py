@@ -0,0 +1,169 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.analytics.merchants import normalize_merchant
+from app.parsers.base import Transaction, TransactionType
+
+SECONDS_PER_DAY = 86400.0
+
+# Rango de días entre cobros de cada periodicidad
+PERIODS = (
+    ('semanal', 5.0, 9.0),
+    ('mensual', 26.0, 35.0),
+    ('anual', 350.0, 380.0),
+)
+
+
+@dataclass
+class Subscription:
+    """Cobro periódico detectado en un comercio"""
+    merchant: str
+    period: str
+    interval_days: float
+    amount: int
+    count: int
+    last_date: datetime
+
+    @property
+    def next_date(self) -> datetime:
+        """Fecha estimada del próximo cobro"""
+        return self.last_date + timedelta(days=self.interval_days)
+
+
+class SubscriptionDetector:
+    """Detecta suscripciones a partir de las compras de un usuario
+
+    Agrupa por comercio normalizado, ordena por fecha y mira los intervalos
+    entre cobros consecutivos: es suscripción si la mediana del intervalo
+    cae en una periodicidad conocida (PERIODS) y la mayoría de los
+    intervalos y montos están cerca de sus medianas. Todo se calcula con
+    operaciones vectorizadas sobre arrays ordenados, O(n log n), sin
+    comparar pares de transacciones.
+
+    update() es incremental: solo vuelve a evaluar los comercios que
+    recibieron transacciones nuevas.
+    """
+
+    def __init__(
+        self,
+        min_occurrences: int = 3,
+        amount_tolerance: float = 0.15,
+        interval_tolerance: float = 0.2,
+        regularity: float = 0.75,
+        types: Iterable[TransactionType] = (TransactionType.COMPRA,)
+    ):
+        """
+        Args:
+            min_occurrences: Cobros mínimos para considerar un comercio
+            amount_tolerance: Diferencia relativa aceptada con el monto mediano
+            interval_tolerance: Diferencia relativa aceptada con el intervalo mediano
+            regularity: Fracción mínima de montos e intervalos dentro de tolerancia
+            types: Tipos de transacción que pueden ser suscripciones
+        """
+        self.min_occurrences = min_occurrences
+        self.amount_tolerance = amount_tolerance
+        self.interval_tolerance = interval_tolerance
+        self.regularity = regularity
+        self.types = frozenset(types)
+        # Historial por comercio normalizado: (timestamp, monto)
+        self._history: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self.subscriptions: Dict[str, Subscription] = {}
+
+    def update(self, transactions: Iterable[Transaction]) -> List[Subscription]:
+        """Agrega transacciones nuevas; retorna las suscripciones de los comercios afectados"""
+        touched = set()
+        # Los nombres crudos se repiten mucho: normalizar cada uno una vez
+        normalized: Dict[str, str] = {}
+        for transaction in transactions:
+            if transaction.type not in self.types:
+                continue
+            name = transaction.merchant or ""
+            merchant = normalized.get(name)
+            if merchant is None:
+                merchant = normalized[name] = normalize_merchant(name)
+            if not merchant:
+                continue
+            self._history[merchant].append((transaction.date.timestamp(), int(transaction.amount)))
+            touched.add(merchant)
+        if not touched:
+            return []
+
+        merchants = sorted(touched)
+        for merchant in merchants:
+            self.subscriptions.pop(merchant, None)
+        found = self._detect(merchants)
+        for subscription in found:
+            self.subscriptions[subscription.merchant] = subscription
+        return found
+
+    def _detect(self, merchants: List[str]) -> List[Subscription]:
+        histories = [self._history[merchant] for merchant in merchants]
+        sizes = np.array([len(history) for history in histories])
+        groups = np.repeat(np.arange(len(merchants)), sizes)
+        flat = np.array([entry for history in histories for entry in history], dtype=np.float64)
+        timestamps, amounts = flat[:, 0], flat[:, 1]
+
+        # Ordenar por (comercio, fecha): O(n log n)
+        order = np.lexsort((timestamps, groups))
+        groups, timestamps, amounts = groups[order], timestamps[order], amounts[order]
+
+        # Intervalos entre cobros consecutivos del mismo comercio
+        same = groups[1:] == groups[:-1]
+        gaps = np.diff(timestamps)[same] / SECONDS_PER_DAY
+        gap_groups = groups[1:][same]
+
+        n_groups = len(merchants)
+        median_gap = _group_median(gaps, gap_groups, n_groups)
+        median_amount = _group_median(amounts, groups, n_groups)
+
+        regular_gaps = np.abs(gaps - median_gap[gap_groups]) <= self.interval_tolerance * median_gap[gap_groups]
+        regular_amounts = np.abs(amounts - median_amount[groups]) <= self.amount_tolerance * median_amount[groups]
+        gap_counts = np.bincount(gap_groups, minlength=n_groups)
+        gap_ratio = np.bincount(gap_groups, weights=regular_gaps, minlength=n_groups) / np.maximum(gap_counts, 1)
+        amount_ratio = np.bincount(groups, weights=regular_amounts, minlength=n_groups) / sizes
+
+        period_index = np.full(n_groups, -1)
+        for i, (_, low, high) in enumerate(PERIODS):
+            period_index[(median_gap >= low) & (median_gap <= high)] = i
+
+        candidates = (
+            (sizes >= self.min_occurrences)
+            & (period_index >= 0)
+            & (gap_ratio >= self.regularity)
+            & (amount_ratio >= self.regularity)
+        )
+        # Último cobro de cada comercio: el final de su tramo ordenado
+        last = np.cumsum(sizes) - 1
+
+        return [
+            Subscription(
+                merchant=merchants[group],
+                period=PERIODS[period_index[group]][0],
+                interval_days=round(float(median_gap[group]), 1),
+                amount=int(median_amount[group]),
+                count=int(sizes[group]),
+                last_date=datetime.fromtimestamp(timestamps[last[group]]),
+            )
+            for group in np.flatnonzero(candidates).tolist()
+        ]
+
+
+def detect_subscriptions(transactions: Iterable[Transaction], **options) -> List[Subscription]:
+    """Suscripciones de un historial completo (ver SubscriptionDetector)"""
+    return SubscriptionDetector(**options).update(transactions)
+
+
+def _group_median(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Mediana (inferior) de values por grupo; NaN para los grupos vacíos"""
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    present = counts > 0
+    medians[present] = sorted_values[starts[present] + (counts[present] - 1) // 2]
+    return medians
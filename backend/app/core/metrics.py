@@ -0,0 +1,356 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Content-Type del formato de texto de Prometheus (para servir to_prometheus())
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites (en segundos) de los buckets de duración de las etapas: desde
+# decodificar un email (~0.5 ms) hasta un FETCH de un lote grande
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+
+class MetricsRegistry:
+    """Registro en proceso de contadores e histogramas
+
+    Deshabilitado por defecto: mientras `enabled` es False, inc/observe y
+    los hooks de timing retornan sin tomar tiempos ni locks, así la
+    instrumentación del pipeline cuesta una comparación por llamada.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, 'Metric'] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> 'Counter':
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = STAGE_BUCKETS
+    ) -> 'Histogram':
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def get(self, name: str) -> Optional['Metric']:
+        return self._metrics.get(name)
+
+    def reset(self) -> None:
+        """Borra los valores de todas las métricas (las definiciones se mantienen)"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Dict[LabelKey, Any]]:
+        """Copia de los valores actuales: {métrica: {labels: valor}}
+
+        Para contadores el valor es un número; para histogramas, un dict con
+        count, sum y buckets (cantidad acumulada por límite superior).
+        """
+        return {name: metric.values() for name, metric in list(self._metrics.items())}
+
+    def to_prometheus(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        lines = []
+        for metric in sorted(self._metrics.values(), key=lambda metric: metric.name):
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: 'Metric') -> Any:
+        with self._lock:
+            current = self._metrics.get(metric.name)
+            if current is not None:
+                if type(current) is not type(metric) or current.labelnames != metric.labelnames:
+                    raise ValueError(f"La métrica {metric.name} ya existe con otra definición")
+                return current
+            self._metrics[metric.name] = metric
+            return metric
+
+
+class Metric(ABC):
+    """Base de Counter e Histogram: nombre, labels y lock por métrica"""
+    type = 'untyped'
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} espera los labels {self.labelnames}, recibió {tuple(labels)}")
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Borra los valores de todas las combinaciones de labels"""
+        pass
+
+    @abstractmethod
+    def values(self) -> Dict[LabelKey, Any]:
+        """Copia de los valores actuales por combinación de labels"""
+        pass
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """Muestras (nombre, labels, valor) para el formato de Prometheus"""
+        pass
+
+
+class Counter(Metric):
+    """Valor que solo crece (bytes descargados, emails descartados, ...)"""
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        if amount < 0:
+            raise ValueError("Un contador no puede disminuir")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def values(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        values = self.values()
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """Distribución de valores (duraciones) en buckets acumulados, como en Prometheus"""
+    type = 'histogram'
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por labels: [cantidad por bucket (el último es +Inf, sin acumular), suma]
+        self._values: Dict[LabelKey, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: LabelKey, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels: Any) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def values(self) -> Dict[LabelKey, Dict[str, Any]]:
+        with self._lock:
+            entries = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        result = {}
+        for key, (counts, total) in entries.items():
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            bounds = [*self.buckets, float('inf')]
+            result[key] = {'count': running, 'sum': total, 'buckets': dict(zip(bounds, cumulative))}
+        return result
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for key, value in sorted(self.values().items()):
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in value['buckets'].items():
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, count
+            yield f"{self.name}_sum", labels, value['sum']
+            yield f"{self.name}_count", labels, value['count']
+
+
+class _Timer:
+    """Context manager que observa la duración del bloque en STAGE_SECONDS"""
+    __slots__ = ('key', 'start')
+
+    def __init__(self, stage: str):
+        # El label ya armado: es lo más caro de observe
+        self.key = (stage,)
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        STAGE_SECONDS._observe(self.key, time.perf_counter() - self.start)
+
+
+class _Disabled:
+    """Context manager vacío para cuando las métricas están deshabilitadas"""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        return None
+
+
+_DISABLED = _Disabled()
+
+REGISTRY = MetricsRegistry()
+
+# =============================================================================
+# Métricas del pipeline de sincronización
+# =============================================================================
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'chauchometro_stage_seconds',
+    'Duración de cada etapa de la sincronización (connect, search, fetch, decode, parse, persist, ...)',
+    ('stage',),
+)
+FETCHED_BYTES = REGISTRY.counter(
+    'chauchometro_imap_fetched_bytes_total',
+    'Bytes recibidos en respuestas UID FETCH',
+)
+EMAILS_SKIPPED = REGISTRY.counter(
+    'chauchometro_emails_skipped_total',
+    'Emails descartados antes de obtener una transacción, por motivo',
+    ('reason',),
+)
+PARSE_FAILURES = REGISTRY.counter(
+    'chauchometro_parse_failures_total',
+    'Emails transaccionales que el parser no pudo convertir en transacción, por banco y tipo',
+    ('bank', 'type'),
+)
+TRANSACTIONS_PARSED = REGISTRY.counter(
+    'chauchometro_transactions_parsed_total',
+    'Transacciones obtenidas de emails, por banco y tipo',
+    ('bank', 'type'),
+)
+TRANSACTIONS_PERSISTED = REGISTRY.counter(
+    'chauchometro_transactions_persisted_total',
+    'Transacciones enviadas al upsert de la base de datos',
+)
+
+
+def enable() -> None:
+    REGISTRY.enabled = True
+
+
+def disable() -> None:
+    REGISTRY.enabled = False
+
+
+def enabled() -> bool:
+    return REGISTRY.enabled
+
+
+def timed(stage: str):
+    """Mide la duración de un bloque: `with metrics.timed('fetch'): ...`"""
+    if not REGISTRY.enabled:
+        return _DISABLED
+    return _Timer(stage)
+
+
+def instrumented(stage: str) -> Callable[[F], F]:
+    """Decorador que mide cada llamada a la función (o corrutina) como la etapa `stage`"""
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not REGISTRY.enabled:
+                    return await func(*args, **kwargs)
+                with _Timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def skipped(reason: str) -> None:
+    """Cuenta un email descartado"""
+    EMAILS_SKIPPED.inc(reason=reason)
+
+
+def fetched_bytes(data: Optional[List[Any]]) -> int:
+    """Bytes de una respuesta de imaplib a UID FETCH (literales y líneas)"""
+    total = 0
+    for item in data or ():
+        if isinstance(item, tuple):
+            total += sum(len(part) for part in item if isinstance(part, (bytes, bytearray)))
+        elif isinstance(item, (bytes, bytearray)):
+            total += len(item)
+    return total
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,477 @@
+import asyncio
+import re
+import ssl
+import logging
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Set, Tuple, AsyncIterator
+
+from app.core import metrics
+from app.email.connection import (
+    EmailConnectorBase, EmailMessage, HEADER_QUERY, STRUCTURE_QUERY, Parsers, Senders,
+    build_message_set, last_int, sender_key, split_literals
+)
+
+logger = logging.getLogger(__name__)
+
+CRLF = b'\r\n'
+LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+UNTAGGED_STATUS_RE = re.compile(rb'(?P<num>\d+) (?P<type>[A-Z-]+)(?: (?P<data>.*))?$')
+UNTAGGED_RE = re.compile(rb'(?P<type>[A-Z-]+)(?: (?P<data>.*))?$')
+RESPONSE_CODE_RE = re.compile(rb'\[(?P<type>[A-Z-]+)(?: (?P<data>[^\]]*))?\]')
+
+
+class AsyncIMAPError(Exception):
+    """Error reportado por el servidor IMAP (respuesta BAD o conexión cerrada)"""
+
+
+class AsyncIMAPAbort(AsyncIMAPError):
+    """La conexión se cerró (equivalente a imaplib.IMAP4.abort)"""
+
+
+# Errores que indican que la sesión se cortó; se propagan como en EmailConnector
+CONNECTION_ERRORS = (AsyncIMAPAbort, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+
+def _quote(arg: str) -> str:
+    """Encierra un argumento entre comillas, como imaplib._quote"""
+    return '"' + arg.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class AsyncIMAPClient:
+    """Cliente IMAP4rev1 mínimo sobre asyncio
+
+    Solo implementa los comandos que usan los conectores. Las respuestas
+    tienen la misma forma que las de imaplib ((typ, data), con los literales
+    como tuplas) para reutilizar la lógica de EmailConnectorBase.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        timeout: float = 60.0
+    ):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.untagged_responses: Dict[str, List[Any]] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+        self._tagnum = 0
+
+    async def open(self) -> None:
+        """Abre la conexión y lee el saludo del servidor"""
+        self._reader, self._writer = await asyncio.wait_for(
+            # Límite de línea amplio: BODYSTRUCTURE puede venir en una sola línea larga
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl_context, limit=2 ** 20),
+            self.timeout
+        )
+        greeting = await self._readline()
+        if not greeting.startswith((b'* OK', b'* PREAUTH')):
+            raise AsyncIMAPError(f"Saludo inesperado: {greeting!r}")
+
+    async def login(self, user: str, password: str) -> Tuple[str, List[Any]]:
+        return await self._command('LOGIN', user, _quote(password))
+
+    async def select(self, mailbox: str = 'INBOX') -> Tuple[str, List[Any]]:
+        self.untagged_responses = {}
+        typ, data = await self._command('SELECT', mailbox if mailbox.isalnum() else _quote(mailbox))
+        if typ != 'OK':
+            return typ, data
+        return typ, self.untagged_responses.get('EXISTS', [None])
+
+    def response(self, code: str) -> Tuple[str, List[Any]]:
+        """Retorna (y consume) una respuesta no etiquetada, como imaplib.response"""
+        return code, self.untagged_responses.pop(code.upper(), [None])
+
+    async def status(self, mailbox: str, names: str) -> Tuple[str, List[Any]]:
+        typ, data = await self._command('STATUS', mailbox if mailbox.isalnum() else _quote(mailbox), names)
+        if typ != 'OK':
+            return typ, data
+        return typ, self.untagged_responses.pop('STATUS', [None])
+
+    async def uid(self, command: str, *args: Optional[Any]) -> Tuple[str, List[Any]]:
+        command = command.upper()
+        name = command if command in ('SEARCH', 'SORT', 'THREAD') else 'FETCH'
+        self.untagged_responses.pop(name, None)
+        with metrics.timed(name.lower()):
+            typ, data = await self._command('UID', command, *args)
+        if typ != 'OK':
+            return typ, data
+        data = self.untagged_responses.pop(name, [None])
+        if name == 'FETCH' and metrics.enabled():
+            metrics.FETCHED_BYTES.inc(metrics.fetched_bytes(data))
+        return typ, data
+
+    async def noop(self) -> Tuple[str, List[Any]]:
+        return await self._command('NOOP')
+
+    async def close(self) -> Tuple[str, List[Any]]:
+        return await self._command('CLOSE')
+
+    async def logout(self) -> Tuple[str, List[Any]]:
+        try:
+            return await self._command('LOGOUT')
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self) -> None:
+        """Cierra el socket sin LOGOUT, como imaplib.IMAP4.shutdown"""
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+            self._writer = None
+
+    async def _command(self, name: str, *args: Optional[Any]) -> Tuple[str, List[Any]]:
+        """Envía un comando y procesa respuestas hasta su respuesta etiquetada"""
+        if not self._writer:
+            raise AsyncIMAPAbort("No hay conexión abierta")
+
+        async with self._lock:
+            self._tagnum += 1
+            tag = f"A{self._tagnum:04d}".encode()
+            parts = [tag, name.encode()] + [
+                arg if isinstance(arg, bytes) else str(arg).encode()
+                for arg in args if arg is not None
+            ]
+            self._writer.write(b' '.join(parts) + CRLF)
+            await self._writer.drain()
+
+            while True:
+                line = await self._readline()
+                if line.startswith(tag + b' '):
+                    typ, _, text = line[len(tag) + 1:].partition(b' ')
+                    typ = typ.decode()
+                    if typ == 'BAD':
+                        raise AsyncIMAPError(f"{name} falló: {text.decode(errors='ignore')}")
+                    return typ, [text]
+                if line.startswith(b'* '):
+                    await self._read_untagged(line[2:])
+
+    async def _read_untagged(self, line: bytes) -> None:
+        """Guarda una respuesta no etiquetada (incluidos sus literales)"""
+        match = UNTAGGED_STATUS_RE.match(line)
+        if match:
+            typ = match.group('type').decode()
+            head = match.group('num') + (b' ' + match.group('data') if match.group('data') else b'')
+        else:
+            match = UNTAGGED_RE.match(line)
+            if not match:
+                return
+            typ = match.group('type').decode()
+            head = match.group('data') or b''
+
+        if typ in ('OK', 'NO', 'BAD'):
+            code = RESPONSE_CODE_RE.match(head)
+            if code:
+                self.untagged_responses.setdefault(code.group('type').decode(), []).append(code.group('data'))
+
+        items = self.untagged_responses.setdefault(typ, [])
+        had_literal = False
+        literal = LITERAL_RE.search(head)
+        while literal:
+            data = await asyncio.wait_for(self._reader.readexactly(int(literal.group(1))), self.timeout)
+            items.append((head, data))
+            had_literal = True
+            head = await self._readline()
+            literal = LITERAL_RE.search(head)
+        if head or not had_literal:
+            items.append(head)
+
+    async def _readline(self) -> bytes:
+        line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+        if not line:
+            raise AsyncIMAPAbort("El servidor cerró la conexión")
+        return line.rstrip(CRLF)
+
+
+class AsyncEmailConnector(EmailConnectorBase):
+    """Contraparte asyncio de EmailConnector
+
+    Misma superficie (connect, search_emails, iter_emails, sync_emails,
+    _fetch_email) y mismos EmailMessage, pero sin bloquear el event loop:
+    muchas cuentas pueden sincronizarse a la vez en un solo hilo.
+    """
+
+    def __init__(
+        self,
+        email_address: str,
+        password: str,
+        provider: str = 'gmail',
+        ssl_context: Optional[ssl.SSLContext] = None,
+        **kwargs
+    ):
+        super().__init__(email_address, password, provider, **kwargs)
+        self.ssl_context = ssl_context
+        self.connection: Optional[AsyncIMAPClient] = None
+
+    def _create_client(self) -> AsyncIMAPClient:
+        config = self.PROVIDERS[self.provider]
+        return AsyncIMAPClient(
+            config['imap_server'],
+            config['imap_port'],
+            ssl_context=self.ssl_context or ssl.create_default_context()
+        )
+
+    @metrics.instrumented('connect')
+    async def connect(self) -> None:
+        """Conecta al servidor IMAP
+
+        Si el LOGIN falla el socket se cierra: `connection` solo queda
+        asignada con una sesión autenticada.
+        """
+        self._selected = None
+        self.connection = None
+        client = None
+        try:
+            client = self._create_client()
+            await client.open()
+            typ, data = await client.login(self.email_address, self.password)
+            if typ != 'OK':
+                raise AsyncIMAPError(f"Error de autenticación: {data}")
+        except Exception as e:
+            logger.error(f"Error conectando a IMAP: {e}")
+            if client is not None:
+                await client.shutdown()
+            raise
+        self.connection = client
+        logger.info(f"Conectado exitosamente a {self.provider}")
+
+    async def disconnect(self) -> None:
+        """Desconecta del servidor IMAP"""
+        if self.connection:
+            try:
+                await self.connection.close()
+                await self.connection.logout()
+            except Exception:
+                pass
+            self.connection = None
+        self._selected = None
+
+    @metrics.instrumented('search_emails')
+    async def search_emails(
+        self,
+        sender: Senders,
+        since_date: Optional[datetime] = None,
+        subject_filter: Optional[str] = None,
+        limit: int = 50,
+        parsers: Optional[Parsers] = None
+    ) -> List[EmailMessage]:
+        """Busca emails por remitente y fecha (ver EmailConnector.search_emails)"""
+        try:
+            emails = [e async for e in self.iter_emails(sender, since_date, subject_filter, limit, parsers)]
+            logger.info(f"Encontrados {len(emails)} emails de {sender_key(sender)}")
+            return emails
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error buscando emails: {e}")
+            return []
+
+    async def iter_emails(
+        self,
+        sender: Senders,
+        since_date: Optional[datetime] = None,
+        subject_filter: Optional[str] = None,
+        limit: Optional[int] = None,
+        parsers: Optional[Parsers] = None,
+        keep_raw: bool = True,
+        max_in_flight: Optional[int] = None
+    ) -> AsyncIterator[EmailMessage]:
+        """Genera los emails a medida que se descargan (ver EmailConnector.iter_emails)"""
+        if not self.connection:
+            await self.connect()
+
+        await self._select('INBOX')
+
+        uids = await self._search_uids(self._since_criteria(sender, since_date))
+        if limit is not None:
+            uids = uids[-limit:]
+
+        async for email_msg in self._iter_fetch(uids, subject_filter, parsers, keep_raw, max_in_flight):
+            yield email_msg
+
+    @metrics.instrumented('sync_emails')
+    async def sync_emails(
+        self,
+        sender: Senders,
+        mailbox: str = 'INBOX',
+        since_date: Optional[datetime] = None,
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None
+    ) -> List[EmailMessage]:
+        """Sincroniza incrementalmente por UID (ver EmailConnector.sync_emails)"""
+        if not self.connection:
+            await self.connect()
+
+        uidvalidity, uidnext = await self._select(mailbox)
+        criteria, min_uid, last_uid = self._plan_sync(mailbox, sender, uidvalidity, uidnext, since_date)
+        uids = [uid for uid in await self._search_uids(criteria) if int(uid) > min_uid]
+
+        skipped: Set[int] = set()
+        emails = await self._fetch_emails(uids, subject_filter, parsers, skipped)
+        self._finish_sync(mailbox, sender, uidvalidity, last_uid, uids, skipped | {int(e.uid) for e in emails})
+
+        logger.info(f"Sincronizados {len(emails)} emails nuevos de {sender_key(sender)} ({len(uids)} UIDs)")
+        return emails
+
+    async def _select(self, mailbox: str) -> Tuple[int, int]:
+        """Selecciona el buzón y retorna (UIDVALIDITY, UIDNEXT), sin repetir SELECT"""
+        if self._selected and self._selected[0] == mailbox:
+            return self._selected[1], self._selected[2]
+
+        typ, _ = await self.connection.select(mailbox)
+        if typ != 'OK':
+            self._selected = None
+            raise AsyncIMAPError(f"No se pudo seleccionar {mailbox}")
+
+        uidvalidity = self._untagged_int('UIDVALIDITY')
+        uidnext = self._untagged_int('UIDNEXT')
+        if uidvalidity is None:
+            typ, data = await self.connection.status(mailbox, '(UIDVALIDITY UIDNEXT)')
+            if typ == 'OK':
+                uidvalidity, status_uidnext = self._parse_status(data)
+                uidnext = status_uidnext or uidnext
+
+        self._selected = (mailbox, uidvalidity or 0, uidnext or 0)
+        return uidvalidity or 0, uidnext or 0
+
+    def _untagged_int(self, code: str) -> Optional[int]:
+        _, data = self.connection.response(code)
+        return last_int(data)
+
+    async def _search_uids(self, criteria: str) -> List[bytes]:
+        typ, data = await self.connection.uid('SEARCH', None, criteria)
+        if typ != 'OK':
+            raise AsyncIMAPError(f"Error en búsqueda: {typ}")
+        return data[0].split() if data and data[0] else []
+
+    async def _fetch_emails(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        return [e async for e in self._iter_fetch(uids, subject_filter, parsers, skipped=skipped)]
+
+    async def _iter_fetch(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        keep_raw: bool = True,
+        chunk_size: Optional[int] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> AsyncIterator[EmailMessage]:
+        for chunk in self._chunks(uids, chunk_size):
+            if self.partial_fetch:
+                emails = await self._fetch_text_parts(chunk, subject_filter, parsers, skipped)
+            else:
+                if subject_filter or parsers:
+                    chunk = await self._filter_by_headers(chunk, subject_filter, parsers, skipped)
+                emails = await self._fetch_full(chunk, keep_raw, skipped) if chunk else []
+            for email_msg in emails:
+                yield email_msg
+
+    async def _fetch_full(
+        self,
+        uids: List[bytes],
+        keep_raw: bool = True,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        try:
+            raw_by_uid = await self._fetch_literals(uids, '(UID RFC822)')
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error descargando lote {build_message_set(uids)}: {e}")
+            return []
+        return self._parse_batch(uids, raw_by_uid, keep_raw, skipped)
+
+    async def _filter_by_headers(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[bytes]:
+        selected = []
+        for chunk in self._chunks(uids):
+            try:
+                headers_by_uid = await self._fetch_literals(chunk, HEADER_QUERY)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Error descargando headers {build_message_set(chunk)}: {e}")
+                continue
+            selected.extend(self._select_by_headers(chunk, headers_by_uid, subject_filter, parsers, skipped))
+        return selected
+
+    async def _fetch_text_parts(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        emails = []
+        for chunk in self._chunks(uids):
+            try:
+                typ, data = await self.connection.uid('FETCH', build_message_set(chunk), STRUCTURE_QUERY)
+                if typ != 'OK':
+                    raise AsyncIMAPError(f"FETCH falló: {typ}")
+                found, pending = self._plan_text_parts(chunk, data, subject_filter, parsers, skipped)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Error descargando estructura {build_message_set(chunk)}: {e}")
+                continue
+
+            for section, items in pending.items():
+                try:
+                    bodies = await self._fetch_literals([uid for uid, _ in items], f'(UID BODY.PEEK[{section}])')
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error descargando parte {section}: {e}")
+                    for uid, _ in items:
+                        del found[uid]
+                    continue
+                self._apply_text_parts(found, items, bodies, skipped)
+
+            emails.extend(found.values())
+        return emails
+
+    async def _fetch_literals(self, uids: List[bytes], query: str) -> Dict[int, bytes]:
+        typ, data = await self.connection.uid('FETCH', build_message_set(uids), query)
+        if typ != 'OK':
+            raise AsyncIMAPError(f"FETCH falló: {typ}")
+        return split_literals(data)
+
+    @metrics.instrumented('fetch_email')
+    async def _fetch_email(self, email_id: bytes) -> Optional[EmailMessage]:
+        """Obtiene un email por UID"""
+        try:
+            typ, data = await self.connection.uid('FETCH', email_id, '(RFC822)')
+            if typ != 'OK' or not data or not isinstance(data[0], tuple):
+                return None
+            return self._parse_email(email_id.decode(), data[0][1])
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error decodificando email: {e}")
+            return None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
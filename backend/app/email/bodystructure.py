@@ -0,0 +1,187 @@
+import base64
+import quopri
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Union
+
+TOKEN_RE = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb'|(?P<atom>[^\s()"\[]+(?:\[[^\]]*\](?:<[\d.]+>)?)?))'
+)
+LITERAL_SUFFIX_RE = re.compile(rb'\{\d+\}\s*$')
+MESSAGE_START_RE = re.compile(rb'^\d+ \(')
+
+Token = Union[str, bytes, None]
+
+
+class _Literal(bytes):
+    """Literal IMAP ({n}) ya separado por imaplib"""
+
+
+@dataclass
+class TextPart:
+    """Parte de texto de un email ubicada vía BODYSTRUCTURE"""
+    section: str
+    subtype: str
+    encoding: str
+    charset: str
+    size: int
+
+
+def parse_fetch_response(data: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Convierte la respuesta de imaplib a un FETCH en un dict por mensaje
+
+    Ej: [(b'1 (UID 5 BODYSTRUCTURE (...) BODY[1] {12}', b'...'), b')']
+    -> [{'UID': '5', 'BODYSTRUCTURE': [...], 'BODY[1]': b'...'}]
+    """
+    results = []
+    for pieces in _split_messages(data):
+        values = _parse_list(_tokenize(pieces))
+        if len(values) < 2 or not isinstance(values[1], list):
+            continue
+        items = values[1]
+        response = {}
+        for i in range(0, len(items) - 1, 2):
+            key = items[i]
+            if isinstance(key, str):
+                response[key.upper()] = items[i + 1]
+        results.append(response)
+    return results
+
+
+def find_text_part(structure: Optional[list]) -> Optional[TextPart]:
+    """Busca la parte text/html (o text/plain si no hay HTML), ignorando adjuntos"""
+    if not structure:
+        return None
+
+    plain = None
+    for section, node in _iter_leaves(structure, ''):
+        if len(node) < 7 or not isinstance(node[0], str) or node[0].lower() != 'text':
+            continue
+        if _is_attachment(node):
+            continue
+        subtype = (node[1] or '').lower()
+        params = _params(node[2])
+        part = TextPart(
+            section=section,
+            subtype=subtype,
+            encoding=(node[5] or '7bit').lower(),
+            charset=params.get('charset', 'utf-8'),
+            size=_to_int(node[6]),
+        )
+        if subtype == 'html':
+            return part
+        if subtype == 'plain' and plain is None:
+            plain = part
+    return plain
+
+
+def decode_part(data: bytes, encoding: str, charset: str) -> str:
+    """Decodifica el contenido de una parte según su Content-Transfer-Encoding"""
+    encoding = encoding.lower()
+    if encoding == 'base64':
+        payload = base64.b64decode(data)
+    elif encoding == 'quoted-printable':
+        payload = quopri.decodestring(data)
+    else:
+        payload = data
+    try:
+        return payload.decode(charset or 'utf-8', errors='ignore')
+    except LookupError:
+        return payload.decode('utf-8', errors='ignore')
+
+
+def _split_messages(data: List[Any]) -> Iterator[List[Union[bytes, _Literal]]]:
+    """Agrupa los elementos de la respuesta de imaplib por mensaje"""
+    pieces: List[Union[bytes, _Literal]] = []
+    for item in data or []:
+        head = item[0] if isinstance(item, tuple) else item
+        if not isinstance(head, bytes):
+            continue
+        if MESSAGE_START_RE.match(head) and pieces:
+            yield pieces
+            pieces = []
+        if isinstance(item, tuple):
+            pieces.append(LITERAL_SUFFIX_RE.sub(b'', head))
+            pieces.append(_Literal(item[1]))
+        else:
+            pieces.append(head)
+    if pieces:
+        yield pieces
+
+
+def _tokenize(pieces: List[Union[bytes, _Literal]]) -> Iterator[Tuple[str, Token]]:
+    for piece in pieces:
+        if isinstance(piece, _Literal):
+            yield 'value', bytes(piece)
+            continue
+        pos = 0
+        while pos < len(piece):
+            match = TOKEN_RE.match(piece, pos)
+            if not match or match.end() == pos:
+                break
+            pos = match.end()
+            if match.group('open'):
+                yield 'open', None
+            elif match.group('close'):
+                yield 'close', None
+            elif match.group('quoted') is not None:
+                quoted = re.sub(rb'\\(.)', rb'\1', match.group('quoted'))
+                yield 'value', quoted.decode('utf-8', errors='replace')
+            elif match.group('atom'):
+                atom = match.group('atom').decode('utf-8', errors='replace')
+                yield 'value', None if atom.upper() == 'NIL' else atom
+
+
+def _parse_list(tokens: Iterator[Tuple[str, Token]]) -> list:
+    """Arma listas anidadas a partir de los tokens"""
+    result: list = []
+    for kind, value in tokens:
+        if kind == 'open':
+            result.append(_parse_list(tokens))
+        elif kind == 'close':
+            return result
+        else:
+            result.append(value)
+    return result
+
+
+def _iter_leaves(node: list, section: str) -> Iterator[Tuple[str, list]]:
+    if node and isinstance(node[0], list):
+        # Multipart: las primeras posiciones son las partes hijas
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            child_section = f"{section}.{index}" if section else str(index)
+            yield from _iter_leaves(child, child_section)
+        return
+    yield section or '1', node
+
+
+def _params(value: Any) -> Dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {
+        str(value[i]).lower(): str(value[i + 1])
+        for i in range(0, len(value) - 1, 2)
+        if value[i] is not None and value[i + 1] is not None
+    }
+
+
+def _is_attachment(node: list) -> bool:
+    # Partes text/*: 7 = líneas, 8 = MD5, 9 = disposición
+    disposition = node[9] if len(node) > 9 else None
+    return (
+        isinstance(disposition, list) and bool(disposition)
+        and isinstance(disposition[0], str) and disposition[0].lower() == 'attachment'
+    )
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
@@ -1,26 +1,212 @@
 import imaplib
 import email
+import re
+import select
+import socket
+import ssl
+import threading
+import time
 from email.header import decode_header
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Set, Tuple, Sequence, Iterator, Union, TYPE_CHECKING
 from datetime import datetime, timedelta
 import logging
 from dataclasses import dataclass
 
+from app.core import metrics
+from app.email.bodystructure import TextPart, parse_fetch_response, find_text_part, decode_part
+
+if TYPE_CHECKING:
+    from app.parsers.base import BaseParser
+    from app.parsers.registry import ParserRegistry
+
 logger = logging.getLogger(__name__)
 
-@dataclass
+FETCH_UID_RE = re.compile(rb'UID (\d+)')
+HEADER_QUERY = '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)])'
+STRUCTURE_QUERY = '(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)])'
+# RFC 2177: el servidor puede cortar un IDLE después de 30 minutos
+IDLE_TIMEOUT = 29 * 60
+# Cada cuánto se revisa stop_event mientras se espera en IDLE
+IDLE_CHECK_INTERVAL = 1.0
+# Errores que indican que la sesión IMAP se cortó (no que un email venga mal):
+# se propagan para no dar por procesados emails que nunca se descargaron
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError)
+
+# Un remitente o varios (se buscan juntos con OR)
+Senders = Union[str, Sequence[str]]
+
+# Una lista de parsers o un ParserRegistry (cualquier objeto con should_fetch)
+Parsers = Union['ParserRegistry', Sequence['BaseParser']]
+
+def build_message_set(ids: List[bytes]) -> str:
+    """Comprime una lista de IDs en un message set IMAP (ej: "1,5,9:20")"""
+    numbers = sorted({int(i) for i in ids})
+    ranges = []
+    for n in numbers:
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ','.join(str(a) if a == b else f"{a}:{b}" for a, b in ranges)
+
+def build_from_criteria(senders: Senders) -> str:
+    """Criterio FROM para uno o varios remitentes
+
+    IMAP solo tiene OR binario en notación prefija:
+    ["a", "b", "c"] -> 'OR FROM "a" OR FROM "b" FROM "c"'
+    """
+    senders = [senders] if isinstance(senders, str) else list(senders)
+    if not senders:
+        raise ValueError("Se necesita al menos un remitente")
+    criteria = f'FROM "{senders[-1]}"'
+    for sender in reversed(senders[:-1]):
+        criteria = f'OR FROM "{sender}" {criteria}'
+    return criteria
+
+def wants_body(parsers: Parsers, header_msg: 'EmailMessage') -> bool:
+    """Indica si algún parser quiere el cuerpo del email según sus headers
+    
+    Un ParserRegistry decide con el parser del remitente; con una lista
+    basta que uno de los parsers lo quiera.
+    """
+    if hasattr(parsers, 'should_fetch'):
+        return parsers.should_fetch(header_msg)
+    return any(parser.should_fetch(header_msg) for parser in parsers)
+
+def sender_key(senders: Senders) -> str:
+    """Clave estable de un remitente o grupo de remitentes (para SyncState y logs)"""
+    if isinstance(senders, str):
+        return senders.lower()
+    return ','.join(sorted({sender.lower() for sender in senders}))
+
+def split_literals(data: List[Any]) -> Dict[int, bytes]:
+    """Separa por UID los literales de una respuesta FETCH multi-mensaje"""
+    literals = {}
+    for i, item in enumerate(data or []):
+        if not isinstance(item, tuple):
+            continue
+        match = FETCH_UID_RE.search(item[0])
+        if not match and i + 1 < len(data) and isinstance(data[i + 1], bytes):
+            # Algunos servidores envían el UID después del literal
+            match = FETCH_UID_RE.search(data[i + 1])
+        if match:
+            literals[int(match.group(1))] = item[1]
+    return literals
+
+def last_int(data: Optional[List[Any]]) -> Optional[int]:
+    """Último valor numérico de una respuesta no etiquetada (ej: EXISTS, UIDNEXT)"""
+    if not data or data[-1] is None:
+        return None
+    try:
+        return int(data[-1])
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(slots=True)
 class EmailMessage:
-    """Estructura para representar un email"""
+    """Estructura para representar un email
+    
+    raw_email queda vacío si se descargó con keep_raw=False o por partes.
+    message_id es el header Message-ID: a diferencia del UID, no cambia si
+    el buzón cambia de UIDVALIDITY.
+    """
     uid: str
     subject: str
     sender: str
     date: datetime
     body_html: str
     body_text: str
-    raw_email: bytes
+    raw_email: bytes = b""
+    message_id: str = ""
 
-class EmailConnector:
-    """Conector genérico para servicios de email vía IMAP"""
+@dataclass
+class SyncState:
+    """Estado de sincronización incremental de un buzón para un remitente
+    
+    Guarda el UIDVALIDITY del buzón y el UID más alto ya procesado. Mientras
+    el UIDVALIDITY no cambie, solo es necesario pedir los UIDs mayores.
+    """
+    uidvalidity: int
+    last_uid: int = 0
+
+@metrics.instrumented('decode')
+def parse_headers(uid: str, headers: bytes) -> EmailMessage:
+    """Construye un EmailMessage sin cuerpo a partir de los headers"""
+    header_message = email.message_from_bytes(headers)
+    return EmailMessage(
+        uid=uid,
+        subject=decode_header_value(header_message['Subject']),
+        sender=header_message['From'] or "",
+        date=email.utils.parsedate_to_datetime(header_message['Date']),
+        body_html="",
+        body_text="",
+        raw_email=b"",
+        message_id=(header_message['Message-ID'] or "").strip()
+    )
+
+@metrics.instrumented('decode')
+def parse_email(uid: str, raw_email: bytes, keep_raw: bool = True) -> EmailMessage:
+    """Decodifica un email RFC822 a EmailMessage"""
+    email_message = email.message_from_bytes(raw_email)
+    
+    # Extraer información básica
+    subject = decode_header_value(email_message['Subject'])
+    sender = email_message['From']
+    date = email.utils.parsedate_to_datetime(email_message['Date'])
+    
+    # Extraer cuerpo
+    body_html = ""
+    body_text = ""
+    
+    if email_message.is_multipart():
+        for part in email_message.walk():
+            content_type = part.get_content_type()
+            if content_type == "text/html":
+                body_html = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+            elif content_type == "text/plain":
+                body_text = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+    else:
+        content_type = email_message.get_content_type()
+        body = email_message.get_payload(decode=True).decode('utf-8', errors='ignore')
+        if content_type == "text/html":
+            body_html = body
+        else:
+            body_text = body
+    
+    return EmailMessage(
+        uid=uid,
+        subject=subject,
+        sender=sender,
+        date=date,
+        body_html=body_html,
+        body_text=body_text,
+        raw_email=raw_email if keep_raw else b"",
+        message_id=(email_message['Message-ID'] or "").strip()
+    )
+
+def decode_header_value(header: str) -> str:
+    """Decodifica headers de email"""
+    if not header:
+        return ""
+    
+    # Un asunto puede venir en varios fragmentos (ej: "Giro con Tarjeta de =?utf-8?q?D=C3=A9bito?=")
+    chunks = []
+    for value, charset in decode_header(header):
+        if isinstance(value, bytes):
+            try:
+                chunks.append(value.decode(charset or 'utf-8', errors='ignore'))
+            except LookupError:
+                chunks.append(value.decode('utf-8', errors='ignore'))
+        else:
+            chunks.append(value)
+    return ''.join(chunks)
+
+class EmailConnectorBase:
+    """Configuración y lógica común a los conectores IMAP (bloqueante y asyncio)
+    
+    Aquí vive todo lo que no habla con el servidor: criterios de búsqueda,
+    estado incremental, decisión por headers y decodificación de emails.
+    """
     
     PROVIDERS = {
         'gmail': {
@@ -33,31 +219,319 @@ class EmailConnector:
         }
     }
     
-    def __init__(self, email_address: str, password: str, provider: str = 'gmail'):
+    def __init__(
+        self,
+        email_address: str,
+        password: str,
+        provider: str = 'gmail',
+        sync_states: Optional[Dict[Tuple[str, str], SyncState]] = None,
+        fetch_chunk_size: int = 50,
+        partial_fetch: bool = False
+    ):
         self.email_address = email_address
         self.password = password
         self.provider = provider.lower()
-        self.connection: Optional[imaplib.IMAP4_SSL] = None
+        # Estado incremental por (buzón, remitente), persistible por el llamador
+        self.sync_states: Dict[Tuple[str, str], SyncState] = sync_states if sync_states is not None else {}
+        # Cantidad de mensajes pedidos en un solo FETCH
+        self.fetch_chunk_size = max(1, fetch_chunk_size)
+        # Descargar solo la parte text/html (o text/plain) según BODYSTRUCTURE
+        self.partial_fetch = partial_fetch
+        # Buzón seleccionado en la sesión actual: (buzón, UIDVALIDITY, UIDNEXT)
+        self._selected: Optional[Tuple[str, int, int]] = None
+        # Último conteo de mensajes (EXISTS) informado por el servidor
+        self._exists: Optional[int] = None
         
         if self.provider not in self.PROVIDERS:
             raise ValueError(f"Proveedor no soportado: {provider}")
     
+    def _since_criteria(self, sender: Senders, since_date: Optional[datetime]) -> str:
+        """Construye el criterio FROM/SINCE (default: últimos 30 días)"""
+        if not since_date:
+            since_date = datetime.now() - timedelta(days=30)
+        
+        date_str = since_date.strftime("%d-%b-%Y")
+        return f'({build_from_criteria(sender)} SINCE {date_str})'
+    
+    def _plan_sync(
+        self,
+        mailbox: str,
+        sender: Senders,
+        uidvalidity: int,
+        uidnext: int,
+        since_date: Optional[datetime]
+    ) -> Tuple[str, int, int]:
+        """Decide entre sincronización incremental o completa
+        
+        Retorna (criterio de búsqueda, UID mínimo exclusivo, último UID inicial).
+        """
+        state = self.sync_states.get((mailbox, sender_key(sender)))
+        
+        if state and state.uidvalidity == uidvalidity and state.last_uid > 0:
+            criteria = f'({build_from_criteria(sender)} UID {state.last_uid + 1}:*)'
+            # "n+1:*" siempre incluye el último mensaje aunque su UID sea <= n
+            return criteria, state.last_uid, state.last_uid
+        
+        if state:
+            logger.info(f"UIDVALIDITY cambió en {mailbox}, resincronizando {sender_key(sender)}")
+        return self._since_criteria(sender, since_date), 0, uidnext - 1 if uidnext else 0
+    
+    def _finish_sync(
+        self,
+        mailbox: str,
+        sender: Senders,
+        uidvalidity: int,
+        last_uid: int,
+        uids: List[bytes],
+        done: Set[int]
+    ) -> None:
+        """Registra hasta qué UID quedó procesado el buzón para la próxima sincronización
+        
+        `done` son los UIDs entregados y los procesados sin entregar:
+        descartados por los headers o que no se pueden decodificar (fallan
+        igual en cada intento). Si alguno de `uids` no está ahí (el FETCH
+        falló o el servidor no lo retornó), el estado avanza solo hasta el
+        UID anterior, así ese email y los siguientes se vuelven a pedir.
+        """
+        pending = [int(uid) for uid in uids if int(uid) not in done]
+        if pending:
+            last_uid = min(pending) - 1
+            logger.warning(f"{len(pending)} emails de {sender_key(sender)} quedaron pendientes desde el UID {min(pending)}")
+        elif uids:
+            last_uid = max(last_uid, max(int(uid) for uid in uids))
+        self.sync_states[(mailbox, sender_key(sender))] = SyncState(uidvalidity=uidvalidity, last_uid=last_uid)
+    
+    def _parse_status(self, data: List[Any]) -> Tuple[Optional[int], Optional[int]]:
+        """Extrae (UIDVALIDITY, UIDNEXT) de una respuesta STATUS"""
+        if not data or not data[0]:
+            return None, None
+        status = data[0].decode(errors='ignore')
+        uidvalidity = re.search(r'UIDVALIDITY (\d+)', status)
+        uidnext = re.search(r'UIDNEXT (\d+)', status)
+        return (
+            int(uidvalidity.group(1)) if uidvalidity else None,
+            int(uidnext.group(1)) if uidnext else None
+        )
+    
+    def _wants(
+        self,
+        header_msg: EmailMessage,
+        subject_filter: Optional[str],
+        parsers: Optional[Parsers]
+    ) -> bool:
+        """Decide con los headers si el email debe descargarse"""
+        if subject_filter and subject_filter.lower() not in header_msg.subject.lower():
+            metrics.skipped('filtro_asunto')
+            return False
+        if parsers and not wants_body(parsers, header_msg):
+            logger.debug(f"Omitiendo cuerpo de: {header_msg.subject}")
+            metrics.skipped('descartado_por_headers')
+            return False
+        return True
+    
+    def _chunks(self, uids: List[bytes], chunk_size: Optional[int] = None):
+        """Divide los UIDs en lotes de fetch_chunk_size (o chunk_size si es menor)"""
+        size = min(self.fetch_chunk_size, chunk_size) if chunk_size else self.fetch_chunk_size
+        size = max(1, size)
+        for i in range(0, len(uids), size):
+            yield uids[i:i + size]
+    
+    def _select_by_headers(
+        self,
+        uids: List[bytes],
+        headers_by_uid: Dict[int, bytes],
+        subject_filter: Optional[str],
+        parsers: Optional[Parsers],
+        skipped: Optional[Set[int]] = None
+    ) -> List[bytes]:
+        """Retorna los UIDs cuyos headers indican que vale la pena bajar el cuerpo
+        
+        Los UIDs descartados por los headers o con headers que no se pueden
+        decodificar se agregan a `skipped`.
+        """
+        selected = []
+        for uid in uids:
+            headers = headers_by_uid.get(int(uid))
+            if headers is None:
+                metrics.skipped('no_retornado')
+                continue
+            try:
+                header_msg = self._parse_headers(uid.decode(), headers)
+            except Exception as e:
+                logger.error(f"Error procesando headers {uid}: {e}")
+                metrics.skipped('error_decodificacion')
+                if skipped is not None:
+                    skipped.add(int(uid))
+                continue
+            
+            if self._wants(header_msg, subject_filter, parsers):
+                selected.append(uid)
+            elif skipped is not None:
+                skipped.add(int(uid))
+        return selected
+    
+    def _parse_batch(
+        self,
+        uids: List[bytes],
+        raw_by_uid: Dict[int, bytes],
+        keep_raw: bool,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        """Decodifica los emails de un lote en el orden pedido
+        
+        Los UIDs que no se pueden decodificar se agregan a `skipped`.
+        """
+        emails = []
+        for uid in uids:
+            raw_email = raw_by_uid.pop(int(uid), None)
+            if raw_email is None:
+                logger.warning(f"El servidor no retornó el email {uid.decode()}")
+                metrics.skipped('no_retornado')
+                continue
+            try:
+                emails.append(self._parse_email(uid.decode(), raw_email, keep_raw))
+            except Exception as e:
+                logger.error(f"Error procesando email {uid}: {e}")
+                metrics.skipped('error_decodificacion')
+                if skipped is not None:
+                    skipped.add(int(uid))
+                continue
+        return emails
+    
+    def _plan_text_parts(
+        self,
+        uids: List[bytes],
+        data: List[Any],
+        subject_filter: Optional[str],
+        parsers: Optional[Parsers],
+        skipped: Optional[Set[int]] = None
+    ) -> Tuple[Dict[bytes, EmailMessage], Dict[str, List[Tuple[bytes, TextPart]]]]:
+        """A partir de BODYSTRUCTURE + headers decide qué parte pedir de cada email
+        
+        Retorna los emails (aún sin cuerpo) y los UIDs agrupados por número de
+        parte. Los UIDs descartados por los headers o con una estructura
+        que no se puede decodificar se agregan a `skipped`.
+        """
+        responses = {int(r['UID']): r for r in parse_fetch_response(data) if 'UID' in r}
+        found = {}
+        pending = {}
+        for uid in uids:
+            response = responses.get(int(uid))
+            if response is None:
+                logger.warning(f"El servidor no retornó el email {uid.decode()}")
+                metrics.skipped('no_retornado')
+                continue
+            try:
+                headers = next((v for k, v in response.items() if k.startswith('BODY[HEADER')), b"")
+                email_msg = self._parse_headers(uid.decode(), headers)
+                part = find_text_part(response.get('BODYSTRUCTURE'))
+            except Exception as e:
+                logger.error(f"Error procesando estructura {uid}: {e}")
+                metrics.skipped('error_decodificacion')
+                if skipped is not None:
+                    skipped.add(int(uid))
+                continue
+            if not self._wants(email_msg, subject_filter, parsers):
+                if skipped is not None:
+                    skipped.add(int(uid))
+                continue
+            found[uid] = email_msg
+            if part:
+                pending.setdefault(part.section, []).append((uid, part))
+        return found, pending
+    
+    def _apply_text_parts(
+        self,
+        found: Dict[bytes, EmailMessage],
+        items: List[Tuple[bytes, TextPart]],
+        bodies: Dict[int, bytes],
+        skipped: Optional[Set[int]] = None
+    ) -> None:
+        """Decodifica las partes descargadas y las asigna a cada email
+        
+        Un email cuya parte no llegó o no se pudo decodificar (ej: base64
+        mal formado) se saca de `found`: no se entrega sin cuerpo y no
+        interrumpe al resto del lote. Los que no se pudieron decodificar se
+        agregan a `skipped`.
+        """
+        for uid, part in items:
+            data = bodies.get(int(uid))
+            if data is None:
+                logger.warning(f"El servidor no retornó la parte {part.section} del email {uid.decode()}")
+                metrics.skipped('no_retornado')
+                del found[uid]
+                continue
+            try:
+                body = decode_part(data, part.encoding, part.charset)
+            except Exception as e:
+                logger.error(f"Error decodificando parte {part.section} del email {uid.decode()}: {e}")
+                metrics.skipped('error_decodificacion')
+                del found[uid]
+                if skipped is not None:
+                    skipped.add(int(uid))
+                continue
+            if part.subtype == 'html':
+                found[uid].body_html = body
+            else:
+                found[uid].body_text = body
+    
+    def _parse_headers(self, uid: str, headers: bytes) -> EmailMessage:
+        """Construye un EmailMessage sin cuerpo a partir de los headers"""
+        return parse_headers(uid, headers)
+    
+    def _parse_email(self, uid: str, raw_email: bytes, keep_raw: bool = True) -> EmailMessage:
+        """Decodifica un email RFC822 a EmailMessage"""
+        return parse_email(uid, raw_email, keep_raw)
+    
+    def _decode_header(self, header: str) -> str:
+        """Decodifica headers de email"""
+        return decode_header_value(header)
+
+class EmailConnector(EmailConnectorBase):
+    """Conector genérico para servicios de email vía IMAP"""
+    
+    def __init__(self, email_address: str, password: str, provider: str = 'gmail', **kwargs):
+        super().__init__(email_address, password, provider, **kwargs)
+        self.connection: Optional[imaplib.IMAP4_SSL] = None
+    
+    @metrics.instrumented('connect')
     def connect(self) -> None:
-        """Conecta al servidor IMAP"""
+        """Conecta al servidor IMAP
+        
+        Si el LOGIN falla la conexión se cierra: `connection` solo queda
+        asignada con una sesión autenticada.
+        """
+        self._selected = None
+        self._exists = None
+        self.connection = None
+        connection = None
         try:
-            config = self.PROVIDERS[self.provider]
-            self.connection = imaplib.IMAP4_SSL(
-                config['imap_server'], 
-                config['imap_port']
-            )
-            self.connection.login(self.email_address, self.password)
-            logger.info(f"Conectado exitosamente a {self.provider}")
+            connection = self._open_connection()
+            connection.login(self.email_address, self.password)
         except imaplib.IMAP4.error as e:
             logger.error(f"Error de autenticación: {e}")
+            self._shutdown(connection)
             raise
         except Exception as e:
             logger.error(f"Error conectando a IMAP: {e}")
+            self._shutdown(connection)
             raise
+        self.connection = connection
+        logger.info(f"Conectado exitosamente a {self.provider}")
+    
+    def _shutdown(self, connection: Optional[imaplib.IMAP4]) -> None:
+        """Cierra el socket de una conexión que no llegó a autenticarse"""
+        if connection is None:
+            return
+        try:
+            connection.shutdown()
+        except Exception:
+            pass
+    
+    def _open_connection(self) -> imaplib.IMAP4:
+        """Abre la conexión TLS al servidor del proveedor (los tests apuntan a un servidor local)"""
+        config = self.PROVIDERS[self.provider]
+        return imaplib.IMAP4_SSL(config['imap_server'], config['imap_port'])
     
     def disconnect(self) -> None:
         """Desconecta del servidor IMAP"""
@@ -67,124 +541,501 @@ class EmailConnector:
                 self.connection.logout()
             except:
                 pass
+            self.connection = None
+        self._selected = None
+        self._exists = None
+    
+    def noop(self) -> bool:
+        """Verifica con NOOP que la sesión siga viva"""
+        if not self.connection:
+            return False
+        try:
+            typ, _ = self.connection.noop()
+            return typ == 'OK'
+        except (imaplib.IMAP4.error, OSError):
+            return False
     
+    @metrics.instrumented('search_emails')
     def search_emails(
-        self, 
-        sender: str, 
+        self,
+        sender: Senders,
         since_date: Optional[datetime] = None,
         subject_filter: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        parsers: Optional[Parsers] = None
     ) -> List[EmailMessage]:
         """
         Busca emails por remitente y fecha
         
         Args:
-            sender: Email del remitente
+            sender: Email del remitente o lista de remitentes (un solo SEARCH con OR)
             since_date: Buscar desde esta fecha (default: últimos 30 días)
             subject_filter: Filtrar por asunto que contenga este texto
             limit: Máximo número de emails a retornar
+            parsers: Si se indican, primero se descargan solo los headers y
+                se baja el cuerpo únicamente de los emails que algún parser
+                quiera procesar
+        
+        Otros errores se registran y retornan []; los de conexión
+        (CONNECTION_ERRORS) se propagan.
+        """
+        try:
+            emails = list(self.iter_emails(sender, since_date, subject_filter, limit, parsers))
+            logger.info(f"Encontrados {len(emails)} emails de {sender_key(sender)}")
+            return emails
+        
+        except CONNECTION_ERRORS:
+            # La sesión ya no sirve: el llamador (o el ConnectionPool) decide
+            raise
+        except Exception as e:
+            logger.error(f"Error buscando emails: {e}")
+            return []
+    
+    def iter_emails(
+        self,
+        sender: Senders,
+        since_date: Optional[datetime] = None,
+        subject_filter: Optional[str] = None,
+        limit: Optional[int] = None,
+        parsers: Optional[Parsers] = None,
+        keep_raw: bool = True,
+        max_in_flight: Optional[int] = None
+    ) -> Iterator[EmailMessage]:
+        """
+        Igual que search_emails, pero genera los emails a medida que se descargan
+        
+        Pensado para backfills grandes: el llamador puede parsear y persistir
+        cada email sin tener todo el buzón en memoria.
+        
+        Args:
+            sender: Email del remitente o lista de remitentes (un solo SEARCH con OR)
+            since_date: Buscar desde esta fecha (default: últimos 30 días)
+            subject_filter: Filtrar por asunto que contenga este texto
+            limit: Máximo número de emails (los más recientes); None = todos
+            parsers: Parsers que deciden, solo con los headers, qué cuerpos descargar
+            keep_raw: Si es False, no se conserva raw_email en cada mensaje
+            max_in_flight: Máximo de mensajes descargados y aún no entregados
+                (default: fetch_chunk_size)
         """
         if not self.connection:
             self.connect()
         
         # Seleccionar inbox
-        self.connection.select('INBOX')
+        self._select('INBOX')
         
-        # Construir query de búsqueda
-        if not since_date:
-            since_date = datetime.now() - timedelta(days=30)
+        # Buscar emails
+        uids = self._search_uids(self._since_criteria(sender, since_date))
+        if limit is not None:
+            uids = uids[-limit:]  # Limitar resultados
         
-        date_str = since_date.strftime("%d-%b-%Y")
-        search_criteria = f'(FROM "{sender}" SINCE {date_str})'
+        yield from self._iter_fetch(uids, subject_filter, parsers, keep_raw, max_in_flight)
+    
+    @metrics.instrumented('sync_emails')
+    def sync_emails(
+        self,
+        sender: Senders,
+        mailbox: str = 'INBOX',
+        since_date: Optional[datetime] = None,
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None
+    ) -> List[EmailMessage]:
+        """
+        Sincroniza incrementalmente los emails de un remitente
+        
+        La primera vez (o si cambió el UIDVALIDITY del buzón) hace una
+        búsqueda completa desde `since_date`. Las siguientes veces solo pide
+        `UID n+1:*`, donde n es el UID más alto ya procesado. Un email que no
+        se pudo descargar o decodificar no se da por visto: se vuelve a pedir
+        en la próxima sincronización. Si la conexión se corta, la excepción
+        se propaga y el estado no cambia.
+        
+        Args:
+            sender: Email del remitente o lista de remitentes (un solo SEARCH con OR)
+            mailbox: Buzón a sincronizar
+            since_date: Fecha de inicio para la sincronización completa
+            subject_filter: Filtrar por asunto que contenga este texto
+            parsers: Parsers que deciden, solo con los headers, qué cuerpos descargar
+        """
+        if not self.connection:
+            self.connect()
+        
+        uidvalidity, uidnext = self._select(mailbox)
+        criteria, min_uid, last_uid = self._plan_sync(mailbox, sender, uidvalidity, uidnext, since_date)
+        uids = [uid for uid in self._search_uids(criteria) if int(uid) > min_uid]
+        
+        skipped: Set[int] = set()
+        emails = self._fetch_emails(uids, subject_filter, parsers, skipped)
+        self._finish_sync(mailbox, sender, uidvalidity, last_uid, uids, skipped | {int(e.uid) for e in emails})
+        
+        logger.info(f"Sincronizados {len(emails)} emails nuevos de {sender_key(sender)} ({len(uids)} UIDs)")
+        return emails
+    
+    def watch(
+        self,
+        sender: Senders,
+        handler: Callable[[EmailMessage], None],
+        mailbox: str = 'INBOX',
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        stop_event: Optional[threading.Event] = None,
+        catch_up: bool = True,
+        idle_timeout: float = IDLE_TIMEOUT,
+        poll_interval: float = 30.0
+    ) -> None:
+        """
+        Vigila el buzón y entrega cada email nuevo del remitente a `handler`
+    
+        Usa IMAP IDLE si el servidor lo soporta: el servidor avisa con
+        EXISTS apenas llega un correo y recién ahí se sincroniza; un EXISTS
+        que llega durante la sincronización dispara otra al terminar. Si no
+        hay IDLE, hace NOOP cada `poll_interval` segundos. Si la conexión se cae
+        o el servidor responde con error, espera `poll_interval` segundos y
+        reconecta; mientras no logre reconectar no usa la conexión.
+    
+        Args:
+            sender: Email del remitente o lista de remitentes (un solo SEARCH con OR)
+            handler: Función que recibe cada EmailMessage nuevo (ej: el parser)
+            mailbox: Buzón a vigilar
+            subject_filter: Filtrar por asunto que contenga este texto
+            parsers: Parsers que deciden, solo con los headers, qué cuerpos descargar
+            stop_event: Al activarse, el watch termina (default: corre indefinidamente)
+            catch_up: Si es False, ignora los emails que ya estaban en el buzón
+            idle_timeout: Segundos antes de renovar el IDLE (RFC 2177 pide < 30 min)
+            poll_interval: Segundos entre NOOPs cuando no hay IDLE
+        """
+        stop_event = stop_event or threading.Event()
+        if not self.connection:
+            self.connect()
+        if not catch_up:
+            self._skip_existing(sender, mailbox)
+    
+        changed = True
+        while not stop_event.is_set():
+            try:
+                if not self.connection:
+                    self.connect()
+                    # Pudieron llegar correos mientras no había conexión
+                    changed = True
+                if changed:
+                    for message in self.sync_emails(sender, mailbox, subject_filter=subject_filter, parsers=parsers):
+                        try:
+                            handler(message)
+                        except Exception as e:
+                            logger.error(f"Error procesando email {message.uid}: {e}")
+                    # Un correo que llegó después del SEARCH solo se anuncia en
+                    # las respuestas del FETCH, no en el próximo IDLE
+                    if self._mailbox_grew():
+                        continue
+    
+                if stop_event.is_set():
+                    break
+                if self._supports_idle():
+                    changed = self._idle(idle_timeout, stop_event)
+                else:
+                    changed = self._poll(poll_interval, stop_event)
+            except (imaplib.IMAP4.error, OSError) as e:
+                # IMAP4.error incluye abort (conexión perdida), un LOGIN
+                # rechazado y respuestas inesperadas como un IDLE rechazado
+                logger.warning(f"Error IMAP durante el watch ({e}), reconectando")
+                self.disconnect()
+                if stop_event.wait(poll_interval):
+                    break
+    
+    def _skip_existing(self, sender: Senders, mailbox: str) -> None:
+        """Marca como vistos los emails que ya estaban en el buzón"""
+        uidvalidity, uidnext = self._select(mailbox)
+        key = (mailbox, sender_key(sender))
+        state = self.sync_states.get(key)
+        if not state or state.uidvalidity != uidvalidity:
+            self.sync_states[key] = SyncState(uidvalidity=uidvalidity, last_uid=max(uidnext - 1, 0))
+    
+    def _supports_idle(self) -> bool:
+        return 'IDLE' in getattr(self.connection, 'capabilities', ())
+    
+    def _idle(self, timeout: float, stop_event: threading.Event) -> bool:
+        """Espera en IDLE hasta que llegue un EXISTS, venza el timeout o se pida parar
+    
+        imaplib no implementa IDLE, así que el comando se envía a mano y las
+        respuestas se leen línea a línea. Retorna True si hay mensajes nuevos.
+        """
+        conn = self.connection
+        tag = conn._new_tag()
+        conn.send(tag + b' IDLE\r\n')
+        try:
+            line = conn.readline()
+            if not line.startswith(b'+'):
+                raise imaplib.IMAP4.error(f"IDLE rechazado: {line!r}")
+    
+            changed = False
+            deadline = time.monotonic() + timeout
+            while not changed and not stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self._readable(min(remaining, IDLE_CHECK_INTERVAL)):
+                    changed = self._idle_line(conn.readline())
+    
+            conn.send(b'DONE\r\n')
+            while True:
+                line = conn.readline()
+                if line.startswith(tag):
+                    break
+                changed = self._idle_line(line) or changed
+            return changed
+        finally:
+            conn.tagged_commands.pop(tag, None)
+    
+    def _idle_line(self, line: bytes) -> bool:
+        if not line or line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort(f"El servidor cerró la sesión: {line!r}")
+        if not line.rstrip().upper().endswith(b' EXISTS'):
+            return False
+        self._exists = last_int(line.split()[1:2])
+        return True
+    
+    def _mailbox_grew(self) -> bool:
+        """Indica si llegó un EXISTS con más mensajes que el último conocido
         
+        Los servidores mandan `* n EXISTS` junto a la respuesta de cualquier
+        comando. Si llega durante una sincronización, ese correo no se vuelve
+        a anunciar y el watch debe sincronizar de nuevo.
+        """
+        _, data = self.connection.response('EXISTS')
+        count = last_int(data)
+        if count is None:
+            return False
+        grew = self._exists is None or count > self._exists
+        self._exists = count
+        return grew
+    
+    def _readable(self, timeout: float) -> bool:
+        """Indica si el servidor envió datos, esperando a lo más `timeout` segundos"""
+        sock = self.connection.socket()
+        if isinstance(sock, ssl.SSLSocket) and sock.pending():
+            return True
+        if self._buffered(sock):
+            return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
+    
+    def _buffered(self, sock: socket.socket) -> bool:
+        """Indica si imaplib ya tiene datos leídos del socket sin consumir
+
+        imaplib lee con un buffer: si el servidor mandó "+ idling" y el
+        EXISTS juntos, ambos quedan en el buffer y select() no avisa nada.
+        """
+        previous = sock.gettimeout()
+        sock.settimeout(0)
         try:
-            # Buscar emails
-            typ, data = self.connection.search(None, search_criteria)
-            if typ != 'OK':
-                logger.error(f"Error en búsqueda: {typ}")
-                return []
-            
-            email_ids = data[0].split()
-            email_ids = email_ids[-limit:]  # Limitar resultados
+            return bool(self.connection.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(previous)
+    
+    def _poll(self, interval: float, stop_event: threading.Event) -> bool:
+        """Alternativa a IDLE: NOOP cada `interval` segundos"""
+        if stop_event.wait(interval):
+            return False
+        typ, _ = self.connection.noop()
+        if typ != 'OK':
+            raise imaplib.IMAP4.abort(f"NOOP falló: {typ}")
+        _, data = self.connection.response('EXISTS')
+        count = last_int(data)
+        if count is None:
+            return False
+        self._exists = count
+        return True
+    
+    def _select(self, mailbox: str) -> Tuple[int, int]:
+        """Selecciona el buzón y retorna (UIDVALIDITY, UIDNEXT)
+
+        Si el buzón ya está seleccionado en esta sesión no repite el SELECT;
+        el servidor informa los mensajes nuevos en cada respuesta.
+        """
+        if self._selected and self._selected[0] == mailbox:
+            return self._selected[1], self._selected[2]
+        
+        typ, data = self.connection.select(mailbox)
+        if typ != 'OK':
+            self._selected = None
+            raise imaplib.IMAP4.error(f"No se pudo seleccionar {mailbox}")
+        # imaplib deja el EXISTS del SELECT entre las respuestas: ya se leyó
+        self._exists = last_int(data)
+        self.connection.response('EXISTS')
+        
+        uidvalidity = self._untagged_int('UIDVALIDITY')
+        uidnext = self._untagged_int('UIDNEXT')
+        if uidvalidity is None:
+            # Algunos servidores no lo envían en SELECT
+            typ, data = self.connection.status(mailbox, '(UIDVALIDITY UIDNEXT)')
+            if typ == 'OK':
+                uidvalidity, status_uidnext = self._parse_status(data)
+                uidnext = status_uidnext or uidnext
+        
+        self._selected = (mailbox, uidvalidity or 0, uidnext or 0)
+        return uidvalidity or 0, uidnext or 0
+    
+    def _untagged_int(self, code: str) -> Optional[int]:
+        """Lee un valor numérico de las respuestas no etiquetadas de SELECT"""
+        _, data = self.connection.response(code)
+        return last_int(data)
+    
+    def _search_uids(self, criteria: str) -> List[bytes]:
+        """Ejecuta UID SEARCH y retorna los UIDs encontrados"""
+        with metrics.timed('search'):
+            typ, data = self.connection.uid('SEARCH', None, criteria)
+        if typ != 'OK':
+            # Una lista vacía se confundiría con "no hay emails nuevos"
+            raise imaplib.IMAP4.error(f"Error en búsqueda: {typ}")
+        return data[0].split() if data and data[0] else []
+    
+    def _fetch_emails(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        """Descarga los emails en lotes (un FETCH por lote)"""
+        return list(self._iter_fetch(uids, subject_filter, parsers, skipped=skipped))
+    
+    def _iter_fetch(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        keep_raw: bool = True,
+        chunk_size: Optional[int] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> Iterator[EmailMessage]:
+        """Genera los emails lote a lote
+        
+        Si hay filtro de asunto o parsers, primero se descargan solo los
+        headers y se descartan los emails que no interesan, así nunca se
+        bajan sus cuerpos ni adjuntos. Los UIDs descartados o que no se
+        pueden decodificar se agregan a `skipped`. Los errores de conexión
+        (CONNECTION_ERRORS) se propagan.
+        """
+        for chunk in self._chunks(uids, chunk_size):
+            if self.partial_fetch:
+                yield from self._fetch_text_parts(chunk, subject_filter, parsers, skipped)
+                continue
+            if subject_filter or parsers:
+                chunk = self._filter_by_headers(chunk, subject_filter, parsers, skipped)
+            if chunk:
+                yield from self._fetch_full(chunk, keep_raw, skipped)
+    
+    def _fetch_full(
+        self,
+        uids: List[bytes],
+        keep_raw: bool = True,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        """Descarga el RFC822 completo de un lote con un solo FETCH"""
+        try:
+            raw_by_uid = self._fetch_literals(uids, '(UID RFC822)')
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error descargando lote {build_message_set(uids)}: {e}")
+            return []
+        return self._parse_batch(uids, raw_by_uid, keep_raw, skipped)
+    
+    def _filter_by_headers(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[bytes]:
+        """Descarga solo Subject/From/Date y retorna los UIDs que vale la pena bajar"""
+        selected = []
+        for chunk in self._chunks(uids):
+            try:
+                headers_by_uid = self._fetch_literals(chunk, HEADER_QUERY)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Error descargando headers {build_message_set(chunk)}: {e}")
+                continue
+            selected.extend(self._select_by_headers(chunk, headers_by_uid, subject_filter, parsers, skipped))
+        return selected
+    
+    def _fetch_text_parts(
+        self,
+        uids: List[bytes],
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        skipped: Optional[Set[int]] = None
+    ) -> List[EmailMessage]:
+        """Descarga solo la parte de texto de cada email
+        
+        Un primer FETCH trae BODYSTRUCTURE y headers; luego se pide
+        BODY.PEEK[<parte>] agrupando los emails que comparten número de
+        parte. Imágenes, logos y adjuntos nunca se descargan.
+        """
+        emails = []
+        for chunk in self._chunks(uids):
+            try:
+                typ, data = self._uid_fetch(build_message_set(chunk), STRUCTURE_QUERY)
+                if typ != 'OK':
+                    raise imaplib.IMAP4.error(f"FETCH falló: {typ}")
+                found, pending = self._plan_text_parts(chunk, data, subject_filter, parsers, skipped)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Error descargando estructura {build_message_set(chunk)}: {e}")
+                continue
             
-            emails = []
-            for email_id in email_ids:
+            for section, items in pending.items():
                 try:
-                    email_msg = self._fetch_email(email_id)
-                    if email_msg and (not subject_filter or subject_filter.lower() in email_msg.subject.lower()):
-                        emails.append(email_msg)
+                    bodies = self._fetch_literals([uid for uid, _ in items], f'(UID BODY.PEEK[{section}])')
+                except CONNECTION_ERRORS:
+                    raise
                 except Exception as e:
-                    logger.error(f"Error procesando email {email_id}: {e}")
+                    logger.error(f"Error descargando parte {section}: {e}")
+                    # Sin su parte de texto estos emails no se entregan
+                    for uid, _ in items:
+                        del found[uid]
                     continue
+                self._apply_text_parts(found, items, bodies, skipped)
             
-            logger.info(f"Encontrados {len(emails)} emails de {sender}")
-            return emails
-            
-        except Exception as e:
-            logger.error(f"Error buscando emails: {e}")
-            return []
+            emails.extend(found.values())
+        return emails
     
+    def _fetch_literals(self, uids: List[bytes], query: str) -> Dict[int, bytes]:
+        """Ejecuta un solo UID FETCH sobre el lote y separa la respuesta por UID"""
+        typ, data = self._uid_fetch(build_message_set(uids), query)
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f"FETCH falló: {typ}")
+        return split_literals(data)
+    
+    def _uid_fetch(self, message_set: str, query: str) -> Tuple[str, List[Any]]:
+        """UID FETCH con métricas de duración y bytes recibidos"""
+        with metrics.timed('fetch'):
+            typ, data = self.connection.uid('FETCH', message_set, query)
+        if metrics.enabled():
+            metrics.FETCHED_BYTES.inc(metrics.fetched_bytes(data))
+        return typ, data
+    
+    @metrics.instrumented('fetch_email')
     def _fetch_email(self, email_id: bytes) -> Optional[EmailMessage]:
-        """Obtiene un email por ID"""
+        """Obtiene un email por UID"""
         try:
-            typ, data = self.connection.fetch(email_id, '(RFC822)')
-            if typ != 'OK':
+            typ, data = self._uid_fetch(email_id, '(RFC822)')
+            if typ != 'OK' or not data or not isinstance(data[0], tuple):
                 return None
-            
-            raw_email = data[0][1]
-            email_message = email.message_from_bytes(raw_email)
-            
-            # Extraer información básica
-            subject = self._decode_header(email_message['Subject'])
-            sender = email_message['From']
-            date = email.utils.parsedate_to_datetime(email_message['Date'])
-            
-            # Extraer cuerpo
-            body_html = ""
-            body_text = ""
-            
-            if email_message.is_multipart():
-                for part in email_message.walk():
-                    content_type = part.get_content_type()
-                    if content_type == "text/html":
-                        body_html = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    elif content_type == "text/plain":
-                        body_text = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-            else:
-                content_type = email_message.get_content_type()
-                body = email_message.get_payload(decode=True).decode('utf-8', errors='ignore')
-                if content_type == "text/html":
-                    body_html = body
-                else:
-                    body_text = body
-            
-            return EmailMessage(
-                uid=email_id.decode(),
-                subject=subject,
-                sender=sender,
-                date=date,
-                body_html=body_html,
-                body_text=body_text,
-                raw_email=raw_email
-            )
-            
+            return self._parse_email(email_id.decode(), data[0][1])
+        except CONNECTION_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error decodificando email: {e}")
             return None
     
-    def _decode_header(self, header: str) -> str:
-        """Decodifica headers de email"""
-        if not header:
-            return ""
-        
-        decoded = decode_header(header)[0]
-        if isinstance(decoded[0], bytes):
-            return decoded[0].decode(decoded[1] or 'utf-8', errors='ignore')
-        return str(decoded[0])
-    
     def __enter__(self):
         self.connect()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
\ No newline at end of file
+        self.disconnect()
@@ -0,0 +1,178 @@
+import logging
+import mmap
+import os
+import re
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.email.connection import EmailMessage, Parsers, Senders, parse_email, parse_headers, wants_body
+
+logger = logging.getLogger(__name__)
+
+# Fin de los headers: la primera línea vacía
+HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+# Línea separadora de mbox al inicio de una línea ("From sender fecha")
+MBOX_SEPARATOR = b'\nFrom '
+
+# (uid, headers, función que carga el mensaje completo)
+RawMessage = Tuple[str, bytes, Callable[[], bytes]]
+
+MBOX = 'mbox'
+MAILDIR = 'maildir'
+EML = 'eml'
+
+
+class OfflineSource:
+    """Emails desde archivos locales: mbox, Maildir o un directorio de .eml
+
+    Entrada para importaciones masivas (ej: el mbox de Google Takeout, de
+    varios GB) y benchmarks reproducibles. Expone iter_emails como el
+    conector IMAP y entrega los mismos EmailMessage.
+
+    Los mbox se recorren con mmap: solo se buscan los separadores, sin
+    cargar el archivo a memoria. De cada mensaje se decodifican primero los
+    headers; el cuerpo solo si pasa los filtros (remitente, asunto,
+    parsers.should_fetch).
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None):
+        """
+        Args:
+            path: Archivo mbox, directorio Maildir, directorio con .eml o un .eml
+            format: 'mbox', 'maildir' o 'eml' (default: se detecta por la ruta)
+        """
+        self.path = path
+        self.format = format or detect_format(path)
+        if self.format not in (MBOX, MAILDIR, EML):
+            raise ValueError(f"Formato no soportado: {format}")
+
+    def iter_emails(
+        self,
+        sender: Optional[Senders] = None,
+        subject_filter: Optional[str] = None,
+        parsers: Optional[Parsers] = None,
+        keep_raw: bool = False
+    ) -> Iterator[EmailMessage]:
+        """
+        Genera los emails uno a uno
+
+        Args:
+            sender: Remitente o lista de remitentes; como FROM en IMAP,
+                basta que aparezca en el header From (ej: "@bancochile.cl")
+            subject_filter: Texto que debe contener el asunto
+            parsers: Si se pasan, solo se decodifican los emails que algún
+                parser quiere según sus headers (should_fetch)
+            keep_raw: Conservar el email crudo en raw_email
+        """
+        senders = _sender_filter(sender)
+        for uid, headers, load in self._messages():
+            try:
+                header_msg = parse_headers(uid, headers)
+            except Exception as e:
+                logger.error(f"Error leyendo headers de {uid}: {e}")
+                continue
+            if senders and not any(s in header_msg.sender.lower() for s in senders):
+                continue
+            if subject_filter and subject_filter.lower() not in header_msg.subject.lower():
+                continue
+            if parsers and not wants_body(parsers, header_msg):
+                continue
+            try:
+                yield parse_email(uid, load(), keep_raw)
+            except Exception as e:
+                logger.error(f"Error procesando email {uid}: {e}")
+
+    def _messages(self) -> Iterator[RawMessage]:
+        """Mensajes del origen; el cuerpo se carga solo si se pide"""
+        if self.format == MBOX:
+            return _mbox_messages(self.path)
+        if self.format == MAILDIR:
+            return _file_messages(_maildir_files(self.path), self.path)
+        if os.path.isfile(self.path):
+            return _file_messages([self.path], os.path.dirname(self.path))
+        return _file_messages(_eml_files(self.path), self.path)
+
+
+def detect_format(path: str) -> str:
+    if os.path.isdir(path):
+        if os.path.isdir(os.path.join(path, 'cur')) or os.path.isdir(os.path.join(path, 'new')):
+            return MAILDIR
+        return EML
+    if path.lower().endswith('.eml'):
+        return EML
+    return MBOX
+
+
+def mbox_offsets(data) -> Iterator[Tuple[int, int]]:
+    """(inicio, fin) de cada mensaje de un mbox, sin la línea "From "
+
+    `data` puede ser bytes o un mmap: solo se buscan los separadores.
+    """
+    if data[:5] != b'From ':
+        start = data.find(MBOX_SEPARATOR)
+        if start < 0:
+            return
+        start += 1
+    else:
+        start = 0
+    size = len(data)
+    while start < size:
+        next_separator = data.find(MBOX_SEPARATOR, start)
+        end = next_separator if next_separator >= 0 else size
+        # El cuerpo empieza después de la línea "From ..."
+        body_start = data.find(b'\n', start, end)
+        if body_start >= 0:
+            yield body_start + 1, end
+        if next_separator < 0:
+            break
+        start = next_separator + 1
+
+
+def _mbox_messages(path: str) -> Iterator[RawMessage]:
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in mbox_offsets(data):
+                header_end = HEADER_END_RE.search(data, start, end)
+                headers = data[start:header_end.end() if header_end else end]
+                # El uid es el offset en el archivo: estable entre lecturas
+                yield str(start), headers, lambda start=start, end=end: data[start:end]
+
+
+def _file_messages(paths: List[str], root: str) -> Iterator[RawMessage]:
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except OSError as e:
+            logger.error(f"No se pudo leer {path}: {e}")
+            continue
+        header_end = HEADER_END_RE.search(raw)
+        headers = raw[:header_end.end()] if header_end else raw
+        yield os.path.relpath(path, root), headers, lambda raw=raw: raw
+
+
+def _maildir_files(path: str) -> List[str]:
+    files = []
+    for subdir in ('cur', 'new'):
+        directory = os.path.join(path, subdir)
+        if os.path.isdir(directory):
+            files += [
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if not name.startswith('.')
+            ]
+    return files
+
+
+def _eml_files(path: str) -> List[str]:
+    files = []
+    for directory, _, names in os.walk(path):
+        files += [os.path.join(directory, name) for name in names if name.lower().endswith('.eml')]
+    return sorted(files)
+
+
+def _sender_filter(sender: Optional[Senders]) -> List[str]:
+    if not sender:
+        return []
+    senders = [sender] if isinstance(sender, str) else list(sender)
+    return [s.lower() for s in senders]
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from app.email.connection import CONNECTION_ERRORS, EmailConnector
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# (proveedor, cuenta, digest de la contraseña)
+PoolKey = Tuple[str, str, str]
+
+
+class ConnectionPool:
+    """Pool de sesiones IMAP autenticadas por (proveedor, cuenta, credenciales)
+
+    Mantiene vivas las conexiones entre ciclos de sincronización para no
+    repetir el handshake TLS + LOGIN en cada poll. Antes de entregar una
+    sesión la verifica con NOOP y reconecta si murió. Limita las sesiones
+    abiertas por proveedor (Gmail, por ejemplo, limita conexiones y logins).
+
+    Una sesión libre solo se entrega a quien pide la misma cuenta con la
+    misma contraseña (se compara un digest, no se guarda otra copia) y las
+    mismas opciones del conector.
+    """
+
+    def __init__(
+        self,
+        max_sessions_per_provider: int = 10,
+        max_idle_seconds: float = 600.0,
+        acquire_timeout: Optional[float] = 30.0,
+        connector_factory: Callable[..., EmailConnector] = EmailConnector
+    ):
+        self.max_sessions_per_provider = max_sessions_per_provider
+        self.max_idle_seconds = max_idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.connector_factory = connector_factory
+        # Sesiones libres por clave, con la hora en que se liberaron y las
+        # opciones (kwargs) con que se creó el conector
+        self._idle: Dict[PoolKey, List[Tuple[EmailConnector, float, Dict[str, Any]]]] = defaultdict(list)
+        # Sesiones abiertas (libres + en uso) por proveedor
+        self._open: Dict[str, int] = defaultdict(int)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def session(self, email_address: str, password: str, provider: str = 'gmail', **kwargs) -> Iterator[EmailConnector]:
+        """
+        Entrega una sesión autenticada y la devuelve al pool al terminar
+
+        Si durante el uso la conexión se cae (los métodos del conector
+        propagan CONNECTION_ERRORS), la sesión se descarta y el próximo
+        llamador recibe una nueva.
+
+        Args:
+            email_address: Cuenta de email
+            password: Contraseña o app password
+            provider: Proveedor (gmail, outlook)
+            **kwargs: Opciones para crear el conector (ej: fetch_chunk_size)
+        """
+        key = self._key(provider, email_address, password)
+        connector = self._checkout(key, email_address, password, **kwargs)
+        self._ensure_connected(connector)
+        try:
+            yield connector
+        except CONNECTION_ERRORS:
+            self._discard(connector)
+            raise
+        except BaseException:
+            self._checkin(key, connector, kwargs)
+            raise
+        else:
+            self._checkin(key, connector, kwargs)
+
+    def run(
+        self,
+        email_address: str,
+        password: str,
+        func: Callable[[EmailConnector], T],
+        provider: str = 'gmail',
+        retries: int = 1,
+        **kwargs
+    ) -> T:
+        """Ejecuta func(conector) reintentando con una sesión nueva si la conexión se cae"""
+        attempt = 0
+        while True:
+            try:
+                with self.session(email_address, password, provider, **kwargs) as connector:
+                    return func(connector)
+            except CONNECTION_ERRORS as e:
+                attempt += 1
+                if attempt > retries:
+                    raise
+                logger.warning(f"Conexión IMAP perdida ({e}), reintentando")
+
+    def close_all(self) -> None:
+        """Cierra todas las sesiones libres"""
+        with self._cond:
+            idle = [connector for sessions in self._idle.values() for connector, _, _ in sessions]
+            self._idle.clear()
+        for connector in idle:
+            self._discard(connector)
+
+    def stats(self) -> Dict[str, int]:
+        """Sesiones abiertas por proveedor"""
+        with self._cond:
+            return dict(self._open)
+
+    def _key(self, provider: str, email_address: str, password: str) -> PoolKey:
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return provider.lower(), email_address.lower(), digest
+
+    def _checkout(self, key: PoolKey, email_address: str, password: str, **kwargs) -> EmailConnector:
+        provider = key[0]
+        stale = []
+        deadline = time.monotonic() + self.acquire_timeout if self.acquire_timeout is not None else None
+        try:
+            with self._cond:
+                while True:
+                    idle = self._idle[key]
+                    while idle:
+                        connector, released_at, options = idle.pop()
+                        if time.monotonic() - released_at <= self.max_idle_seconds and options == kwargs:
+                            return connector
+                        # Vencida o creada con otras opciones: se cierra
+                        stale.append(connector)
+                        self._open[provider] -= 1
+
+                    if self._open[provider] < self.max_sessions_per_provider:
+                        self._open[provider] += 1
+                        break
+
+                    # Límite alcanzado: liberar una sesión ociosa de otra cuenta del mismo proveedor
+                    victim = self._pop_idle(provider)
+                    if victim:
+                        stale.append(victim)
+                        break
+
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No hay sesiones IMAP disponibles para {provider}")
+                    self._cond.wait(remaining)
+        finally:
+            for connector in stale:
+                connector.disconnect()
+
+        return self.connector_factory(email_address, password, provider, **kwargs)
+
+    def _pop_idle(self, provider: str) -> Optional[EmailConnector]:
+        for (idle_provider, _, _), sessions in self._idle.items():
+            if idle_provider == provider and sessions:
+                return sessions.pop(0)[0]
+        return None
+
+    def _ensure_connected(self, connector: EmailConnector) -> None:
+        """Conecta la sesión o, si ya estaba abierta, la verifica con NOOP"""
+        if connector.connection and connector.noop():
+            return
+        if connector.connection:
+            logger.info(f"Sesión IMAP de {connector.email_address} caída, reconectando")
+            connector.disconnect()
+        try:
+            connector.connect()
+        except Exception:
+            self._release_slot(connector.provider)
+            raise
+
+    def _checkin(self, key: PoolKey, connector: EmailConnector, options: Dict[str, Any]) -> None:
+        if not connector.connection:
+            self._release_slot(key[0])
+            return
+        with self._cond:
+            self._idle[key].append((connector, time.monotonic(), options))
+            self._cond.notify()
+
+    def _discard(self, connector: EmailConnector) -> None:
+        connector.disconnect()
+        self._release_slot(connector.provider)
+
+    def _release_slot(self, provider: str) -> None:
+        with self._cond:
+            self._open[provider] = max(0, self._open[provider] - 1)
+            self._cond.notify()
@@ -0,0 +1,12 @@
+from sqlalchemy import Engine
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    """Base declarativa de los modelos"""
+    pass
+
+
+def create_tables(engine: Engine) -> None:
+    """Crea las tablas que falten (para tests y desarrollo local; en producción usar alembic)"""
+    Base.metadata.create_all(engine)
@@ -0,0 +1,193 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, JSON, String, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from app.core import metrics
+from app.models.base import Base
+from app.parsers.base import Transaction, TransactionType
+
+# Filas por INSERT: SQLite acepta hasta 32766 parámetros por sentencia
+UPSERT_BATCH_SIZE = 1000
+
+# Columnas que identifican el email de origen de una transacción. No se usa
+# el UID: tras un cambio de UIDVALIDITY el mismo email vuelve con otro UID
+DEDUP_COLUMNS = ('account', 'message_id')
+
+
+class TransactionRecord(Base):
+    """Transacción persistida
+
+    Una fila por email: (account, message_id) es único, así volver a
+    sincronizar un buzón no duplica transacciones, ni siquiera tras un
+    cambio de UIDVALIDITY o con el mismo email en dos buzones (etiquetas de
+    Gmail). message_id es el header Message-ID o, si el email no lo trae,
+    el hash del contenido (message_hash). mailbox, uidvalidity y email_id
+    (el UID) indican dónde se vio el email por última vez.
+    """
+    __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_dedup", *DEDUP_COLUMNS, unique=True),
+        # Consultas del dashboard: por rango de fechas y por categoría
+        Index("ix_transactions_user_date", "user_id", "date"),
+        Index("ix_transactions_user_category", "user_id", "category"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(64))
+    account: Mapped[str] = mapped_column(String(255))
+    mailbox: Mapped[str] = mapped_column(String(255))
+    uidvalidity: Mapped[int] = mapped_column(BigInteger, default=0)
+    email_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    message_id: Mapped[str] = mapped_column(String(255))
+    bank: Mapped[str] = mapped_column(String(50))
+    type: Mapped[str] = mapped_column(String(20))
+    # Pesos enteros (CLP)
+    amount: Mapped[int] = mapped_column(BigInteger)
+    description: Mapped[str] = mapped_column(String(255))
+    date: Mapped[datetime] = mapped_column(DateTime)
+    merchant: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    last_digits: Mapped[Optional[str]] = mapped_column(String(4), nullable=True)
+    category: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    raw_data: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_transaction(self) -> Transaction:
+        return Transaction(
+            bank=self.bank,
+            type=TransactionType(self.type),
+            amount=self.amount,
+            description=self.description,
+            date=self.date,
+            merchant=self.merchant,
+            last_digits=self.last_digits,
+            email_id=self.email_id,
+            raw_data=self.raw_data,
+            category=self.category,
+            message_id=self.message_id,
+        )
+
+    def __repr__(self):
+        return f"TransactionRecord({self.user_id}, {self.type}, ${self.amount}, {self.date})"
+
+
+def message_hash(transaction: Transaction) -> str:
+    """Identificador de una transacción sin email_id, a partir de su contenido"""
+    digest = hashlib.sha256()
+    for value in (
+        transaction.bank,
+        transaction.type.value,
+        str(transaction.amount),
+        transaction.date.isoformat(),
+        transaction.merchant or '',
+        transaction.last_digits or '',
+        transaction.description,
+    ):
+        digest.update(value.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def message_key(transaction: Transaction) -> str:
+    """Identidad estable del email de una transacción: Message-ID o message_hash
+
+    Sobrevive a un cambio de UIDVALIDITY (el UID no). La usan la tabla
+    transactions y AggregateStore.
+    """
+    return transaction.message_id or message_hash(transaction)
+
+
+def transaction_row(
+    transaction: Transaction,
+    user_id: str,
+    account: str,
+    mailbox: str = 'INBOX',
+    uidvalidity: Optional[int] = None
+) -> Dict[str, Any]:
+    """Fila de la tabla transactions para una Transaction parseada
+
+    Si la transacción trae UID (email_id) se necesita el UIDVALIDITY del
+    buzón del que salió: un UID sin él no dice a qué email apunta.
+    """
+    if transaction.email_id and uidvalidity is None:
+        raise ValueError("Se necesita el UIDVALIDITY del buzón para guardar transacciones por UID")
+    return {
+        'user_id': user_id,
+        'account': account.lower(),
+        'mailbox': mailbox,
+        'uidvalidity': uidvalidity or 0,
+        'email_id': transaction.email_id or None,
+        'message_id': message_key(transaction),
+        'bank': transaction.bank,
+        'type': transaction.type.value,
+        'amount': int(transaction.amount),
+        'description': transaction.description,
+        'date': transaction.date,
+        'merchant': transaction.merchant,
+        'last_digits': transaction.last_digits,
+        'category': transaction.category,
+        'raw_data': transaction.raw_data or None,
+    }
+
+
+@metrics.instrumented('persist')
+def upsert_transactions(
+    session: Session,
+    transactions: Iterable[Transaction],
+    user_id: str,
+    account: str,
+    mailbox: str = 'INBOX',
+    uidvalidity: Optional[int] = None,
+    batch_size: int = UPSERT_BATCH_SIZE
+) -> int:
+    """
+    Inserta o actualiza transacciones con un INSERT ... ON CONFLICT por lote
+
+    Una sola sentencia por cada `batch_size` filas en vez de un add por fila
+    del ORM. Si el email ya estaba guardado se actualizan sus datos, salvo
+    la categoría: si el usuario ya la asignó, se conserva. Tras un cambio
+    de UIDVALIDITY el re-sync completo actualiza el UID de las filas
+    existentes en vez de duplicarlas.
+    No hace commit.
+
+    `uidvalidity` es el del buzón al sincronizar (ver SyncState); es
+    obligatorio si alguna transacción trae email_id.
+
+    Returns:
+        Cantidad de filas enviadas (insertadas o actualizadas)
+    """
+    # Dentro de un mismo INSERT una clave no puede repetirse (PostgreSQL
+    # rechaza actualizar dos veces la misma fila): gana la última
+    rows_by_key: Dict[tuple, Dict[str, Any]] = {}
+    for transaction in transactions:
+        row = transaction_row(transaction, user_id, account, mailbox, uidvalidity)
+        rows_by_key[tuple(row[column] for column in DEDUP_COLUMNS)] = row
+    rows = list(rows_by_key.values())
+
+    insert = _dialect_insert(session)
+    for start in range(0, len(rows), batch_size):
+        statement = insert(TransactionRecord).values(rows[start:start + batch_size])
+        excluded = statement.excluded
+        updated = {
+            column: getattr(excluded, column)
+            for column in rows[0]
+            if column not in DEDUP_COLUMNS and column != 'category'
+        }
+        updated['category'] = func.coalesce(TransactionRecord.category, excluded.category)
+        updated['updated_at'] = func.now()
+        session.execute(statement.on_conflict_do_update(index_elements=list(DEDUP_COLUMNS), set_=updated))
+    metrics.TRANSACTIONS_PERSISTED.inc(len(rows))
+    return len(rows)
+
+
+def _dialect_insert(session: Session):
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert
+    if dialect == 'sqlite':
+        return sqlite.insert
+    raise ValueError(f"Upsert no soportado para {dialect}")
@@ -1,15 +1,42 @@
 import re
-from decimal import Decimal
 from datetime import datetime
-from typing import Optional
-from bs4 import BeautifulSoup
+from typing import Dict, Match, Optional, Pattern, Tuple
 import logging
 
+from app.core import metrics
 from app.parsers.base import BaseParser, Transaction, TransactionType
+from app.parsers.text import extract_text
 from app.email.connection import EmailMessage
 
 logger = logging.getLogger(__name__)
 
+# Campos comunes del cuerpo (la rama completa de cada uno es un grupo con nombre)
+AMOUNT_PATTERN = r'(?P<amount>\$\s*(?P<amount_value>[\d.]+))'
+DATE_PATTERN = r'(?P<date>(?P<day>\d{2})/(?P<month>\d{2})/(?P<year>\d{4})\s+(?P<hour>\d{2}):(?P<minute>\d{2}))'
+ACCOUNT_PATTERN = r'(?P<account>\*{4}(?P<account_value>\d{4}))'
+
+AMOUNT_RE = re.compile(AMOUNT_PATTERN)
+DATE_RE = re.compile(DATE_PATTERN)
+ACCOUNT_RE = re.compile(ACCOUNT_PATTERN)
+# Contraparte cortada de una plantilla: sin tags, entidades ni saltos de línea
+PARTY_RE = re.compile(r'[^<>&\n]+')
+
+
+def _compile_fields(counterparty: Tuple[Optional[str], Optional[str]]) -> Pattern:
+    """Une los patrones de campos en un solo regex
+
+    Cada rama va dentro de un lookahead: no consume texto, así un solo
+    finditer entrega la primera aparición de cada campo aunque se solapen
+    (ej: el comercio "en X el DD/MM" contiene el inicio de la fecha).
+    """
+    party, alt = counterparty
+    branches = [AMOUNT_PATTERN, DATE_PATTERN, ACCOUNT_PATTERN]
+    if party:
+        branches.append(f"(?P<party>{party})")
+    if alt:
+        branches.append(f"(?P<alt>{alt})")
+    return re.compile(f"(?=(?:{'|'.join(branches)}))")
+
 
 class BancoChileParser(BaseParser):
     """Parser para emails del Banco de Chile
@@ -23,6 +50,9 @@ class BancoChileParser(BaseParser):
     """
 
     SENDER_EMAIL = "enviodigital@bancochile.cl"
+    SENDERS = (SENDER_EMAIL,)
+    # 2: montos en pesos enteros (int) en vez de Decimal
+    VERSION = 2
 
     # Subjects que debemos ignorar (no son transacciones)
     IGNORED_SUBJECTS = [
@@ -46,97 +76,196 @@ class BancoChileParser(BaseParser):
         ],
     }
 
+    IGNORED_RE = re.compile('|'.join(re.escape(subject) for subject in IGNORED_SUBJECTS))
+
+    # Una sola alternación; cada rama prueba todo el asunto antes de pasar a
+    # la siguiente, así se respeta el orden de SUBJECT_PATTERNS
+    TYPE_RE = re.compile(
+        '|'.join(
+            f"(?:.*?(?P<{tx_type.value}>{'|'.join(patterns)}))"
+            for tx_type, patterns in SUBJECT_PATTERNS.items()
+        ),
+        re.DOTALL,
+    )
+
+    # Contraparte por tipo: (patrón principal, alternativo si el principal no aparece)
+    COUNTERPARTY_PATTERNS = {
+        TransactionType.COMPRA: (r'en\s+(?P<party_value>.+?)\s+el\s+\d{2}/\d{2}', None),
+        TransactionType.GIRO: (None, None),
+        TransactionType.TRANSFERENCIA: (
+            r'(?i:a\s+(?P<party_value>[^$\n]+?)\s+por)',
+            r'(?i:destinatario[:\s]+(?P<alt_value>[^<\n]+))',
+        ),
+        TransactionType.ABONO: (
+            r'(?i:de\s+(?P<party_value>[^$\n]+?)\s+por)',
+            r'(?i:origen[:\s]+(?P<alt_value>[^<\n]+))',
+        ),
+    }
+
+    TEMPLATE_VALIDATORS = {
+        'amount': AMOUNT_RE,
+        'date': DATE_RE,
+        'account': ACCOUNT_RE,
+        'party': PARTY_RE,
+    }
+
+    FIELD_RES = {
+        tx_type: _compile_fields(counterparty)
+        for tx_type, counterparty in COUNTERPARTY_PATTERNS.items()
+    }
+
     def can_parse(self, email_message: EmailMessage) -> bool:
         """Verifica si es un email del Banco de Chile"""
         return self.SENDER_EMAIL in email_message.sender.lower()
 
+    def should_fetch(self, email_message: EmailMessage) -> bool:
+        """Solo descarga el cuerpo de emails transaccionales (no cartolas ni otros avisos)"""
+        if not self.can_parse(email_message):
+            return False
+        subject_lower = email_message.subject.lower()
+        return not self._is_ignored(subject_lower) and self._detect_type(subject_lower) is not None
+
     def parse(self, email_message: EmailMessage) -> Optional[Transaction]:
         """Parsea el email según su tipo"""
         subject_lower = email_message.subject.lower()
 
         # Ignorar emails que no son transacciones
-        for ignored in self.IGNORED_SUBJECTS:
-            if ignored in subject_lower:
-                logger.debug(f"Ignorando email no transaccional: {email_message.subject}")
-                return None
+        if self._is_ignored(subject_lower):
+            logger.debug(f"Ignorando email no transaccional: {email_message.subject}")
+            metrics.skipped('no_transaccional')
+            return None
 
         # Detectar tipo de transacción
         transaction_type = self._detect_type(subject_lower)
         if not transaction_type:
             logger.warning(f"Tipo de transacción no reconocido: {email_message.subject}")
+            metrics.skipped('tipo_desconocido')
             return None
 
-        # Extraer texto del HTML
-        text = self._extract_text(email_message.body_html)
-
         # Parsear según tipo
+        transaction = None
         try:
+            values = self._extract_fields(email_message.body_html, transaction_type)
             if transaction_type == TransactionType.COMPRA:
-                return self._parse_compra(email_message, text)
+                transaction = self._parse_compra(email_message, values)
             elif transaction_type == TransactionType.GIRO:
-                return self._parse_giro(email_message, text)
+                transaction = self._parse_giro(email_message, values)
             elif transaction_type == TransactionType.TRANSFERENCIA:
-                return self._parse_transferencia(email_message, text)
+                transaction = self._parse_transferencia(email_message, values)
             elif transaction_type == TransactionType.ABONO:
-                return self._parse_abono(email_message, text)
+                transaction = self._parse_abono(email_message, values)
         except Exception as e:
             logger.error(f"Error parseando email Banco Chile: {e}")
-            return None
 
-        return None
+        if transaction is None:
+            metrics.PARSE_FAILURES.inc(bank=self.bank_name, type=transaction_type.value)
+        else:
+            metrics.TRANSACTIONS_PARSED.inc(bank=self.bank_name, type=transaction_type.value)
+        return transaction
+
+    def _is_ignored(self, subject_lower: str) -> bool:
+        """Indica si el asunto corresponde a un email no transaccional"""
+        return self.IGNORED_RE.search(subject_lower) is not None
 
     def _detect_type(self, subject_lower: str) -> Optional[TransactionType]:
         """Detecta el tipo de transacción basado en el asunto"""
-        for tx_type, patterns in self.SUBJECT_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, subject_lower):
-                    return tx_type
-        return None
+        match = self.TYPE_RE.match(subject_lower)
+        return TransactionType(match.lastgroup) if match else None
 
+    @metrics.instrumented('html_text')
     def _extract_text(self, html: str) -> str:
         """Extrae texto limpio del HTML"""
-        if not html:
-            return ""
-        soup = BeautifulSoup(html, 'html.parser')
-        for tag in soup(['script', 'style', 'head']):
-            tag.decompose()
-        return soup.get_text(separator=' ', strip=True)
+        return extract_text(html)
+
+    def _extract_fields(self, html: str, transaction_type: TransactionType) -> Dict[str, str]:
+        """Campos crudos del email (amount, date, account, party)
 
-    def _parse_amount(self, text: str) -> Optional[Decimal]:
-        """Extrae el monto del texto
+        Si el HTML calza con una plantilla ya vista, los campos se cortan
+        directo del HTML; si no, se extrae el texto, se escanea y se aprende
+        la plantilla para los próximos emails.
+        """
+        values = self._template_values(html, transaction_type.value)
+        if values is not None:
+            return values
+
+        # Extraer texto del HTML y sus campos en una sola pasada
+        text = self._extract_text(html)
+        values = self._field_values(self._scan_fields(text, transaction_type))
+        self._learn_template(html, transaction_type.value, values)
+        return values
+
+    @metrics.instrumented('regex')
+    def _scan_fields(self, text: str, transaction_type: TransactionType) -> Dict[str, Match]:
+        """Recorre el texto una sola vez y retorna la primera aparición de cada campo
+
+        Las claves son amount, date, account, party (contraparte) y alt
+        (contraparte con el patrón alternativo). Se deja de recorrer apenas
+        están todos los campos necesarios.
+        """
+        pattern = self.FIELD_RES[transaction_type]
+        required = 4 if 'party' in pattern.groupindex else 3
+        fields: Dict[str, Match] = {}
+        for match in pattern.finditer(text):
+            name = match.lastgroup
+            if name in fields:
+                continue
+            fields[name] = match
+            if len(fields.keys() - {'alt'}) == required:
+                break
+        return fields
+
+    def _field_values(self, fields: Dict[str, Match]) -> Dict[str, str]:
+        """Texto crudo de cada campo escaneado"""
+        values = {}
+        for name in ('amount', 'date', 'account'):
+            if name in fields:
+                values[name] = fields[name].group(name)
+        if 'party' in fields:
+            values['party'] = fields['party'].group('party_value')
+        elif 'alt' in fields:
+            values['party'] = fields['alt'].group('alt_value')
+        return values
+
+    def _parse_amount(self, values: Dict[str, str]) -> Optional[int]:
+        """Extrae el monto
 
         Formatos:
         - $30.000
         - $5.390
         - $50
         """
-        match = re.search(r'\$\s*([\d.]+)', text)
+        match = AMOUNT_RE.fullmatch(values.get('amount', ''))
         if not match:
             return None
-        # Remover puntos de miles y convertir
-        amount_str = match.group(1).replace('.', '')
-        return Decimal(amount_str)
+        # Remover puntos de miles: los montos en CLP son pesos enteros
+        amount_str = match.group('amount_value').replace('.', '')
+        return int(amount_str)
 
-    def _parse_date(self, text: str) -> Optional[datetime]:
-        """Extrae fecha y hora del texto
+    def _parse_date(self, values: Dict[str, str]) -> Optional[datetime]:
+        """Extrae fecha y hora
 
         Formato: DD/MM/YYYY HH:MM
         """
-        match = re.search(r'(\d{2})/(\d{2})/(\d{4})\s+(\d{2}):(\d{2})', text)
+        match = DATE_RE.fullmatch(values.get('date', ''))
         if not match:
             return None
-        dia, mes, año, hora, minuto = match.groups()
+        dia, mes, año, hora, minuto = match.group('day', 'month', 'year', 'hour', 'minute')
         return datetime(int(año), int(mes), int(dia), int(hora), int(minuto))
 
-    def _parse_account(self, text: str) -> Optional[str]:
+    def _parse_account(self, values: Dict[str, str]) -> Optional[str]:
         """Extrae los últimos 4 dígitos de la cuenta
 
         Formato: ****3204
         """
-        match = re.search(r'\*{4}(\d{4})', text)
-        return match.group(1) if match else None
+        match = ACCOUNT_RE.fullmatch(values.get('account', ''))
+        return match.group('account_value') if match else None
 
-    def _parse_compra(self, email_message: EmailMessage, text: str) -> Optional[Transaction]:
+    def _parse_counterparty(self, values: Dict[str, str]) -> Optional[str]:
+        """Extrae comercio, destinatario u origen"""
+        party = values.get('party')
+        return party.strip() if party else None
+
+    def _parse_compra(self, email_message: EmailMessage, values: Dict[str, str]) -> Optional[Transaction]:
         """Parsea email de compra/cargo en cuenta
 
         Formato esperado:
@@ -144,20 +273,19 @@ class BancoChileParser(BaseParser):
          con cargo a Cuenta ****XXXX en COMERCIO el DD/MM/YYYY HH:MM."
         """
         # Extraer monto
-        amount = self._parse_amount(text)
+        amount = self._parse_amount(values)
         if not amount:
             logger.error("No se encontró monto en email de compra")
             return None
 
-        # Extraer comercio - está entre "en " y " el DD/MM"
-        comercio_match = re.search(r'en\s+(.+?)\s+el\s+\d{2}/\d{2}', text)
-        comercio = comercio_match.group(1).strip() if comercio_match else None
+        # Comercio - está entre "en " y " el DD/MM"
+        comercio = self._parse_counterparty(values)
 
         # Extraer fecha
-        fecha = self._parse_date(text) or email_message.date
+        fecha = self._parse_date(values) or email_message.date
 
         # Extraer cuenta
-        cuenta = self._parse_account(text)
+        cuenta = self._parse_account(values)
 
         return Transaction(
             bank="banco_chile",
@@ -168,12 +296,13 @@ class BancoChileParser(BaseParser):
             merchant=comercio,
             last_digits=cuenta,
             email_id=email_message.uid,
+            message_id=email_message.message_id or None,
             raw_data={
                 'subject': email_message.subject,
             }
         )
 
-    def _parse_giro(self, email_message: EmailMessage, text: str) -> Optional[Transaction]:
+    def _parse_giro(self, email_message: EmailMessage, values: Dict[str, str]) -> Optional[Transaction]:
         """Parsea email de giro en cajero
 
         Formato esperado:
@@ -181,16 +310,16 @@ class BancoChileParser(BaseParser):
          con cargo a Cuenta ****XXXX el DD/MM/YYYY HH:MM."
         """
         # Extraer monto
-        amount = self._parse_amount(text)
+        amount = self._parse_amount(values)
         if not amount:
             logger.error("No se encontró monto en email de giro")
             return None
 
         # Extraer fecha
-        fecha = self._parse_date(text) or email_message.date
+        fecha = self._parse_date(values) or email_message.date
 
         # Extraer cuenta
-        cuenta = self._parse_account(text)
+        cuenta = self._parse_account(values)
 
         return Transaction(
             bank="banco_chile",
@@ -201,28 +330,24 @@ class BancoChileParser(BaseParser):
             merchant="Cajero automático",
             last_digits=cuenta,
             email_id=email_message.uid,
+            message_id=email_message.message_id or None,
             raw_data={
                 'subject': email_message.subject,
             }
         )
 
-    def _parse_transferencia(self, email_message: EmailMessage, text: str) -> Optional[Transaction]:
+    def _parse_transferencia(self, email_message: EmailMessage, values: Dict[str, str]) -> Optional[Transaction]:
         """Parsea email de transferencia realizada"""
-        amount = self._parse_amount(text)
+        amount = self._parse_amount(values)
         if not amount:
             logger.error("No se encontró monto en email de transferencia")
             return None
 
-        # Buscar destinatario
-        destinatario = None
-        for pattern in [r'a\s+([^$\n]+?)\s+por', r'destinatario[:\s]+([^<\n]+)']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                destinatario = match.group(1).strip()
-                break
+        # Destinatario: "a X por" o "Destinatario: X"
+        destinatario = self._parse_counterparty(values)
 
-        fecha = self._parse_date(text) or email_message.date
-        cuenta = self._parse_account(text)
+        fecha = self._parse_date(values) or email_message.date
+        cuenta = self._parse_account(values)
 
         return Transaction(
             bank="banco_chile",
@@ -233,26 +358,22 @@ class BancoChileParser(BaseParser):
             merchant=destinatario,
             last_digits=cuenta,
             email_id=email_message.uid,
+            message_id=email_message.message_id or None,
             raw_data={'subject': email_message.subject}
         )
 
-    def _parse_abono(self, email_message: EmailMessage, text: str) -> Optional[Transaction]:
+    def _parse_abono(self, email_message: EmailMessage, values: Dict[str, str]) -> Optional[Transaction]:
         """Parsea email de abono recibido"""
-        amount = self._parse_amount(text)
+        amount = self._parse_amount(values)
         if not amount:
             logger.error("No se encontró monto en email de abono")
             return None
 
-        # Buscar origen
-        origen = None
-        for pattern in [r'de\s+([^$\n]+?)\s+por', r'origen[:\s]+([^<\n]+)']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                origen = match.group(1).strip()
-                break
+        # Origen: "de X por" u "Origen: X"
+        origen = self._parse_counterparty(values)
 
-        fecha = self._parse_date(text) or email_message.date
-        cuenta = self._parse_account(text)
+        fecha = self._parse_date(values) or email_message.date
+        cuenta = self._parse_account(values)
 
         return Transaction(
             bank="banco_chile",
@@ -263,5 +384,6 @@ class BancoChileParser(BaseParser):
             merchant=origen,
             last_digits=cuenta,
             email_id=email_message.uid,
+            message_id=email_message.message_id or None,
             raw_data={'subject': email_message.subject}
         )
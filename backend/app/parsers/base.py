@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+import sys
+from typing import Optional, Dict, Any, Pattern, Tuple, Union
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 
+from app.core import metrics
+from app.parsers.templates import TemplateCache
+
 class TransactionType(str, Enum):
     COMPRA = "compra"
     TRANSFERENCIA = "transferencia"
@@ -12,19 +16,45 @@ class TransactionType(str, Enum):
     OTRO = "otro"
 
 class Transaction:
-    """Modelo de transacción parseada"""
+    """Modelo de transacción parseada
+    
+    Usa __slots__ para no cargar un __dict__ por instancia: los dashboards y
+    análisis mantienen millones en memoria. Los montos en pesos (CLP) son
+    int; Decimal queda para monedas con decimales.
+    """
+    
+    # Internar bank, description, merchant, last_digits, category y los
+    # textos de raw_data: se repiten mucho entre transacciones y así se
+    # guardan una vez
+    INTERN_STRINGS = True
+    
+    __slots__ = (
+        'bank', 'type', 'amount', 'description', 'date',
+        'merchant', 'last_digits', 'email_id', 'message_id', 'category', '_raw_data',
+    )
+    
     def __init__(
         self,
         bank: str,
         type: TransactionType,
-        amount: Decimal,
+        amount: Union[int, Decimal],
         description: str,
         date: datetime,
         merchant: Optional[str] = None,
         last_digits: Optional[str] = None,
         email_id: Optional[str] = None,
-        raw_data: Optional[Dict[str, Any]] = None
+        raw_data: Optional[Dict[str, Any]] = None,
+        category: Optional[str] = None,
+        message_id: Optional[str] = None
     ):
+        if self.INTERN_STRINGS:
+            bank = _intern(bank)
+            description = _intern(description)
+            merchant = _intern(merchant)
+            last_digits = _intern(last_digits)
+            category = _intern(category)
+            if raw_data:
+                raw_data = {key: _intern(value) for key, value in raw_data.items()}
         self.bank = bank
         self.type = type
         self.amount = amount
@@ -33,16 +63,92 @@ class Transaction:
         self.merchant = merchant
         self.last_digits = last_digits
         self.email_id = email_id
-        self.raw_data = raw_data or {}
+        # Message-ID del email de origen: identifica la transacción entre re-syncs
+        self.message_id = message_id
+        # Categoría de gasto (ej: "supermercado"), la asigna el análisis, no el parser
+        self.category = category
+        # El dict vacío se crea recién cuando se pide
+        self._raw_data = raw_data or None
+    
+    @property
+    def raw_data(self) -> Dict[str, Any]:
+        if self._raw_data is None:
+            self._raw_data = {}
+        return self._raw_data
+    
+    @raw_data.setter
+    def raw_data(self, value: Optional[Dict[str, Any]]) -> None:
+        self._raw_data = value or None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación serializable a JSON"""
+        return {
+            'bank': self.bank,
+            'type': self.type.value,
+            'amount': self.amount if isinstance(self.amount, int) else str(self.amount),
+            'description': self.description,
+            'date': self.date.isoformat(),
+            'merchant': self.merchant,
+            'last_digits': self.last_digits,
+            'email_id': self.email_id,
+            'message_id': self.message_id,
+            'category': self.category,
+            'raw_data': dict(self._raw_data or {}),
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Transaction':
+        """Inverso de to_dict"""
+        return cls(
+            bank=data['bank'],
+            type=TransactionType(data['type']),
+            amount=data['amount'] if isinstance(data['amount'], int) else Decimal(data['amount']),
+            description=data['description'],
+            date=datetime.fromisoformat(data['date']),
+            merchant=data.get('merchant'),
+            last_digits=data.get('last_digits'),
+            email_id=data.get('email_id'),
+            message_id=data.get('message_id'),
+            category=data.get('category'),
+            raw_data=dict(data.get('raw_data') or {}),
+        )
     
     def __repr__(self):
         return f"Transaction({self.type}, ${self.amount}, {self.merchant or self.description}, {self.date})"
 
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
 class BaseParser(ABC):
     """Clase base para parsers de bancos"""
     
+    # Remitentes exactos y dominios que atiende el parser; el ParserRegistry
+    # los usa para despachar sin llamar a can_parse. Si ambos quedan vacíos,
+    # el registry usa can_parse (para parsers con reglas propias).
+    SENDERS: Tuple[str, ...] = ()
+    SENDER_DOMAINS: Tuple[str, ...] = ()
+    
+    # Versión de las reglas de parseo: subirla al cambiar lo que retorna
+    # parse invalida los resultados guardados en ParseCache
+    VERSION = 1
+    
+    # Plantillas aprendidas (ver app/parsers/templates.py): máximo de
+    # estructuras de HTML recordadas (0 = deshabilitado) y regex que deben
+    # calzar completos los campos extraídos por el camino rápido
+    TEMPLATE_CACHE_SIZE = 256
+    TEMPLATE_VALIDATORS: Dict[str, Pattern] = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Cada parser queda medido como la etapa "parse" sin que el banco lo haga
+        if 'parse' in cls.__dict__:
+            cls.parse = metrics.instrumented('parse')(cls.__dict__['parse'])
+    
     def __init__(self):
         self.bank_name = self.__class__.__name__.replace('Parser', '').lower()
+        self.templates: Optional[TemplateCache] = None
+        if self.TEMPLATE_CACHE_SIZE:
+            self.templates = TemplateCache(self.TEMPLATE_CACHE_SIZE, self.TEMPLATE_VALIDATORS)
     
     @abstractmethod
     def can_parse(self, email_message) -> bool:
@@ -52,4 +158,19 @@ class BaseParser(ABC):
     @abstractmethod
     def parse(self, email_message) -> Optional[Transaction]:
         """Parsea el email y retorna una transacción"""
-        pass
\ No newline at end of file
+        pass
+    
+    def should_fetch(self, email_message) -> bool:
+        """Decide, solo con los headers (asunto, remitente y fecha), si vale la pena descargar el cuerpo"""
+        return self.can_parse(email_message)
+    
+    def _template_values(self, html: Optional[str], key: str) -> Optional[Dict[str, str]]:
+        """Campos crudos del email si su HTML calza con una plantilla ya aprendida"""
+        if self.templates is None:
+            return None
+        return self.templates.extract(html, key)
+    
+    def _learn_template(self, html: Optional[str], key: str, values: Dict[str, str]) -> None:
+        """Aprende la plantilla del email a partir de los campos del parseo completo"""
+        if self.templates is not None:
+            self.templates.learn(html, values, key)
@@ -0,0 +1,116 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from app.parsers.base import Transaction
+from app.parsers.registry import ParserRegistry, default_registry
+from app.email.connection import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+# Emails por tarea enviada a un worker: amortiza el costo de IPC por email
+DEFAULT_CHUNK_SIZE = 64
+
+# Lo que viaja a los workers: (uid, asunto, remitente, fecha, html, texto).
+# raw_email no se envía, puede pesar varias veces el cuerpo.
+Payload = Tuple[str, str, str, Optional[datetime], str, str]
+
+# Registry de cada proceso worker, creado una vez en el initializer
+_worker_registry: Optional[ParserRegistry] = None
+
+
+@dataclass
+class BatchResult:
+    """Resultado de parsear un email del lote (en el mismo orden de entrada)"""
+    index: int
+    email_id: str
+    transaction: Optional[Transaction] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def parse_batch(
+    emails: Iterable[EmailMessage],
+    workers: Optional[int] = None,
+    registry_factory: Callable[[], ParserRegistry] = default_registry,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[BatchResult]:
+    """
+    Parsea un lote de emails repartiéndolos en un pool de procesos
+
+    Pensado para backfills (ej: dos años de historial al agregar un usuario):
+    el parseo es CPU-bound y con threads no escala por el GIL.
+
+    Args:
+        emails: Emails ya descargados
+        workers: Procesos del pool (default: todos los cores). Con 1 o
+            menos se parsea en el proceso actual.
+        registry_factory: Crea el registry en cada worker; debe ser una
+            función de módulo para poder enviarla al pool
+        chunk_size: Emails por tarea enviada a un worker
+
+    Returns:
+        Un BatchResult por email, en el orden de entrada. Un email que falla
+        no corta el lote: su resultado trae el error.
+    """
+    payloads = [_payload(email_message) for email_message in emails]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(payloads))
+
+    if workers <= 1:
+        _init_worker(registry_factory)
+        outcomes = [_parse_payload(payload) for payload in payloads]
+    else:
+        logger.info(f"Parseando {len(payloads)} emails con {workers} procesos")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(registry_factory,)
+        ) as executor:
+            outcomes = list(executor.map(_parse_payload, payloads, chunksize=max(1, chunk_size)))
+
+    return [
+        BatchResult(index=i, email_id=payload[0], transaction=transaction, error=error)
+        for i, (payload, (transaction, error)) in enumerate(zip(payloads, outcomes))
+    ]
+
+
+def _payload(email_message: EmailMessage) -> Payload:
+    return (
+        email_message.uid,
+        email_message.subject,
+        email_message.sender,
+        email_message.date,
+        email_message.body_html,
+        email_message.body_text,
+    )
+
+
+def _init_worker(registry_factory: Callable[[], ParserRegistry]) -> None:
+    global _worker_registry
+    _worker_registry = registry_factory()
+
+
+def _parse_payload(payload: Payload) -> Tuple[Optional[Transaction], Optional[str]]:
+    uid, subject, sender, date, body_html, body_text = payload
+    email_message = EmailMessage(
+        uid=uid,
+        subject=subject,
+        sender=sender,
+        date=date,
+        body_html=body_html,
+        body_text=body_text,
+        raw_email=b""
+    )
+    try:
+        return _worker_registry.parse(email_message), None
+    except Exception as e:
+        logger.error(f"Error parseando email {uid}: {e}")
+        return None, f"{type(e).__name__}: {e}"
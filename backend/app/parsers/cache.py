@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.parsers.base import BaseParser, Transaction
+from app.email.connection import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    key TEXT PRIMARY KEY,
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT
+)
+"""
+
+
+class ParseCache:
+    """Cache de resultados de parseo por hash del contenido del email
+
+    Evita repetir el parseo de un email ya procesado (re-sync después de un
+    crash o de un cambio de UIDVALIDITY, o el mismo email en dos carpetas).
+    La clave es un hash de (parser, versión del parser, asunto, fecha y
+    cuerpo), así subir BaseParser.VERSION invalida los resultados viejos.
+    Se guardan también los None (emails que el parser descarta).
+
+    Tiene dos niveles: un LRU en memoria limitado a `max_entries` y, si se
+    pasa `path`, una base SQLite que sobrevive entre ejecuciones. Las
+    escrituras a disco se confirman en una transacción cada `commit_every`
+    resultados y en flush()/close(): un crash pierde a lo más ese lote, que
+    se vuelve a parsear.
+
+    Cuándo conviene: un hit cuesta un SHA-256 del cuerpo más from_dict, del
+    orden de un parseo por plantilla (BaseParser.templates), así que con
+    plantillas calientes el cache en memoria casi no ahorra. Ahorra cuando
+    el parseo es caro (emails sin plantilla, extracción completa del HTML) y
+    sobre todo con `path`, para no re-parsear un backfill o un re-sync
+    completo en la siguiente ejecución.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None, commit_every: int = 500):
+        self.max_entries = max_entries
+        self.path = path
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        # None = el parser no retornó transacción
+        self._memory: 'OrderedDict[str, Optional[Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Escrituras aún sin commit
+        self._pending = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(SCHEMA)
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @staticmethod
+    def key(parser: BaseParser, email_message: EmailMessage) -> str:
+        """Hash del email para el parser (no incluye el UID: el contenido manda)"""
+        digest = hashlib.sha256()
+        for part in (
+            type(parser).__name__,
+            str(parser.VERSION),
+            email_message.subject or '',
+            email_message.date.isoformat() if email_message.date else '',
+            email_message.body_html or '',
+            email_message.body_text or '',
+        ):
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def parse(self, parser: BaseParser, email_message: EmailMessage) -> Optional[Transaction]:
+        """Retorna el resultado guardado o parsea el email y lo guarda
+
+        El resultado es siempre una copia con el email_id y el message_id del
+        email actual.
+        """
+        key = self.key(parser, email_message)
+        found, data = self.get(key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+            transaction = parser.parse(email_message)
+            data = transaction.to_dict() if transaction else None
+            self.put(key, parser, data)
+        if data is None:
+            return None
+        transaction = Transaction.from_dict(data)
+        transaction.email_id = email_message.uid
+        transaction.message_id = email_message.message_id or None
+        return transaction
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Busca en memoria y luego en disco; retorna (encontrado, datos)"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return True, self._memory[key]
+            if self._db is None:
+                return False, None
+            row = self._db.execute("SELECT data FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            data = json.loads(row[0]) if row[0] is not None else None
+            self._remember(key, data)
+            return True, data
+
+    def put(self, key: str, parser: BaseParser, data: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._remember(key, data)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, parser, version, data) VALUES (?, ?, ?, ?)",
+                    (key, type(parser).__name__, parser.VERSION, json.dumps(data) if data is not None else None)
+                )
+                self._pending += 1
+                if self._pending >= self.commit_every:
+                    self._commit()
+
+    def prune(self, parser: BaseParser) -> int:
+        """Borra del disco los resultados de versiones anteriores del parser
+
+        Ya no se consultan (la versión es parte de la clave), solo ocupan espacio.
+        """
+        if self._db is None:
+            return 0
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM parse_cache WHERE parser = ? AND version != ?",
+                (type(parser).__name__, parser.VERSION)
+            )
+            self._commit()
+        if cursor.rowcount:
+            logger.info(f"{cursor.rowcount} resultados obsoletos de {type(parser).__name__} borrados del cache")
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Vacía ambos niveles"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM parse_cache")
+                self._commit()
+
+    def flush(self) -> None:
+        """Confirma en disco las escrituras pendientes"""
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
+
+    def _commit(self) -> None:
+        self._db.commit()
+        self._pending = 0
+
+    def _remember(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,116 @@
+import logging
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional
+
+from app.core import metrics
+from app.parsers.base import BaseParser, Transaction
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.cache import ParseCache
+from app.email.connection import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+
+def sender_address(sender: str) -> str:
+    """Extrae la dirección del header From ("Banco <a@b.cl>" -> "a@b.cl")"""
+    return parseaddr(sender or "")[1].lower()
+
+
+class ParserRegistry:
+    """Despacha cada email al parser de su remitente
+
+    Los parsers declaran SENDERS y/o SENDER_DOMAINS; el From se parsea una
+    sola vez y el parser se busca en un dict, así el costo no crece con la
+    cantidad de bancos. Los parsers sin remitentes declarados quedan como
+    fallback y se prueban con can_parse.
+
+    También se puede pasar como `parsers` al conector o a OfflineSource
+    (`parsers=registry`): implementa should_fetch, así los headers se
+    revisan solo contra el parser del remitente (ver wants_body).
+
+    Con `cache` los resultados se guardan por contenido del email y un
+    email ya parseado no se vuelve a procesar.
+    """
+
+    def __init__(self, parsers: Iterable[BaseParser] = (), cache: Optional[ParseCache] = None):
+        self.cache = cache
+        self._by_address: Dict[str, BaseParser] = {}
+        self._by_domain: Dict[str, BaseParser] = {}
+        self._fallback: List[BaseParser] = []
+        for parser in parsers:
+            self.register(parser)
+
+    def register(self, parser: BaseParser) -> BaseParser:
+        """Agrega un parser; un remitente no puede quedar asignado a dos parsers"""
+        if not parser.SENDERS and not parser.SENDER_DOMAINS:
+            self._fallback.append(parser)
+            return parser
+        for address in parser.SENDERS:
+            self._add(self._by_address, address.lower(), parser)
+        for domain in parser.SENDER_DOMAINS:
+            self._add(self._by_domain, domain.lower().lstrip('@'), parser)
+        return parser
+
+    def get_parser(self, email_message: EmailMessage) -> Optional[BaseParser]:
+        """Retorna el parser que corresponde al remitente del email, o None"""
+        address = sender_address(email_message.sender)
+        parser = self._by_address.get(address)
+        if parser:
+            return parser
+
+        # Dominio exacto o dominio padre (ej: "mail.banco.cl" -> "banco.cl")
+        domain = address.rpartition('@')[2]
+        while domain:
+            parser = self._by_domain.get(domain)
+            if parser:
+                return parser
+            domain = domain.partition('.')[2]
+
+        for parser in self._fallback:
+            if parser.can_parse(email_message):
+                return parser
+        return None
+
+    def should_fetch(self, email_message: EmailMessage) -> bool:
+        """Decide con los headers si algún parser quiere el cuerpo del email"""
+        parser = self.get_parser(email_message)
+        return parser is not None and parser.should_fetch(email_message)
+
+    def parse(self, email_message: EmailMessage) -> Optional[Transaction]:
+        """Parsea el email con el parser de su remitente"""
+        parser = self.get_parser(email_message)
+        if not parser:
+            logger.debug(f"Sin parser para {email_message.sender}")
+            metrics.skipped('sin_parser')
+            return None
+        if self.cache is not None:
+            return self.cache.parse(parser, email_message)
+        return parser.parse(email_message)
+
+    def senders(self) -> List[str]:
+        """Remitentes declarados, para un solo SEARCH con OR en el conector
+
+        Los dominios se buscan como "@dominio" (FROM busca por substring).
+        """
+        senders = list(self._by_address)
+        senders += [f"@{domain}" for domain in self._by_domain]
+        return senders
+
+    @property
+    def parsers(self) -> List[BaseParser]:
+        """Parsers registrados, sin repetir"""
+        unique: Dict[int, BaseParser] = {}
+        for parser in [*self._by_address.values(), *self._by_domain.values(), *self._fallback]:
+            unique.setdefault(id(parser), parser)
+        return list(unique.values())
+
+    def _add(self, index: Dict[str, BaseParser], key: str, parser: BaseParser) -> None:
+        current = index.get(key)
+        if current is not None and current is not parser:
+            raise ValueError(f"{key} ya está asignado a {type(current).__name__}")
+        index[key] = parser
+
+
+def default_registry(cache: Optional[ParseCache] = None) -> ParserRegistry:
+    """Registry con todos los parsers de bancos soportados"""
+    return ParserRegistry([BancoChileParser()], cache=cache)
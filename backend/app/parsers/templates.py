@@ -0,0 +1,175 @@
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# El texto entre tags y los dígitos (ids, fechas en URLs de tracking) varían
+# entre emails de una misma plantilla; el resto del HTML no
+TEXT_NODE_RE = re.compile(r'>[^<]+<')
+DIGITS_RE = re.compile(r'\d+')
+
+# Largo de los anclajes literales antes del primer campo y después del último
+MIN_ANCHOR = 8
+MAX_ANCHOR = 40
+
+# Variantes de texto que se recuerdan por cada estructura de HTML
+MAX_EXTRACTORS = 4
+
+
+def fingerprint(html: str, key: str = '') -> str:
+    """Hash del esqueleto del HTML: tags sin texto y con los dígitos enmascarados
+
+    `key` separa plantillas con la misma estructura pero distinto significado
+    (ej: el tipo de transacción).
+    """
+    skeleton = DIGITS_RE.sub('0', TEXT_NODE_RE.sub('><', html))
+    digest = hashlib.blake2b(skeleton.encode('utf-8', 'surrogatepass'), digest_size=16)
+    digest.update(key.encode())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class TemplateExtractor:
+    """Extractor aprendido de una plantilla
+
+    Los campos se leen en orden cortando el HTML entre anclajes literales:
+    `lead` precede al primer campo y `separators[i]` sigue al campo i (el
+    último es el texto que viene después del último campo).
+    """
+    lead: str
+    names: Tuple[str, ...]
+    separators: Tuple[str, ...]
+
+    def extract(self, html: str) -> Optional[Dict[str, str]]:
+        """Retorna los campos o None si el HTML no calza con la plantilla"""
+        start = html.find(self.lead)
+        if start < 0:
+            return None
+        start += len(self.lead)
+        values = {}
+        for name, separator in zip(self.names, self.separators):
+            end = html.find(separator, start)
+            if end < 0:
+                return None
+            values[name] = html[start:end]
+            start = end + len(separator)
+        return values
+
+
+def learn_extractor(html: str, values: Dict[str, str]) -> Optional[TemplateExtractor]:
+    """Aprende un extractor a partir de un email ya parseado por el camino completo
+
+    Cada valor debe aparecer tal cual y una sola vez en el HTML (sin
+    entidades ni tags en medio); si no, la plantilla no se puede aprender.
+    """
+    positions = []
+    for name, value in values.items():
+        if not value:
+            continue
+        start = html.find(value)
+        if start < 0 or html.find(value, start + 1) >= 0:
+            return None
+        positions.append((start, start + len(value), name))
+    if not positions:
+        return None
+
+    positions.sort()
+    names = []
+    separators = []
+    for i, (start, end, name) in enumerate(positions):
+        if i + 1 < len(positions):
+            next_start = positions[i + 1][0]
+            if next_start <= end:
+                # Campos pegados o solapados: no hay anclaje entre ellos
+                return None
+            separators.append(html[end:next_start])
+        else:
+            separators.append(_tail(html, end))
+        names.append(name)
+
+    first = positions[0][0]
+    lead = _lead(html, first)
+    if not lead or not separators[-1]:
+        return None
+
+    extractor = TemplateExtractor(lead=lead, names=tuple(names), separators=tuple(separators))
+    # El extractor debe reproducir exactamente los valores del camino completo
+    if extractor.extract(html) != {name: values[name] for name in names}:
+        return None
+    return extractor
+
+
+def _lead(html: str, start: int) -> str:
+    """Texto constante antes del primer campo: desde el inicio de su nodo de texto"""
+    node_start = html.rfind('>', 0, start) + 1
+    if start - node_start < MIN_ANCHOR:
+        node_start = start - MAX_ANCHOR
+    return html[max(node_start, start - MAX_ANCHOR, 0):start]
+
+
+def _tail(html: str, end: int) -> str:
+    """Texto después del último campo, hasta el siguiente tag inclusive"""
+    next_tag = html.find('<', end, end + MAX_ANCHOR)
+    return html[end:next_tag + 1 if next_tag >= 0 else end + MAX_ANCHOR]
+
+
+class TemplateCache:
+    """Extractores aprendidos por fingerprint, con desalojo LRU
+
+    Los valores extraídos se validan con `validators` (regex que deben
+    calzar completos); si alguno no calza se considera un miss.
+    """
+
+    def __init__(self, max_templates: int = 256, validators: Optional[Dict[str, Pattern]] = None):
+        self.max_templates = max_templates
+        self.validators = validators or {}
+        self.hits = 0
+        self.misses = 0
+        self._templates: 'OrderedDict[str, List[TemplateExtractor]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def extract(self, html: str, key: str = '') -> Optional[Dict[str, str]]:
+        """Extrae los campos si el HTML corresponde a una plantilla conocida"""
+        if not html:
+            return None
+        fp = fingerprint(html, key)
+        extractors = self._templates.get(fp)
+        if extractors:
+            for extractor in extractors:
+                values = extractor.extract(html)
+                if values is not None and self._valid(values):
+                    self._templates.move_to_end(fp)
+                    self.hits += 1
+                    return values
+        self.misses += 1
+        return None
+
+    def learn(self, html: str, values: Dict[str, str], key: str = '') -> bool:
+        """Guarda la plantilla del email a partir de los valores del camino completo"""
+        if not html or not self._valid(values):
+            return False
+        extractor = learn_extractor(html, values)
+        if extractor is None:
+            return False
+
+        fp = fingerprint(html, key)
+        extractors = self._templates.pop(fp, [])
+        if extractor not in extractors:
+            extractors = [extractor] + extractors[:MAX_EXTRACTORS - 1]
+        self._templates[fp] = extractors
+        while len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        self._templates.clear()
+
+    def _valid(self, values: Dict[str, str]) -> bool:
+        for name, value in values.items():
+            validator = self.validators.get(name)
+            if validator and value and not validator.fullmatch(value):
+                return False
+        return True
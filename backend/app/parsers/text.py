@@ -0,0 +1,277 @@
+import logging
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterator, List, Optional
+
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml es opcional
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+# Tags cuyo contenido no es texto visible del email
+SKIPPED_TAGS = frozenset({'script', 'style', 'head'})
+EMPTY_ELEMENT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+HTML_ENTITY_TO_CHARACTER = EntitySubstitution.HTML_ENTITY_TO_CHARACTER
+# libxml2 descarta lo que viene después de </html>; html.parser no
+TRAILING_CONTENT_RE = re.compile(r'</html\s*>(?!\s*$)', re.IGNORECASE)
+# Construcciones que libxml2 interpreta distinto que html.parser: <head> y
+# <title> (libxml2 mueve el title al head y cierra solo el head), DOCTYPE
+# fuera del inicio, CDATA, elementos de texto crudo (<textarea>, <xmp>, ...),
+# "<" sueltos y referencias a entidades en el texto (los & dentro de
+# atributos se saltan)
+LXML_CHECK_RE = re.compile(
+    r'<(?P<close>/?)(?P<tag>head|title)\b[^>]*>'
+    r'|(?P<doctype><!doctype\b)'
+    r'|(?P<unsupported><!\[CDATA\[|<(?:textarea|noscript|xmp|plaintext|iframe|noembed|noframes|frameset)\b|<(?![a-z/!?]))'
+    r'|<[^>&]*&[^>]*>'
+    r'|&(?:#\d+;|#x[0-9a-f]+;|(?P<entity>[a-z][a-z0-9]*);)?',
+    re.IGNORECASE,
+)
+
+# Contenido válido de un <head> (lo que libxml2 deja dentro)
+HEAD_CONTENT_RE = re.compile(r'<(style|script|title)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+HEAD_TAG_RE = re.compile(r'<(?:meta|link|base)\b[^>]*>', re.IGNORECASE)
+
+Backend = Callable[[str], Iterator[str]]
+
+
+def extract_text(html: Optional[str], separator: str = ' ', backend: Optional[str] = None) -> str:
+    """
+    Extrae el texto visible de un HTML
+
+    Equivale a BeautifulSoup(html, 'html.parser') sin script/style/head y
+    get_text(separator=separator, strip=True): cada nodo de texto se
+    recorta y los vacíos se omiten.
+
+    Args:
+        html: HTML del email
+        separator: Separador entre nodos de texto
+        backend: 'lxml', 'stream' o 'bs4' (default: el más rápido disponible).
+            Si el backend no puede con un HTML se reintenta con el siguiente
+            (lxml -> stream -> bs4).
+    """
+    if not html:
+        return ""
+    name = backend or DEFAULT_BACKEND
+    while True:
+        try:
+            strings = list(BACKENDS[name](html))
+            break
+        except Exception as e:
+            if name not in FALLBACKS:
+                raise
+            logger.debug(f"Backend {name} falló ({e}), usando {FALLBACKS[name]}")
+            name = FALLBACKS[name]
+    return separator.join(_stripped(strings))
+
+
+def register_backend(name: str, backend: Backend) -> None:
+    """Registra un backend: una función que genera los nodos de texto en orden"""
+    BACKENDS[name] = backend
+
+
+def _stripped(strings: List[str]) -> Iterator[str]:
+    for string in strings:
+        string = string.strip()
+        if string:
+            yield string
+
+
+def _bs4_strings(html: str) -> Iterator[str]:
+    """Implementación de referencia (la más lenta)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(list(SKIPPED_TAGS)):
+        tag.decompose()
+    yield from soup.strings
+
+
+def _lxml_strings(html: str) -> Iterator[str]:
+    """Recorre el árbol de libxml2; los comentarios cortan el texto igual que en bs4
+
+    libxml2 repara el HTML inválido distinto que html.parser (descarta tags
+    de cierre sueltos, mueve elementos al <head>), así que si el HTML trae
+    algo que pueda cambiar el resultado se lanza ValueError y extract_text
+    usa el backend exacto.
+    """
+    if TRAILING_CONTENT_RE.search(html):
+        raise ValueError("Contenido después de </html>")
+    # Un <head> que libxml2 agregó solo no es el que bs4 descarta
+    skipped = SKIPPED_TAGS if _check_lxml_compatible(html) else SKIPPED_TAGS - {'head'}
+    parser = etree.HTMLParser(recover=True, no_network=True)
+    root = etree.fromstring(html, parser)
+    if len(parser.error_log):
+        raise ValueError(f"HTML inválido: {parser.error_log[0].message}")
+    if root is None:
+        return
+    stack = [(root, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            if node.tail:
+                yield node.tail
+            continue
+        if node is not root:
+            stack.append((node, True))
+        # Comentarios e instrucciones de procesamiento no tienen tag de texto
+        if not isinstance(node.tag, str) or node.tag.lower() in skipped:
+            continue
+        if node.text:
+            yield node.text
+        stack.extend((child, False) for child in reversed(node))
+
+
+def _check_lxml_compatible(html: str) -> bool:
+    """Lanza ValueError si libxml2 podría dar otros nodos de texto que html.parser
+
+    Retorna si el HTML trae un <head> explícito.
+    """
+    if html.rfind('<') > html.rfind('>'):
+        raise ValueError("Tag sin cerrar al final")
+    head_start = None
+    has_head = False
+    for match in LXML_CHECK_RE.finditer(html):
+        tag = match.group('tag')
+        if tag:
+            if tag.lower() == 'title':
+                if head_start is None:
+                    raise ValueError("<title> fuera de <head>")
+            elif match.group('close'):
+                if head_start is not None:
+                    _check_head(html[head_start:match.start()])
+                head_start = None
+            elif has_head:
+                raise ValueError("Más de un <head>")
+            else:
+                head_start = match.end()
+                has_head = True
+            continue
+        if match.group('doctype'):
+            if html[:match.start()].strip():
+                raise ValueError("DOCTYPE fuera del inicio")
+            continue
+        if match.group('unsupported'):
+            raise ValueError(f"No soportado: {match.group('unsupported')}")
+        text = match.group(0)
+        if text.startswith('<'):
+            continue
+        if text == '&':
+            raise ValueError("& sin referencia completa")
+        entity = match.group('entity')
+        if entity and entity not in HTML_ENTITY_TO_CHARACTER:
+            raise ValueError(f"Entidad desconocida: &{entity};")
+    if head_start is not None:
+        raise ValueError("<head> sin cerrar")
+    return has_head
+
+
+def _check_head(head: str) -> None:
+    """libxml2 cierra el <head> en el primer elemento de body; bs4 no"""
+    head = HEAD_CONTENT_RE.sub('', head)
+    if HEAD_TAG_RE.sub('', head).strip():
+        raise ValueError("<head> con contenido de body")
+
+
+class _TextStripper(HTMLParser):
+    """Tag stripper en streaming: no construye árbol, solo junta los nodos de texto
+
+    Usa el mismo tokenizer que bs4 con 'html.parser' y replica cuándo bs4
+    corta un nodo de texto, así el resultado es idéntico.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings: List[str] = []
+        self._data: List[str] = []
+        self._open: List[str] = []
+        self._skipping = 0
+        # Tags vacíos (<br>) cuyo cierre explícito (</br>) bs4 ignora
+        self._closed_empty: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in EMPTY_ELEMENT_TAGS:
+            self._closed_empty.append(tag)
+            return
+        self._open.append(tag)
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_empty:
+            self._closed_empty.remove(tag)
+            return
+        self._flush()
+        if tag not in self._open:
+            return
+        # Como bs4: cierra todo lo abierto hasta el tag
+        while True:
+            closed = self._open.pop()
+            if closed in SKIPPED_TAGS:
+                self._skipping -= 1
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_entityref(self, name):
+        self._data.append(HTML_ENTITY_TO_CHARACTER.get(name, f"&{name}"))
+
+    def handle_charref(self, name):
+        self._data.append(unescape(f"&#{name};"))
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        # bs4 incluye el contenido de CDATA en get_text
+        if data.upper().startswith('CDATA[') and not self._skipping:
+            self.strings.append(data[len('CDATA['):])
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        if self._data:
+            if not self._skipping:
+                self.strings.append(''.join(self._data))
+            self._data = []
+
+
+def _stream_strings(html: str) -> Iterator[str]:
+    """Pensado para las plantillas simples de notificaciones bancarias"""
+    stripper = _TextStripper()
+    stripper.feed(html)
+    stripper.close()
+    return iter(stripper.strings)
+
+
+BACKENDS: Dict[str, Backend] = {
+    'stream': _stream_strings,
+    'bs4': _bs4_strings,
+}
+if etree is not None:
+    BACKENDS['lxml'] = _lxml_strings
+
+# A qué backend pasar si uno falla; bs4 es la referencia y no tiene fallback
+FALLBACKS = {'lxml': 'stream', 'stream': 'bs4'}
+
+DEFAULT_BACKEND = 'lxml' if 'lxml' in BACKENDS else 'stream'
@@ -0,0 +1,508 @@
+import bisect
+import email
+import imaplib
+import logging
+import re
+import select
+import socketserver
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.email.connection import EmailConnector, decode_header_value
+
+logger = logging.getLogger(__name__)
+
+HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+SECTION_RE = re.compile(r'BODY(?:\.PEEK)?\[([^\]]*)\]', re.IGNORECASE)
+HEADER_FIELDS_RE = re.compile(r'HEADER\.FIELDS \(([^)]*)\)', re.IGNORECASE)
+TOKEN_RE = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+
+CAPABILITIES = "IMAP4rev1 IDLE UIDPLUS"
+# Cada cuánto revisa IDLE si llegaron mensajes
+IDLE_POLL_INTERVAL = 0.05
+
+Predicate = Callable[['StoredMessage'], bool]
+
+
+@dataclass
+class StoredMessage:
+    uid: int
+    raw: bytes
+    headers: bytes
+    sender: str
+    subject: str
+    date: Optional[date]
+    _structure: Optional[str] = None
+
+    @classmethod
+    def from_bytes(cls, uid: int, raw: bytes) -> 'StoredMessage':
+        match = HEADER_END_RE.search(raw)
+        headers = raw[:match.end()] if match else raw
+        message = email.message_from_bytes(headers)
+        try:
+            sent = parsedate_to_datetime(message['Date']).date()
+        except (TypeError, ValueError):
+            sent = None
+        return cls(uid, raw, headers, (message['From'] or '').lower(),
+                   decode_header_value(message['Subject']).lower(), sent)
+
+    @property
+    def structure(self) -> str:
+        if self._structure is None:
+            self._structure = bodystructure(email.message_from_bytes(self.raw))
+        return self._structure
+
+
+class Mailbox:
+    """Buzón en memoria; los UIDs son crecientes y no se reutilizan"""
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.messages: List[StoredMessage] = []
+        # UIDs en el mismo orden que messages (crecientes), para bisect
+        self.uids: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def append(self, raw: bytes) -> int:
+        with self._lock:
+            uid = self.uidnext
+            self.uidnext += 1
+            self.messages.append(StoredMessage.from_bytes(uid, raw))
+            self.uids.append(uid)
+            return uid
+
+    def fetch(self, uids: '_UIDSet') -> List[Tuple[int, StoredMessage]]:
+        """(número de secuencia, mensaje) de los UIDs pedidos, sin recorrer todo el buzón"""
+        found = []
+        for low, high in uids.ranges:
+            start = bisect.bisect_left(self.uids, low)
+            end = bisect.bisect_right(self.uids, high)
+            found.extend((index + 1, self.messages[index]) for index in range(start, end))
+        return sorted(found, key=lambda item: item[0])
+
+
+class IMAPServer:
+    """Servidor IMAP en proceso, sin TLS, para tests y benchmarks
+
+    Implementa lo que usa EmailConnector: LOGIN, SELECT, STATUS, NOOP,
+    UID SEARCH (FROM, SUBJECT, SINCE, BEFORE, UID, OR, NOT, ALL), UID FETCH
+    (UID, RFC822, BODYSTRUCTURE, BODY[.PEEK][HEADER.FIELDS (...)] y
+    BODY[.PEEK][<parte>]), IDLE, CLOSE y LOGOUT. No implementa flags ni
+    escritura (STORE, EXPUNGE, APPEND): los mensajes se agregan con deliver.
+
+    Uso:
+        with IMAPServer() as server:
+            server.deliver(raw_email)
+            with server.connector("usuario@gmail.com", "secreto") as connector:
+                connector.sync_emails("enviodigital@bancochile.cl")
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, users: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            host: Interfaz donde escuchar
+            port: Puerto (0 = uno libre)
+            users: {usuario: contraseña}; si es None acepta cualquier login
+        """
+        self.users = users
+        self.mailboxes: Dict[str, Mailbox] = {'INBOX': Mailbox()}
+        self._server = _ThreadingServer((host, port), _IMAPHandler)
+        self._server.imap = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> 'IMAPServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="imap-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.close_sessions()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'IMAPServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def mailbox(self, name: str = 'INBOX') -> Mailbox:
+        return self.mailboxes.setdefault(name, Mailbox())
+
+    def deliver(self, raw: bytes, mailbox: str = 'INBOX') -> int:
+        """Agrega un mensaje al buzón (las sesiones en IDLE reciben EXISTS); retorna su UID"""
+        return self.mailbox(mailbox).append(raw)
+
+    def connector(self, email_address: str, password: str, **kwargs) -> 'LocalEmailConnector':
+        """Conector apuntando a este servidor"""
+        return LocalEmailConnector(self.address, email_address, password, **kwargs)
+
+
+class LocalEmailConnector(EmailConnector):
+    """EmailConnector que abre una conexión IMAP sin TLS a un servidor local"""
+
+    def __init__(self, address: Tuple[str, int], email_address: str, password: str, **kwargs):
+        super().__init__(email_address, password, **kwargs)
+        self.address = address
+
+    def _open_connection(self) -> imaplib.IMAP4:
+        return imaplib.IMAP4(*self.address)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.imap: Optional[IMAPServer] = None
+        self._sessions = set()
+        self._sessions_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._sessions_lock:
+            self._sessions.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._sessions_lock:
+            self._sessions.discard(request)
+        super().shutdown_request(request)
+
+    def close_sessions(self) -> None:
+        """Corta las sesiones abiertas (los clientes ven la conexión cerrada)"""
+        with self._sessions_lock:
+            sessions = list(self._sessions)
+        for request in sessions:
+            try:
+                request.shutdown(2)
+            except OSError:
+                pass
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+    """Una sesión IMAP"""
+
+    # Cada respuesta son varias escrituras chicas: con Nagle + ACK retardado
+    # un comando por vez (ej: _fetch_email) tarda ~40 ms
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.imap: IMAPServer = self.server.imap
+        self.authenticated = False
+        self.selected: Optional[Mailbox] = None
+        # Mensajes ya informados al cliente (para enviar EXISTS con los nuevos)
+        self.reported = 0
+
+    def handle(self):
+        self._send(f"* OK [CAPABILITY {CAPABILITIES}] IMAP de prueba listo")
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                return
+            if not line:
+                return
+            line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            tag, _, rest = line.partition(' ')
+            command, _, args = rest.partition(' ')
+            command = command.upper()
+            if command == 'UID':
+                command, _, args = args.partition(' ')
+                command = 'UID ' + command.upper()
+            handler = getattr(self, '_cmd_' + command.replace(' ', '_'), None)
+            try:
+                if handler is None:
+                    self._send(f"{tag} BAD Comando no soportado: {command}")
+                elif handler(tag, args) is False:
+                    return
+            except Exception as e:
+                logger.exception(f"Error procesando {command}")
+                self._send(f"{tag} BAD {e}")
+
+    # =========================================================================
+    # Comandos
+    # =========================================================================
+
+    def _cmd_CAPABILITY(self, tag: str, args: str):
+        self._send(f"* CAPABILITY {CAPABILITIES}")
+        self._send(f"{tag} OK CAPABILITY completado")
+
+    def _cmd_LOGIN(self, tag: str, args: str):
+        user, password = (_unquote(token) for token in TOKEN_RE.findall(args)[:2])
+        if self.imap.users is not None and self.imap.users.get(user) != password:
+            self._send(f"{tag} NO [AUTHENTICATIONFAILED] Credenciales inválidas")
+            return
+        self.authenticated = True
+        self._send(f"{tag} OK LOGIN completado")
+
+    def _cmd_SELECT(self, tag: str, args: str):
+        if not self._require_auth(tag):
+            return
+        name = _unquote(args.strip())
+        mailbox = self.imap.mailboxes.get(name)
+        if mailbox is None:
+            self.selected = None
+            self._send(f"{tag} NO No existe el buzón {name}")
+            return
+        self.selected = mailbox
+        self.reported = len(mailbox)
+        self._send(f"* {self.reported} EXISTS")
+        self._send("* 0 RECENT")
+        self._send(f"* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs válidos")
+        self._send(f"* OK [UIDNEXT {mailbox.uidnext}] Próximo UID")
+        self._send(f"{tag} OK [READ-WRITE] SELECT completado")
+
+    _cmd_EXAMINE = _cmd_SELECT
+
+    def _cmd_STATUS(self, tag: str, args: str):
+        if not self._require_auth(tag):
+            return
+        name = _unquote(TOKEN_RE.findall(args)[0])
+        mailbox = self.imap.mailboxes.get(name)
+        if mailbox is None:
+            self._send(f"{tag} NO No existe el buzón {name}")
+            return
+        self._send(f"* STATUS {name} (MESSAGES {len(mailbox)} UIDVALIDITY {mailbox.uidvalidity} UIDNEXT {mailbox.uidnext})")
+        self._send(f"{tag} OK STATUS completado")
+
+    def _cmd_NOOP(self, tag: str, args: str):
+        self._report_new()
+        self._send(f"{tag} OK NOOP completado")
+
+    def _cmd_CLOSE(self, tag: str, args: str):
+        self.selected = None
+        self._send(f"{tag} OK CLOSE completado")
+
+    def _cmd_LOGOUT(self, tag: str, args: str):
+        self._send("* BYE Hasta luego")
+        self._send(f"{tag} OK LOGOUT completado")
+        return False
+
+    def _cmd_UID_SEARCH(self, tag: str, args: str):
+        if not self._require_selected(tag):
+            return
+        messages = list(self.selected.messages)
+        tokens = TOKEN_RE.findall(args)
+        # CHARSET opcional
+        if tokens and tokens[0].upper() == 'CHARSET':
+            tokens = tokens[2:]
+        max_uid = messages[-1].uid if messages else 0
+        predicate = _SearchParser(tokens, max_uid).parse()
+        uids = ' '.join(str(message.uid) for message in messages if predicate(message))
+        self._send(f"* SEARCH {uids}".rstrip())
+        self._send(f"{tag} OK SEARCH completado")
+
+    def _cmd_UID_FETCH(self, tag: str, args: str):
+        if not self._require_selected(tag):
+            return
+        message_set, _, items = args.partition(' ')
+        uids = self.selected.uids
+        wanted = _uid_set(message_set, uids[-1] if uids else 0)
+        for seq, message in self.selected.fetch(wanted):
+            self.wfile.write(self._fetch_response(seq, message, items))
+        self.wfile.flush()
+        self._send(f"{tag} OK FETCH completado")
+
+    def _cmd_IDLE(self, tag: str, args: str):
+        if not self._require_selected(tag):
+            return
+        self._send("+ idling")
+        sock = self.connection
+        while True:
+            self._report_new()
+            readable, _, _ = select.select([sock], [], [], IDLE_POLL_INTERVAL)
+            if not readable:
+                continue
+            line = self.rfile.readline()
+            if not line:
+                return False
+            if line.strip().upper() == b'DONE':
+                break
+        self._send(f"{tag} OK IDLE terminado")
+
+    # =========================================================================
+    # Helpers
+    # =========================================================================
+
+    def _fetch_response(self, seq: int, message: StoredMessage, items: str) -> bytes:
+        upper = items.upper()
+        parts = [f"UID {message.uid}".encode()]
+        if 'BODYSTRUCTURE' in upper:
+            parts.append(f"BODYSTRUCTURE {message.structure}".encode())
+        for section in SECTION_RE.findall(items):
+            parts.append(_literal(f"BODY[{section}]", _section(message, section)))
+        if re.search(r'\bRFC822\b(?![.])', upper):
+            parts.append(_literal("RFC822", message.raw))
+        return f"* {seq} FETCH (".encode() + b' '.join(parts) + b')\r\n'
+
+    def _report_new(self) -> None:
+        if self.selected is not None and len(self.selected) > self.reported:
+            self.reported = len(self.selected)
+            self._send(f"* {self.reported} EXISTS")
+
+    def _require_auth(self, tag: str) -> bool:
+        if not self.authenticated:
+            self._send(f"{tag} BAD No autenticado")
+        return self.authenticated
+
+    def _require_selected(self, tag: str) -> bool:
+        if not self._require_auth(tag):
+            return False
+        if self.selected is None:
+            self._send(f"{tag} BAD Ningún buzón seleccionado")
+            return False
+        return True
+
+    def _send(self, line: str) -> None:
+        self.wfile.write(line.encode() + b'\r\n')
+        self.wfile.flush()
+
+
+class _SearchParser:
+    """Convierte los criterios de SEARCH en un predicado sobre StoredMessage"""
+
+    def __init__(self, tokens: List[str], max_uid: int):
+        self.tokens = tokens
+        self.position = 0
+        self.max_uid = max_uid
+
+    def parse(self) -> Predicate:
+        keys = []
+        while self.position < len(self.tokens):
+            keys.append(self._key())
+        return lambda message: all(key(message) for key in keys)
+
+    def _next(self) -> str:
+        if self.position >= len(self.tokens):
+            raise ValueError("Criterio de búsqueda incompleto")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _key(self) -> Predicate:
+        token = self._next()
+        upper = token.upper()
+        if token == '(':
+            keys = []
+            while self.tokens[self.position] != ')':
+                keys.append(self._key())
+            self.position += 1
+            return lambda message: all(key(message) for key in keys)
+        if upper == 'ALL':
+            return lambda message: True
+        if upper == 'OR':
+            left, right = self._key(), self._key()
+            return lambda message: left(message) or right(message)
+        if upper == 'NOT':
+            inner = self._key()
+            return lambda message: not inner(message)
+        if upper == 'FROM':
+            value = _unquote(self._next()).lower()
+            return lambda message: value in message.sender
+        if upper == 'SUBJECT':
+            value = _unquote(self._next()).lower()
+            return lambda message: value in message.subject
+        if upper in ('SINCE', 'BEFORE', 'ON'):
+            day = datetime.strptime(_unquote(self._next()), "%d-%b-%Y").date()
+            compare = {
+                'SINCE': lambda d: d >= day,
+                'BEFORE': lambda d: d < day,
+                'ON': lambda d: d == day,
+            }[upper]
+            return lambda message: message.date is not None and compare(message.date)
+        if upper == 'UID':
+            uids = _uid_set(self._next(), self.max_uid)
+            return lambda message: message.uid in uids
+        raise ValueError(f"Criterio no soportado: {token}")
+
+
+class _UIDSet:
+    """Message set IMAP ("1,5,9:20", "10:*") con pertenencia en O(rangos)"""
+
+    def __init__(self, ranges: List[Tuple[int, int]]):
+        self.ranges = ranges
+
+    def __contains__(self, uid: int) -> bool:
+        return any(low <= uid <= high for low, high in self.ranges)
+
+
+def _uid_set(message_set: str, max_uid: int) -> _UIDSet:
+    ranges = []
+    for part in message_set.split(','):
+        low, _, high = part.partition(':')
+        low = max_uid if low == '*' else int(low)
+        high = low if not high else (max_uid if high == '*' else int(high))
+        # "n:*" con n > último UID equivale a "último:n" (incluye el último)
+        ranges.append((min(low, high), max(low, high)))
+    return _UIDSet(ranges)
+
+
+def _section(message: StoredMessage, section: str) -> bytes:
+    """Contenido de BODY[<section>]"""
+    if not section:
+        return message.raw
+    fields = HEADER_FIELDS_RE.fullmatch(section)
+    if fields:
+        names = {name.lower() for name in fields.group(1).split()}
+        parsed = email.message_from_bytes(message.headers)
+        lines = [
+            f"{name}: {value}".encode('utf-8', errors='replace')
+            for name, value in parsed.items()
+            if name.lower() in names
+        ]
+        return b'\r\n'.join(lines) + b'\r\n\r\n'
+    if section.upper() == 'HEADER':
+        return message.headers
+    return body_section(message.raw, section)
+
+
+def _literal(name: str, data: bytes) -> bytes:
+    return f"{name} {{{len(data)}}}\r\n".encode() + data
+
+
+def _unquote(token: str) -> str:
+    if len(token) >= 2 and token[0] == token[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    return token
+
+
+def bodystructure(part) -> str:
+    """BODYSTRUCTURE IMAP de un mensaje (los campos que usa app.email.bodystructure)"""
+    if part.is_multipart():
+        children = ''.join(bodystructure(p) for p in part.get_payload())
+        return f'({children} "{part.get_content_subtype().upper()}")'
+    payload = part.get_payload().encode()
+    lines = payload.count(b'\n')
+    cte = part.get('Content-Transfer-Encoding', '7bit').upper()
+    disposition = part.get_content_disposition()
+    disposition = f'("{disposition.upper()}" NIL)' if disposition else 'NIL'
+    maintype, subtype = part.get_content_maintype().upper(), part.get_content_subtype().upper()
+    if maintype == 'TEXT':
+        charset = part.get_content_charset() or 'us-ascii'
+        return (f'("TEXT" "{subtype}" ("CHARSET" "{charset}") NIL NIL "{cte}" {len(payload)} {lines}'
+                f' NIL {disposition} NIL NIL)')
+    return f'("{maintype}" "{subtype}" NIL NIL NIL "{cte}" {len(payload)} NIL {disposition} NIL NIL)'
+
+
+def body_section(raw: bytes, section: str) -> bytes:
+    """Contenido (codificado) de una parte, como BODY[<section>]"""
+    part = email.message_from_bytes(raw)
+    for number in section.split('.'):
+        if part.is_multipart():
+            part = part.get_payload()[int(number) - 1]
+    return part.get_payload().encode()
@@ -0,0 +1,63 @@
+"""
+Benchmarks del pipeline de ingesta y parseo
+
+Uso (desde backend/):
+    python -m benchmarks                     # mide y compara con el baseline
+    python -m benchmarks --save              # mide y reemplaza el baseline
+    python -m benchmarks --only end_to_end --size 20000
+
+Termina con código 1 si algún benchmark es más lento (o usa más memoria)
+que el baseline por sobre el umbral.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from benchmarks.runner import Baseline, compare, format_table, machine_metadata
+from benchmarks.suite import BENCHMARKS, Workload, run_suite
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=2000, help="Emails del corpus sintético")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rounds', type=int, default=3, help="Pasadas medidas por benchmark")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help="Medir solo este benchmark")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help="JSON con el baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Regresión tolerada (0.25 = hasta 25%% más lento)")
+    parser.add_argument('--save', action='store_true', help="Guardar los resultados como baseline")
+    parser.add_argument('--no-memory', action='store_true', help="No medir memoria con tracemalloc")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    baseline = Baseline.load(args.baseline)
+    if baseline and baseline.metadata.get('size') != args.size:
+        print(f"Aviso: el baseline es de {baseline.metadata.get('size')} emails y esta corrida de {args.size}")
+
+    workload = Workload.generate(args.size, seed=args.seed)
+    results = run_suite(workload, args.only, rounds=args.rounds, memory=not args.no_memory)
+    print(format_table(results, baseline))
+
+    if args.save:
+        merged = dict(baseline.results) if baseline and args.only else {}
+        merged.update({result.name: result for result in results})
+        Baseline(merged, machine_metadata(size=args.size, seed=args.seed, rounds=args.rounds)).save(args.baseline)
+        print(f"Baseline guardado en {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"Sin baseline en {args.baseline} (usar --save para crearlo)")
+        return 0
+
+    regressions = compare({result.name: result for result in results}, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESIÓN {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import gc
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Pasadas con tracemalloc; se usa la de menor peak porque la primera puede
+# incluir crecimientos únicos del intérprete (ej: la tabla de strings internados)
+MEMORY_PASSES = 2
+# Diferencias de memoria menores a esto no cuentan como regresión
+MIN_MEMORY_DELTA_KIB = 64
+
+
+@dataclass
+class Case:
+    """Un benchmark: `func` se llama una vez por cada elemento de `inputs`"""
+    name: str
+    func: Callable[[Any], Any]
+    inputs: Sequence[Any]
+    # Qué cuenta como una operación en el reporte (emails, textos, asuntos...)
+    unit: str = "ops"
+    teardown: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class Result:
+    """Resultado de un Case
+
+    `ops_per_sec` se calcula sobre el tiempo total de las rondas; las
+    latencias son por llamada.
+    """
+    name: str
+    calls: int
+    seconds: float
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+    peak_kib: float
+    unit: str = "ops"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Result':
+        return cls(**data)
+
+
+@dataclass
+class Regression:
+    """Métrica que empeoró más que el umbral respecto al baseline"""
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        """Cambio relativo (positivo = peor)"""
+        if self.metric == 'ops_per_sec':
+            return self.baseline / self.current - 1 if self.current else float('inf')
+        return self.current / self.baseline - 1 if self.baseline else float('inf')
+
+    def __str__(self) -> str:
+        return (f"{self.name}: {self.metric} {self.baseline:,.1f} -> {self.current:,.1f} "
+                f"({self.change:+.0%})")
+
+
+@dataclass
+class Baseline:
+    """Resultados guardados en JSON con los datos de la máquina que los produjo"""
+    results: Dict[str, Result]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['Baseline']:
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        results = {name: Result.from_dict(result) for name, result in data['results'].items()}
+        return cls(results, data.get('metadata', {}))
+
+    def save(self, path: Path) -> None:
+        data = {
+            'metadata': self.metadata,
+            'results': {name: result.to_dict() for name, result in sorted(self.results.items())},
+        }
+        Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+
+
+def machine_metadata(**extra) -> Dict[str, Any]:
+    """Datos para saber si dos baselines son comparables"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        **extra,
+    }
+
+
+def measure(case: Case, rounds: int = 3, warmup: bool = True, memory: bool = True) -> Result:
+    """
+    Mide un Case
+
+    Args:
+        case: Benchmark a medir
+        rounds: Veces que se recorren todos los inputs midiendo cada llamada
+        warmup: Hacer una pasada sin medir (caches, imports perezosos)
+        memory: Medir el peak de memoria con tracemalloc (en una pasada aparte,
+            porque tracemalloc hace todo varias veces más lento)
+    """
+    func, inputs = case.func, case.inputs
+    if not inputs:
+        raise ValueError(f"El benchmark {case.name} no tiene inputs")
+    if warmup:
+        for item in inputs:
+            func(item)
+
+    latencies: List[int] = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for item in inputs:
+                t0 = time.perf_counter_ns()
+                func(item)
+                latencies.append(time.perf_counter_ns() - t0)
+        seconds = time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    peak_kib = min(_peak_memory(func, inputs) for _ in range(MEMORY_PASSES)) / 1024 if memory else 0.0
+
+    latencies.sort()
+    return Result(
+        name=case.name,
+        calls=len(latencies),
+        seconds=seconds,
+        ops_per_sec=len(latencies) / seconds if seconds else float('inf'),
+        p50_us=percentile(latencies, 50) / 1000,
+        p99_us=percentile(latencies, 99) / 1000,
+        peak_kib=peak_kib,
+        unit=case.unit,
+    )
+
+
+def _peak_memory(func: Callable[[Any], Any], inputs: Sequence[Any]) -> int:
+    """Bytes por sobre lo que ya estaba asignado en el peak de una pasada"""
+    # Lo que quedó de las rondas con gc apagado no es de esta pasada
+    gc.collect()
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for item in inputs:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+        return peak - current
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Percentil con interpolación lineal (como numpy.percentile)"""
+    if not sorted_values:
+        raise ValueError("Sin valores")
+    position = (len(sorted_values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def compare(results: Dict[str, Result], baseline: Baseline, threshold: float = 0.25) -> List[Regression]:
+    """
+    Compara contra el baseline
+
+    Es regresión si el throughput cae más que `threshold` (0.25 = 25% más
+    lento) o si el peak de memoria crece más que eso. Los benchmarks que no
+    están en el baseline se ignoran.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.results.get(name)
+        if previous is None:
+            continue
+        if result.ops_per_sec < previous.ops_per_sec / (1 + threshold):
+            regressions.append(Regression(name, 'ops_per_sec', previous.ops_per_sec, result.ops_per_sec))
+        if (result.peak_kib > previous.peak_kib * (1 + threshold)
+                and result.peak_kib - previous.peak_kib > MIN_MEMORY_DELTA_KIB):
+            regressions.append(Regression(name, 'peak_kib', previous.peak_kib, result.peak_kib))
+    return regressions
+
+
+def format_table(results: Sequence[Result], baseline: Optional[Baseline] = None) -> str:
+    """Tabla de resultados para la consola"""
+    header = f"{'benchmark':<26}{'ops/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'peak KiB':>11}{'vs base':>9}"
+    lines = [header, '-' * len(header)]
+    for result in results:
+        previous = baseline.results.get(result.name) if baseline else None
+        versus = f"{result.ops_per_sec / previous.ops_per_sec - 1:+.0%}" if previous else ''
+        lines.append(
+            f"{result.name:<26}{result.ops_per_sec:>12,.0f}{result.p50_us:>10,.1f}"
+            f"{result.p99_us:>10,.1f}{result.peak_kib:>11,.1f}{versus:>9}"
+        )
+    return "\n".join(lines)
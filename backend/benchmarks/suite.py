@@ -0,0 +1,169 @@
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.email.connection import EmailMessage, parse_email
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.base import TransactionType
+from app.parsers.registry import default_registry
+from app.testing.corpus import SyntheticEmail, generate_corpus
+from app.testing.imap_server import IMAPServer
+
+from benchmarks.runner import Case, Result, measure
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS: Dict[str, Callable[['Workload'], Case]] = {}
+
+
+def benchmark(name: str):
+    """Registra una función que arma el Case a partir del Workload"""
+    def register(factory: Callable[['Workload'], Case]) -> Callable[['Workload'], Case]:
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+@dataclass
+class Workload:
+    """Corpus sintético y los emails ya decodificados que usan los benchmarks"""
+    corpus: List[SyntheticEmail]
+    messages: List[EmailMessage]
+
+    @classmethod
+    def generate(cls, size: int, seed: int = 0) -> 'Workload':
+        corpus = generate_corpus(size, seed=seed)
+        messages = [parse_email(str(uid), synthetic.raw) for uid, synthetic in enumerate(corpus, start=1)]
+        return cls(corpus, messages)
+
+    def transactions(self, transaction_type: Optional[TransactionType] = None) -> List[EmailMessage]:
+        """Emails del corpus que son transacciones (del tipo indicado)"""
+        return [
+            message for message, synthetic in zip(self.messages, self.corpus)
+            if synthetic.expected
+            and (transaction_type is None or synthetic.expected['type'] == transaction_type)
+        ]
+
+
+# =============================================================================
+# Ingesta
+# =============================================================================
+
+@benchmark('mime_decode')
+def mime_decode(workload: Workload) -> Case:
+    """Decodificación MIME de _fetch_email (sin red)"""
+    inputs = [(str(uid), synthetic.raw) for uid, synthetic in enumerate(workload.corpus, start=1)]
+    return Case('mime_decode', lambda item: parse_email(*item), inputs, unit="emails")
+
+
+@benchmark('fetch_email')
+def fetch_email(workload: Workload) -> Case:
+    """_fetch_email completo contra el servidor IMAP local (FETCH RFC822 + decodificación)"""
+    server = IMAPServer().start()
+    uids = [str(server.deliver(synthetic.raw)).encode() for synthetic in workload.corpus]
+    connector = server.connector("benchmark@gmail.com", "benchmark")
+    connector.connect()
+    connector._select('INBOX')
+
+    def teardown():
+        connector.disconnect()
+        server.stop()
+
+    return Case('fetch_email', connector._fetch_email, uids, unit="emails", teardown=teardown)
+
+
+# =============================================================================
+# Parser
+# =============================================================================
+
+@benchmark('extract_text')
+def extract_text(workload: Workload) -> Case:
+    parser = BancoChileParser()
+    inputs = [message.body_html for message in workload.transactions()]
+    return Case('extract_text', parser._extract_text, inputs, unit="emails")
+
+
+@benchmark('detect_type')
+def detect_type(workload: Workload) -> Case:
+    parser = BancoChileParser()
+    inputs = [message.subject.lower() for message in workload.messages]
+    return Case('detect_type', parser._detect_type, inputs, unit="asuntos")
+
+
+@benchmark('extract_fields')
+def extract_fields(workload: Workload) -> Case:
+    """Extracción de campos (plantilla aprendida o texto + regex)"""
+    parser = BancoChileParser()
+    inputs = [
+        (message.body_html, parser._detect_type(message.subject.lower()))
+        for message in workload.transactions()
+    ]
+    return Case('extract_fields', lambda item: parser._extract_fields(*item), inputs, unit="emails")
+
+
+def _parse_case(name: str, workload: Workload, transaction_type: TransactionType) -> Case:
+    """Un _parse_<tipo> con los campos ya extraídos"""
+    parser = BancoChileParser()
+    method = getattr(parser, f"_{name}")
+    inputs = [
+        (message, parser._extract_fields(message.body_html, transaction_type))
+        for message in workload.transactions(transaction_type)
+    ]
+    return Case(name, lambda item: method(*item), inputs, unit="emails")
+
+
+@benchmark('parse_compra')
+def parse_compra(workload: Workload) -> Case:
+    return _parse_case('parse_compra', workload, TransactionType.COMPRA)
+
+
+@benchmark('parse_giro')
+def parse_giro(workload: Workload) -> Case:
+    return _parse_case('parse_giro', workload, TransactionType.GIRO)
+
+
+@benchmark('parse_transferencia')
+def parse_transferencia(workload: Workload) -> Case:
+    return _parse_case('parse_transferencia', workload, TransactionType.TRANSFERENCIA)
+
+
+@benchmark('parse_abono')
+def parse_abono(workload: Workload) -> Case:
+    return _parse_case('parse_abono', workload, TransactionType.ABONO)
+
+
+# =============================================================================
+# Pipeline
+# =============================================================================
+
+@benchmark('end_to_end')
+def end_to_end(workload: Workload) -> Case:
+    """Bytes RFC822 -> Transaction con el registry (emails/s del pipeline)"""
+    registry = default_registry()
+    inputs = [(str(uid), synthetic.raw) for uid, synthetic in enumerate(workload.corpus, start=1)]
+    return Case('end_to_end', lambda item: registry.parse(parse_email(*item, keep_raw=False)), inputs,
+                unit="emails")
+
+
+def run_suite(
+    workload: Workload,
+    names: Optional[Iterable[str]] = None,
+    rounds: int = 3,
+    memory: bool = True
+) -> List[Result]:
+    """Arma y mide cada benchmark (todos si names es None)"""
+    names = list(names) if names else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Benchmarks desconocidos: {', '.join(unknown)}")
+
+    results = []
+    for name in names:
+        case = BENCHMARKS[name](workload)
+        try:
+            logger.info(f"Midiendo {name} ({len(case.inputs)} {case.unit})")
+            results.append(measure(case, rounds=rounds, memory=memory))
+        finally:
+            if case.teardown:
+                case.teardown()
+    return results
@@ -0,0 +1,128 @@
+import pytest
+from datetime import datetime
+from app.analytics.aggregates import AggregateStore, BudgetAlert, Totals, source_key
+from app.parsers.base import TransactionType
+
+
+class TestAggregateStore:
+    """Tests para los agregados incrementales y los presupuestos"""
+
+    @pytest.fixture
+    def store(self):
+        return AggregateStore()
+
+    def test_totales(self, store, make_transaction):
+        store.add_many("u1", [
+            make_transaction(email_id="1", amount=5000, category="supermercado"),
+            make_transaction(email_id="2", amount=3000, category="supermercado"),
+            make_transaction(email_id="3", amount=2000, category="transporte"),
+            make_transaction(email_id="4", amount=50000, type=TransactionType.ABONO),
+            make_transaction(email_id="5", amount=9990, category="supermercado", date=datetime(2025, 11, 30, 23, 59)),
+        ])
+        store.add("u2", make_transaction(email_id="1", amount=777, category="supermercado"))
+
+        assert store.totals("u1", "2025-12") == Totals(60000, 4)
+        assert store.totals("u1", "2025-12", type=TransactionType.COMPRA) == Totals(10000, 3)
+        assert store.by_category("u1", "2025-12") == {"supermercado": 8000, "transporte": 2000}
+        assert store.spent("u1", "2025-12") == 10000
+        assert store.spent("u1", "2025-12", "supermercado") == 8000
+        assert store.spent("u1", "2025-11") == 9990
+
+    def test_reemplazo_recategorizacion_y_borrado(self, store, make_transaction):
+        key = source_key("yo@gmail.com", make_transaction(message_id="<1@banco>"))
+        store.add("u1", make_transaction(email_id="1", amount=5000, category="supermercado"), key=key)
+        # Re-sync del mismo email: no se suma dos veces
+        store.add("u1", make_transaction(email_id="1", amount=5000, category="supermercado"), key=key)
+        assert store.spent("u1", "2025-12", "supermercado") == 5000
+        # El email se volvió a parsear con otro monto: se reemplaza
+        store.add("u1", make_transaction(email_id="1", amount=6000, category="supermercado"), key=key)
+        assert store.spent("u1", "2025-12", "supermercado") == 6000
+
+        store.recategorize("u1", key, "hogar")
+        assert store.by_category("u1", "2025-12") == {"hogar": 6000}
+
+        assert store.remove("u1", key)
+        assert not store.remove("u1", key)
+        assert store.totals("u1", "2025-12") == Totals(0, 0)
+        assert store.spent("u1", "2025-12") == 0
+
+    def test_mismo_uid_en_dos_cuentas(self, store, make_transaction):
+        """El UID 5 de dos cuentas vinculadas son dos transacciones distintas"""
+        gmail = make_transaction(email_id="5", amount=2000, message_id="<a@banco>")
+        outlook = make_transaction(email_id="5", amount=1000, message_id="<b@banco>")
+        store.add("u1", gmail, key=source_key("yo@gmail.com", gmail))
+        store.add("u1", outlook, key=source_key("yo@outlook.com", outlook))
+        assert store.spent("u1", "2025-12") == 3000
+
+    def test_cambio_de_uidvalidity(self, make_transaction):
+        """Tras un cambio de UIDVALIDITY el mismo email vuelve con otro UID: no suma ni avisa dos veces"""
+        alerts = []
+        store = AggregateStore(on_alert=alerts.append)
+        store.set_budget("u1", None, 10000)
+        before = make_transaction(email_id="10", amount=9000, message_id="<1@banco>")
+        after = make_transaction(email_id="3", amount=9000, message_id="<1@banco>")
+
+        def key(transaction):
+            return source_key("yo@gmail.com", transaction)
+
+        store.add_many("u1", [before], key=key)
+        assert store.add_many("u1", [after], key=key) == []
+
+        assert store.spent("u1", "2025-12") == 9000
+        assert len(alerts) == 1
+
+    def test_sin_clave_usa_el_contenido(self, store, make_transaction):
+        """Sin key, el mismo contenido es la misma transacción aunque el UID se repita"""
+        store.add("u1", make_transaction(email_id="5", amount=2000))
+        store.add("u1", make_transaction(email_id="5", amount=1000))
+        store.add("u1", make_transaction(email_id=None, amount=1000))
+        assert store.spent("u1", "2025-12") == 3000
+        with pytest.raises(KeyError):
+            store.recategorize("u1", "no-existe", "hogar")
+
+    def test_alertas(self, make_transaction):
+        alerts = []
+        store = AggregateStore(on_alert=alerts.append)
+        store.set_budget("u1", "supermercado", 10000)
+        store.set_budget("u1", None, 12000, thresholds=[1.0])
+
+        assert store.add("u1", make_transaction(email_id="1", amount=7000, category="supermercado")) == []
+        crossed = store.add("u1", make_transaction(email_id="2", amount=1500, category="supermercado"))
+        assert crossed == [BudgetAlert("u1", "2025-12", "supermercado", 10000, 8500, 0.8)]
+        # Ya avisado: seguir bajo el 100% no repite la alerta del 80%
+        assert store.add("u1", make_transaction(email_id="3", amount=500, category="supermercado")) == []
+
+        crossed = store.add("u1", make_transaction(email_id="4", amount=3000, category="transporte"))
+        assert crossed == [BudgetAlert("u1", "2025-12", None, 12000, 12000, 1.0)]
+        # Los abonos no cuentan como gasto
+        abono = make_transaction(email_id="5", amount=99999, category="supermercado", type=TransactionType.ABONO)
+        assert store.add("u1", abono) == []
+
+        assert [(a.category, a.threshold) for a in alerts] == [("supermercado", 0.8), (None, 1.0)]
+
+    def test_alerta_al_recategorizar(self, store, make_transaction):
+        store.set_budget("u1", "ocio", 5000, thresholds=[1.0])
+        store.set_budget("u1", None, 5000, thresholds=[1.0])
+        store.add("u1", make_transaction(email_id="1", amount=6000), key="1")
+        # El total del mes no cambia: solo avisa el presupuesto de la categoría
+        alerts = store.recategorize("u1", "1", "ocio")
+        assert [(a.category, a.spent) for a in alerts] == [("ocio", 6000)]
+
+    def test_resync_identico_no_repite_alertas(self, make_transaction):
+        alerts = []
+        store = AggregateStore(on_alert=alerts.append)
+        store.set_budget("u1", "supermercado", 10000)
+        store.add("u1", make_transaction(email_id="1", amount=8500, category="supermercado"), key="1")
+        store.add("u1", make_transaction(email_id="2", amount=2000, category="supermercado"), key="2")
+
+        assert store.add("u1", make_transaction(email_id="1", amount=8500, category="supermercado"), key="1") == []
+        assert store.add("u1", make_transaction(email_id="2", amount=2000, category="supermercado"), key="2") == []
+        # Un reemplazo que sí sube el gasto puede cruzar un umbral nuevo
+        assert store.add("u1", make_transaction(email_id="2", amount=1000, category="supermercado"), key="2") == []
+        crossed = store.add("u1", make_transaction(email_id="2", amount=1600, category="supermercado"), key="2")
+        assert [a.threshold for a in crossed] == [1.0]
+        assert [a.threshold for a in alerts] == [0.8, 1.0, 1.0]
+
+    def test_presupuesto_invalido(self, store):
+        with pytest.raises(ValueError):
+            store.set_budget("u1", "ocio", 0)
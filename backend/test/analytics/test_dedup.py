@@ -0,0 +1,103 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from app.analytics.dedup import DUPLICATE, DedupIndex, find_duplicates
+from app.parsers.base import TransactionType
+
+
+T0 = datetime(2025, 12, 18, 19, 0)
+
+
+class TestDedup:
+    """Tests para la detección de duplicados y transferencias internas"""
+
+    def test_duplicado_reenviado(self, make_transaction):
+        """La misma compra notificada dos veces con pocos minutos de diferencia"""
+        transactions = [
+            make_transaction(amount=5390, date=T0),
+            make_transaction(amount=12000, date=T0),
+            make_transaction(amount=5390, date=T0 + timedelta(minutes=2)),
+        ]
+        result = find_duplicates(transactions)
+        assert result.duplicates == {2: 0}
+        assert result.unique(transactions) == transactions[:2]
+
+    def test_fuera_de_ventana_o_distinta_cuenta(self, make_transaction):
+        result = find_duplicates([
+            make_transaction(amount=5390, date=T0),
+            make_transaction(amount=5390, date=T0 + timedelta(minutes=6)),
+            make_transaction(amount=5390, date=T0, last_digits="1111"),
+            make_transaction(amount=5390, date=T0, type=TransactionType.GIRO),
+        ])
+        assert result.duplicates == {}
+
+    def test_ventana_cruza_buckets(self, make_transaction):
+        """Dos fechas cercanas en buckets distintos igual coinciden"""
+        start = datetime.fromtimestamp(300 * 1000 - 60)
+        result = find_duplicates([
+            make_transaction(amount=5390, date=start),
+            make_transaction(amount=5390, date=start + timedelta(minutes=2)),
+        ])
+        assert result.duplicates == {1: 0}
+
+    def test_transferencia_interna(self, make_transaction):
+        """Transferencia realizada + abono del mismo monto entre cuentas propias"""
+        transactions = [
+            make_transaction(amount=50000, date=T0, type=TransactionType.TRANSFERENCIA, last_digits="3204"),
+            make_transaction(amount=9990, date=T0 + timedelta(minutes=1)),
+            make_transaction(amount=50000, date=T0 + timedelta(minutes=1), type=TransactionType.ABONO,
+                             last_digits="7777"),
+            # Un segundo abono igual no tiene transferencia con qué emparejarse
+            make_transaction(amount=50000, date=T0 + timedelta(minutes=2), type=TransactionType.ABONO,
+                             last_digits="8888"),
+        ]
+        result = find_duplicates(transactions)
+        assert result.transfers == [(0, 2)]
+        assert result.internal == {0, 2}
+        assert result.spending(transactions) == [transactions[1], transactions[3]]
+
+    def test_abono_antes_que_transferencia(self, make_transaction):
+        result = find_duplicates([
+            make_transaction(amount=50000, date=T0, type=TransactionType.ABONO, last_digits="7777"),
+            make_transaction(amount=50000, date=T0, type=TransactionType.TRANSFERENCIA, last_digits="3204"),
+        ])
+        assert result.transfers == [(1, 0)]
+
+    def test_misma_cuenta_no_es_interna(self, make_transaction):
+        result = find_duplicates([
+            make_transaction(amount=50000, date=T0, type=TransactionType.TRANSFERENCIA),
+            make_transaction(amount=50000, date=T0, type=TransactionType.ABONO),
+        ])
+        assert result.transfers == []
+
+    def test_incremental(self, make_transaction):
+        index = DedupIndex(timedelta(minutes=5))
+        assert index.add(make_transaction(amount=5390, date=T0)) is None
+        match = index.add(make_transaction(amount=5390, date=T0 + timedelta(minutes=3)))
+        assert (match.kind, match.index, match.other) == (DUPLICATE, 1, 0)
+        assert len(index) == 2
+
+    def test_tolerancia_invalida(self):
+        with pytest.raises(ValueError):
+            DedupIndex(timedelta(0))
+
+    def test_equivale_a_comparar_pares(self, make_transaction):
+        """El índice encuentra los mismos duplicados que la comparación O(n²)"""
+        random.seed(7)
+        transactions = [
+            make_transaction(amount=random.choice([1000, 2000, 3000]),
+                             date=T0 + timedelta(seconds=random.randint(0, 3600)),
+                             last_digits=random.choice(["1", "2"]))
+            for _ in range(300)
+        ]
+        result = find_duplicates(transactions, timedelta(minutes=5))
+
+        expected = {}
+        for i, t in enumerate(transactions):
+            for j in range(i):
+                other = transactions[j]
+                if (j not in expected and other.amount == t.amount and other.last_digits == t.last_digits
+                        and abs(other.date - t.date) <= timedelta(minutes=5)):
+                    expected[i] = j
+                    break
+        assert result.duplicates.keys() == expected.keys()
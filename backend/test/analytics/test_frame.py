@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime
+from app.analytics.frame import Group, TransactionFrame
+from app.parsers.base import TransactionType
+
+
+class TestTransactionFrame:
+    """Tests para el frame columnar de transacciones"""
+
+    @pytest.fixture
+    def frame(self, make_transaction):
+        return TransactionFrame.from_transactions([
+            make_transaction(merchant="LIDER", amount=5390, date=datetime(2025, 11, 3, 10, 0),
+                             category="supermercado"),
+            make_transaction(merchant="JUMBO", amount=12000, date=datetime(2025, 11, 20, 18, 30),
+                             category="supermercado"),
+            make_transaction(merchant="Cajero automático", amount=30000, date=datetime(2025, 12, 13, 14, 18),
+                             type=TransactionType.GIRO),
+            make_transaction(merchant="UBER *TRIP", amount=4500, date=datetime(2025, 12, 18, 19, 0),
+                             category="transporte", last_digits="1111"),
+            make_transaction(merchant="LIDER", amount=2990, date=datetime(2025, 12, 24, 9, 15),
+                             category="supermercado"),
+        ])
+
+    def test_columnas(self, frame):
+        assert len(frame) == 5
+        assert frame.amount.dtype == 'int64'
+        assert frame.date.dtype == 'datetime64[s]'
+        assert frame.codes['merchant'].tolist() == [0, 1, 2, 3, 0]
+        # None se codifica como -1
+        assert frame.codes['category'].tolist() == [0, 0, -1, 1, 0]
+        assert frame.labels('account') == ["3204", "3204", "3204", "1111", "3204"]
+
+    def test_filtros(self, frame):
+        assert frame.where(type=TransactionType.COMPRA).total() == 24880
+        assert frame.where(merchant=["LIDER", "JUMBO"]).total() == 20380
+        assert frame.where(start=datetime(2025, 12, 1), end=datetime(2025, 12, 20)).total() == 34500
+        assert frame.where(min_amount=5000, account="3204").total() == 47390
+        # Un valor que no existe no calza con nada
+        assert len(frame.where(merchant="NO EXISTE")) == 0
+
+    def test_columna_desconocida(self, frame):
+        with pytest.raises(ValueError):
+            frame.mask(color="rojo")
+
+    def test_group_by(self, frame):
+        assert frame.group_by('merchant') == [
+            Group("Cajero automático", 30000, 1),
+            Group("JUMBO", 12000, 1),
+            Group("LIDER", 8380, 2),
+            Group("UBER *TRIP", 4500, 1),
+        ]
+        assert frame.by_category() == [
+            Group(None, 30000, 1),
+            Group("supermercado", 20380, 3),
+            Group("transporte", 4500, 1),
+        ]
+
+    def test_mensual(self, frame):
+        assert frame.monthly() == [Group("2025-11", 17390, 2), Group("2025-12", 37490, 3)]
+        assert frame.where(type=TransactionType.COMPRA).monthly('category') == [
+            Group(("2025-11", "supermercado"), 17390, 2),
+            Group(("2025-12", "supermercado"), 2990, 1),
+            Group(("2025-12", "transporte"), 4500, 1),
+        ]
+
+    def test_vacio(self):
+        frame = TransactionFrame.from_transactions([])
+        assert frame.total() == 0
+        assert frame.group_by('merchant') == []
+        assert frame.monthly() == []
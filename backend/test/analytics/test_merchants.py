@@ -0,0 +1,93 @@
+import pytest
+from app.analytics.merchants import MerchantCatalog, normalize_merchant
+
+
+class TestNormalizeMerchant:
+    """Tests para la normalización de nombres de comercio"""
+
+    @pytest.mark.parametrize("raw, expected", [
+        ("HIPER VINA CENTRO", "HIPER"),
+        ("Hiper Viña Centro", "HIPER"),
+        ("DP     *IKEA.COM", "IKEA.COM"),
+        ("UBER *TRIP", "UBER TRIP"),
+        ("AMAZON *MK12AB", "AMAZON"),
+        ("LIDER EXPRESS PROVIDENCIA 123", "LIDER"),
+        ("JUMBO LA FLORIDA", "JUMBO"),
+        ("H&M", "H&M"),
+        ("Cajero automático", "CAJERO AUTOMATICO"),
+        ("COPEC 1234", "COPEC"),
+        ("JUMBO PUERTO MONTT", "JUMBO"),
+        # Palabras genéricas que son parte del nombre
+        ("CAFE EL ALTO", "CAFE EL ALTO"),
+        ("PIZZERIA LA CENTRAL", "PIZZERIA LA CENTRAL"),
+        ("LOS PUERTOS", "LOS PUERTOS"),
+        ("", ""),
+    ])
+    def test_normaliza(self, raw, expected):
+        assert normalize_merchant(raw) == expected
+
+
+class TestMerchantCatalog:
+    """Tests para el catálogo de comercios y categorías"""
+
+    @pytest.fixture
+    def catalog(self):
+        catalog = MerchantCatalog()
+        catalog.register("Lider", category="supermercado")
+        catalog.register("Hiper Lider", merchant_id="lider", category="supermercado")
+        catalog.register("Uber", category="transporte")
+        return catalog
+
+    def test_resolucion_exacta(self, catalog):
+        assert catalog.resolve("HIPER LIDER VINA") == "lider"
+        assert catalog.resolve("LIDER.CL") is None
+        assert catalog.resolve("LIDER MAIPU") == "LIDER"
+        assert catalog.resolve("UBER") == "UBER"
+        # La primera palabra sola no basta para ser el mismo comercio
+        assert catalog.resolve("UBER *EATS") is None
+        assert catalog.resolve("LIDER ELECTRO") is None
+        assert catalog.resolve("LIDERAZGO SPA") is None
+
+    def test_categoria(self, catalog):
+        assert catalog.category("Hiper Lider Quilpué") == "supermercado"
+        assert catalog.category("COMERCIO NUEVO") is None
+        assert catalog.category(None) is None
+
+    def test_aprende_decision(self, catalog):
+        """La categoría elegida para una sucursal vale para las demás"""
+        catalog.learn("HIPER VINA CENTRO", "supermercado")
+        assert catalog.category("HIPER QUILPUE") == "supermercado"
+        # Cambiar la categoría de un comercio ya conocido
+        catalog.learn("UBER", "viajes")
+        assert catalog.category("Uber") == "viajes"
+        assert ("HIPER", "supermercado") in catalog.decisions()
+
+    def test_no_categoriza_por_la_primera_palabra(self, catalog):
+        catalog.learn("UBER *TRIP", "transporte")
+        assert catalog.category("UBER *TRIP") == "transporte"
+        assert catalog.category("UBER EATS") is None
+
+    def test_lru(self):
+        catalog = MerchantCatalog(cache_size=2)
+        catalog.register("LIDER")
+        for name in ("LIDER 1", "LIDER 2", "LIDER 3"):
+            catalog.resolve(name)
+        assert list(catalog._cache) == ["LIDER 2", "LIDER 3"]
+        # Registrar un comercio invalida las resoluciones guardadas
+        catalog.register("JUMBO")
+        assert not catalog._cache
+
+    def test_categorize(self, catalog, make_transaction):
+        transactions = [
+            make_transaction(merchant="LIDER MAIPU"),
+            make_transaction(merchant="COMERCIO NUEVO"),
+            make_transaction(merchant="UBER", category="trabajo"),
+        ]
+        pending = catalog.categorize(transactions)
+
+        assert [t.category for t in transactions] == ["supermercado", None, "trabajo"]
+        assert pending == [transactions[1]]
+
+    def test_nombre_vacio(self, catalog):
+        with pytest.raises(ValueError):
+            catalog.register("  ")
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+from app.analytics.subscriptions import SubscriptionDetector, detect_subscriptions
+from app.parsers.base import TransactionType
+
+
+T0 = datetime(2025, 1, 5, 10, 0)
+
+
+def monthly(make_transaction, merchant, amount, months, start=T0, jitter=0):
+    return [
+        make_transaction(merchant=merchant, amount=amount, date=start + timedelta(days=30 * i + jitter * (i % 2)))
+        for i in range(months)
+    ]
+
+
+class TestSubscriptionDetector:
+    """Tests para la detección de suscripciones"""
+
+    def test_detecta_mensual_y_anual(self, make_transaction):
+        rng = random.Random(3)
+        transactions = (
+            monthly(make_transaction, "DP     *NETFLIX.COM", 7990, 6, jitter=2)
+            + [make_transaction(merchant="SPOTIFY", amount=4990, date=T0 + timedelta(days=7 * i)) for i in range(4)]
+            + [make_transaction(merchant="ADOBE", amount=120000, date=T0 + timedelta(days=365 * i)) for i in range(3)]
+            + [make_transaction(merchant="LIDER", amount=rng.randint(3000, 90000),
+                                date=T0 + timedelta(days=rng.randint(0, 200))) for _ in range(40)]
+        )
+        rng.shuffle(transactions)
+        found = {s.merchant: s for s in detect_subscriptions(transactions)}
+
+        assert set(found) == {"NETFLIX.COM", "SPOTIFY", "ADOBE"}
+        netflix = found["NETFLIX.COM"]
+        assert (netflix.period, netflix.amount, netflix.count) == ("mensual", 7990, 6)
+        assert netflix.last_date == T0 + timedelta(days=150 + 2)
+        assert found["SPOTIFY"].period == "semanal"
+        assert found["ADOBE"].period == "anual"
+
+    def test_descarta_irregulares(self, make_transaction):
+        transactions = (
+            # Pocos cobros
+            monthly(make_transaction, "DISNEY", 6990, 2)
+            # Montos muy distintos
+            + [make_transaction(merchant="COPEC", amount=amount, date=T0 + timedelta(days=30 * i))
+               for i, amount in enumerate([10000, 45000, 8000, 60000])]
+            # Los giros no son suscripciones
+            + [make_transaction(merchant="Cajero automático", amount=20000, date=T0 + timedelta(days=30 * i),
+                                type=TransactionType.GIRO) for i in range(5)]
+        )
+        assert detect_subscriptions(transactions) == []
+
+    def test_sucursales_y_cambio_de_precio(self, make_transaction):
+        """El comercio se normaliza y un cambio de precio aislado se tolera"""
+        names = ["GIMNASIO PACIFIC", "GIMNASIO PACIFIC CENTRO", "Gimnasio Pacific"]
+        amounts = [25000, 25000, 25000, 29990, 25000]
+        transactions = [
+            make_transaction(merchant=names[i % 3], amount=amount, date=T0 + timedelta(days=31 * i))
+            for i, amount in enumerate(amounts)
+        ]
+        found = detect_subscriptions(transactions)
+        assert [(s.merchant, s.amount, s.count) for s in found] == [("GIMNASIO PACIFIC", 25000, 5)]
+
+    def test_incremental(self, make_transaction):
+        detector = SubscriptionDetector()
+        assert detector.update(monthly(make_transaction, "NETFLIX", 7990, 2)) == []
+
+        found = detector.update([
+            make_transaction(merchant="NETFLIX", amount=7990, date=T0 + timedelta(days=60)),
+            make_transaction(merchant="LIDER", amount=5000, date=T0),
+        ])
+        assert [s.merchant for s in found] == ["NETFLIX"]
+        assert detector.subscriptions["NETFLIX"].next_date == T0 + timedelta(days=90)
+
+        # Un cobro fuera de ritmo y con otro monto deja de calzar
+        detector.update([make_transaction(merchant="NETFLIX", amount=1000, date=T0 + timedelta(days=61))])
+        assert "NETFLIX" not in detector.subscriptions
+        assert detector.update([]) == []
@@ -0,0 +1,108 @@
+from dataclasses import replace
+
+import pytest
+
+from benchmarks.__main__ import main
+from benchmarks.runner import Baseline, Case, Result, compare, measure, percentile
+from benchmarks.suite import BENCHMARKS, Workload, run_suite
+
+
+def result(name="parse", ops_per_sec=1000.0, peak_kib=100.0) -> Result:
+    return Result(name=name, calls=10, seconds=0.01, ops_per_sec=ops_per_sec,
+                  p50_us=900.0, p99_us=1500.0, peak_kib=peak_kib)
+
+
+@pytest.fixture(scope="module")
+def workload():
+    return Workload.generate(60, seed=1)
+
+
+class TestRunner:
+    """Tests de la medición y la comparación con el baseline"""
+
+    def test_measure(self):
+        """Debe llamar la función por cada input en cada ronda y medir memoria"""
+        calls = []
+        case = Case("lista", lambda n: calls.append(list(range(n))), [1000] * 5)
+
+        measured = measure(case, rounds=2)
+
+        # Calentamiento + 2 rondas + 2 pasadas de memoria
+        assert len(calls) == 5 * 5
+        assert measured.calls == 10
+        assert measured.ops_per_sec > 0
+        assert 0 < measured.p50_us <= measured.p99_us
+        assert measured.peak_kib > 0
+
+    def test_measure_without_inputs(self):
+        with pytest.raises(ValueError):
+            measure(Case("vacio", lambda item: None, []))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50.5
+        assert percentile(values, 99) == pytest.approx(99.01)
+        assert percentile([7], 99) == 7
+
+    def test_compare_detects_slowdown(self):
+        """Más lento que el umbral es regresión; dentro del umbral no"""
+        baseline = Baseline({"parse": result(ops_per_sec=1000)})
+
+        assert compare({"parse": result(ops_per_sec=850)}, baseline, threshold=0.25) == []
+        regressions = compare({"parse": result(ops_per_sec=700)}, baseline, threshold=0.25)
+        assert [(r.name, r.metric) for r in regressions] == [("parse", "ops_per_sec")]
+        assert regressions[0].change == pytest.approx(1000 / 700 - 1)
+
+    def test_compare_detects_memory_growth(self):
+        """El peak de memoria también cuenta, salvo diferencias chicas"""
+        baseline = Baseline({"parse": result(peak_kib=100)})
+
+        assert compare({"parse": result(peak_kib=150)}, baseline, threshold=0.25) == []
+        regressions = compare({"parse": result(peak_kib=400)}, baseline, threshold=0.25)
+        assert [r.metric for r in regressions] == ["peak_kib"]
+
+    def test_compare_ignores_new_benchmarks(self):
+        assert compare({"nuevo": result("nuevo")}, Baseline({}), threshold=0.25) == []
+
+    def test_baseline_roundtrip(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        Baseline({"parse": result()}, {"size": 60}).save(path)
+
+        loaded = Baseline.load(path)
+
+        assert loaded.results == {"parse": result()}
+        assert loaded.metadata == {"size": 60}
+        assert Baseline.load(tmp_path / "no_existe.json") is None
+
+
+class TestSuite:
+    """Tests de los benchmarks del pipeline"""
+
+    def test_every_benchmark_runs(self, workload):
+        """Cada benchmark registrado debe poder armarse y medirse"""
+        results = run_suite(workload, rounds=1, memory=False)
+        assert [r.name for r in results] == list(BENCHMARKS)
+        assert all(r.calls > 0 and r.ops_per_sec > 0 for r in results)
+
+    def test_unknown_benchmark(self, workload):
+        with pytest.raises(ValueError):
+            run_suite(workload, ["no_existe"])
+
+    def test_main_fails_on_regression(self, tmp_path):
+        """El comando termina con 1 si hay regresión respecto al baseline guardado"""
+        path = tmp_path / "baseline.json"
+        args = ["--size", "40", "--rounds", "1", "--only", "detect_type", "--baseline", str(path)]
+        assert main(args + ["--save"]) == 0
+        saved = Baseline.load(path)
+        measured = saved.results["detect_type"]
+
+        # Baseline holgado (1000x más lento y con más memoria): el resultado
+        # no depende del ruido de una corrida de una sola ronda
+        saved.results["detect_type"] = replace(measured, ops_per_sec=measured.ops_per_sec / 1000,
+                                               peak_kib=measured.peak_kib * 1000 + 1024)
+        saved.save(path)
+        assert main(args) == 0
+
+        saved.results["detect_type"] = replace(measured, ops_per_sec=measured.ops_per_sec * 1000)
+        saved.save(path)
+        assert main(args) == 1
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pytest
+
+from app.parsers.base import Transaction, TransactionType
+
+
+@pytest.fixture
+def make_transaction():
+    """Fábrica de Transaction con valores por defecto
+
+    Cada test pasa solo los campos que le importan, ej:
+    make_transaction(amount=5000, category="supermercado").
+    """
+    def make(merchant: str = "LIDER", **fields) -> Transaction:
+        values = dict(
+            bank="banco_chile", type=TransactionType.COMPRA, amount=5390,
+            description=f"Compra en {merchant}", date=datetime(2025, 12, 18, 19, 0),
+            merchant=merchant, last_digits="3204"
+        )
+        values.update(fields)
+        return Transaction(**values)
+    return make
@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.metrics import MetricsRegistry
+from app.email.connection import parse_email
+from app.models.base import create_tables
+from app.models.transaction import upsert_transactions
+from app.parsers.registry import default_registry
+from app.testing.corpus import CorpusGenerator, generate_corpus
+from app.testing.imap_server import IMAPServer
+
+BANK = "enviodigital@bancochile.cl"
+
+
+@pytest.fixture
+def enabled():
+    """Habilita las métricas globales y las deja limpias al terminar"""
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.reset()
+
+
+class TestRegistry:
+    """Tests de contadores, histogramas y exportación"""
+
+    def test_counter(self):
+        registry = MetricsRegistry(enabled=True)
+        counter = registry.counter('emails_total', 'Emails', ('reason',))
+
+        counter.inc(reason='a')
+        counter.inc(2, reason='a')
+        counter.inc(reason='b')
+
+        assert counter.value(reason='a') == 3
+        assert counter.value(reason='b') == 1
+        assert counter.value(reason='c') == 0
+        with pytest.raises(ValueError):
+            counter.inc(otro='a')
+        with pytest.raises(ValueError):
+            counter.inc(-1, reason='a')
+
+    def test_disabled_is_noop(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('emails_total', 'Emails')
+        histogram = registry.histogram('stage_seconds', 'Duración', ('stage',))
+
+        counter.inc()
+        histogram.observe(0.5, stage='fetch')
+
+        assert counter.value() == 0
+        assert histogram.count(stage='fetch') == 0
+
+    def test_same_definition_returns_existing(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('emails_total', 'Emails')
+        assert registry.counter('emails_total', 'Emails') is counter
+        with pytest.raises(ValueError):
+            registry.histogram('emails_total', 'Emails')
+
+    def test_histogram_buckets(self):
+        registry = MetricsRegistry(enabled=True)
+        histogram = registry.histogram('stage_seconds', 'Duración', ('stage',), buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, stage='fetch')
+
+        snapshot = registry.snapshot()['stage_seconds'][('fetch',)]
+        assert snapshot['count'] == 4
+        assert snapshot['sum'] == pytest.approx(3.65)
+        assert snapshot['buckets'] == {0.1: 2, 1.0: 3, float('inf'): 4}
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.counter('bytes_total', 'Bytes recibidos').inc(1024)
+        registry.counter('skipped_total', 'Descartados', ('reason',)).inc(reason='con "comillas"')
+        registry.histogram('stage_seconds', 'Duración', ('stage',), buckets=(0.5,)).observe(0.25, stage='fetch')
+
+        assert registry.to_prometheus() == (
+            '# HELP bytes_total Bytes recibidos\n'
+            '# TYPE bytes_total counter\n'
+            'bytes_total 1024\n'
+            '# HELP skipped_total Descartados\n'
+            '# TYPE skipped_total counter\n'
+            'skipped_total{reason="con \\"comillas\\""} 1\n'
+            '# HELP stage_seconds Duración\n'
+            '# TYPE stage_seconds histogram\n'
+            'stage_seconds_bucket{stage="fetch",le="0.5"} 1\n'
+            'stage_seconds_bucket{stage="fetch",le="+Inf"} 1\n'
+            'stage_seconds_sum{stage="fetch"} 0.25\n'
+            'stage_seconds_count{stage="fetch"} 1\n'
+        )
+
+
+class TestHooks:
+    """Tests de timed e instrumented sobre las métricas globales"""
+
+    def test_disabled_does_not_record(self):
+        metrics.REGISTRY.reset()
+
+        @metrics.instrumented('prueba')
+        def work():
+            return 42
+
+        with metrics.timed('bloque'):
+            assert work() == 42
+        assert metrics.STAGE_SECONDS.values() == {}
+
+    def test_timed_and_instrumented(self, enabled):
+        @metrics.instrumented('prueba')
+        def work(value):
+            return value * 2
+
+        @metrics.instrumented('prueba_async')
+        async def work_async(value):
+            return value + 1
+
+        with metrics.timed('bloque'):
+            assert work(2) == 4
+        assert asyncio.run(work_async(1)) == 2
+
+        assert metrics.STAGE_SECONDS.count(stage='prueba') == 1
+        assert metrics.STAGE_SECONDS.count(stage='prueba_async') == 1
+        assert metrics.STAGE_SECONDS.count(stage='bloque') == 1
+        assert work.__name__ == 'work'
+
+    def test_timed_records_on_exception(self, enabled):
+        with pytest.raises(RuntimeError):
+            with metrics.timed('falla'):
+                raise RuntimeError()
+        assert metrics.STAGE_SECONDS.count(stage='falla') == 1
+
+    def test_fetched_bytes(self):
+        data = [(b'1 (UID 1 RFC822 {5}', b'hola!'), b')', (b'2 (UID 2 RFC822 {2}', b'ok'), b')']
+        assert metrics.fetched_bytes(data) == 19 + 5 + 1 + 19 + 2 + 1
+        assert metrics.fetched_bytes(None) == 0
+
+
+class TestPipelineMetrics:
+    """Las etapas del pipeline real deben quedar medidas"""
+
+    def test_sync_parse_persist(self, enabled):
+        corpus = generate_corpus(80, seed=4)
+        registry = default_registry()
+        with IMAPServer() as server:
+            for synthetic in corpus:
+                server.deliver(synthetic.raw)
+            with server.connector("usuario@gmail.com", "secreto") as connector:
+                emails = connector.sync_emails(BANK, since_date=datetime(2000, 1, 1), parsers=registry.parsers)
+                connector.search_emails(BANK, since_date=datetime(2000, 1, 1), limit=1)
+                assert connector._fetch_email(b'1') is not None
+                uidvalidity = connector.sync_states[('INBOX', BANK)].uidvalidity
+        transactions = [t for t in (registry.parse(e) for e in emails) if t]
+
+        engine = create_engine("sqlite://")
+        create_tables(engine)
+        with Session(engine) as session:
+            upsert_transactions(session, transactions, user_id="u1", account="usuario@gmail.com",
+                                uidvalidity=uidvalidity)
+
+        expected = [m for m in corpus if m.expected]
+        cartolas = sum(1 for m in corpus if m.kind == 'cartola')
+        for stage in ('connect', 'sync_emails', 'search_emails', 'search', 'fetch', 'fetch_email',
+                      'decode', 'parse', 'persist'):
+            assert metrics.STAGE_SECONDS.count(stage=stage) > 0, stage
+        assert metrics.STAGE_SECONDS.count(stage='parse') == len(expected)
+        assert metrics.FETCHED_BYTES.value() > sum(len(m.raw) for m in expected)
+        assert metrics.EMAILS_SKIPPED.value(reason='descartado_por_headers') == cartolas
+        assert metrics.TRANSACTIONS_PERSISTED.value() == len(expected)
+        parsed = sum(value for value in metrics.TRANSACTIONS_PARSED.values().values())
+        assert parsed == len(expected)
+        assert 'chauchometro_stage_seconds_bucket{stage="fetch",le="+Inf"}' in metrics.REGISTRY.to_prometheus()
+
+    def test_parse_failures_and_skips(self, enabled):
+        registry = default_registry()
+        generator = CorpusGenerator(seed=2)
+        cartola = generator.email('cartola')
+        broken = generator.email('cargo_cuenta').raw.replace(b'por $', b'por USD ')
+        other = generator.email('otro_remitente')
+
+        assert registry.parse(parse_email('1', cartola.raw)) is None
+        assert registry.parse(parse_email('2', broken)) is None
+        assert registry.parse(parse_email('3', other.raw)) is None
+
+        assert metrics.EMAILS_SKIPPED.value(reason='no_transaccional') == 1
+        assert metrics.EMAILS_SKIPPED.value(reason='sin_parser') == 1
+        assert metrics.PARSE_FAILURES.value(bank='bancochile', type='compra') == 1
@@ -0,0 +1,218 @@
+import asyncio
+import re
+from datetime import datetime
+from email.message import EmailMessage as MIMEMessage
+from email.utils import format_datetime
+
+import pytest
+
+from app.email.async_connection import (
+    AsyncEmailConnector, AsyncIMAPAbort, AsyncIMAPClient, AsyncIMAPError
+)
+from app.parsers.banco_chile import BancoChileParser
+
+
+def build_raw_email(subject: str, html: str = "<p>Compra por $1.000</p>") -> bytes:
+    msg = MIMEMessage()
+    msg['Subject'] = subject
+    msg['From'] = "Banco de Chile <enviodigital@bancochile.cl>"
+    msg['Date'] = format_datetime(datetime(2026, 1, 5, 10, 0))
+    msg.set_content("texto plano")
+    msg.add_alternative(html, subtype='html')
+    return msg.as_bytes().replace(b'\n', b'\r\n')
+
+
+class ScriptedIMAPServer:
+    """Servidor IMAP mínimo sobre asyncio para probar el conector"""
+
+    def __init__(self, messages, uidvalidity=1):
+        self.messages = dict(messages)
+        self.uidvalidity = uidvalidity
+        self.commands = []
+        self.server = None
+        # Cortar la conexión al recibir el próximo FETCH RFC822
+        self.drop_on_fetch = False
+        self.reject_login = False
+        # Conexiones que el cliente cerró
+        self.closed = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        writer.write(b'* OK IMAP4rev1 listo\r\n')
+        while True:
+            line = await reader.readline()
+            if not line:
+                self.closed += 1
+                break
+            tag, command, *rest = line.decode().rstrip('\r\n').split(' ', 2)
+            self.commands.append(' '.join([command] + rest))
+            if self.drop_on_fetch and command == 'UID' and 'RFC822' in rest[0]:
+                self.drop_on_fetch = False
+                break
+            if command == 'LOGIN' and self.reject_login:
+                writer.write(f'{tag} NO credenciales inválidas\r\n'.encode())
+                await writer.drain()
+                continue
+            if command == 'SELECT':
+                uidnext = max(self.messages, default=0) + 1
+                writer.write(f'* {len(self.messages)} EXISTS\r\n'.encode())
+                writer.write(f'* OK [UIDVALIDITY {self.uidvalidity}] UIDs válidos\r\n'.encode())
+                writer.write(f'* OK [UIDNEXT {uidnext}] próximo UID\r\n'.encode())
+            elif command == 'UID':
+                self._uid(writer, *rest[0].split(' ', 1))
+            elif command == 'LOGOUT':
+                writer.write(b'* BYE chao\r\n')
+            writer.write(f'{tag} OK {command} completado\r\n'.encode())
+            await writer.drain()
+            if command == 'LOGOUT':
+                break
+        writer.close()
+
+    def _uid(self, writer, command, args):
+        if command == 'SEARCH':
+            uids = sorted(self.messages)
+            match = re.search(r'UID (\d+):\*', args)
+            if match:
+                uids = [u for u in uids if u >= int(match.group(1))] or uids[-1:]
+            writer.write(('* SEARCH ' + ' '.join(map(str, uids))).rstrip().encode() + b'\r\n')
+            return
+        message_set, query = args.split(' ', 1)
+        for seq, uid in enumerate(self._expand(message_set), start=1):
+            if uid not in self.messages:
+                continue
+            raw, item = self.messages[uid], 'RFC822'
+            if 'HEADER.FIELDS' in query:
+                raw, item = raw.split(b'\r\n\r\n', 1)[0] + b'\r\n\r\n', 'BODY[HEADER.FIELDS (SUBJECT FROM DATE)]'
+            # El UID va después del literal para ejercitar ese caso
+            writer.write(f'* {seq} FETCH ({item} {{{len(raw)}}}\r\n'.encode() + raw + f' UID {uid})\r\n'.encode())
+
+    def _expand(self, message_set):
+        uids = []
+        for part in message_set.split(','):
+            start, _, end = part.partition(':')
+            uids += range(int(start), int(end or start) + 1)
+        return uids
+
+
+class LocalAsyncConnector(AsyncEmailConnector):
+    """Conector apuntando al servidor local sin TLS"""
+
+    def __init__(self, port, **kwargs):
+        super().__init__("usuario@gmail.com", "secreto", **kwargs)
+        self.port = port
+
+    def _create_client(self):
+        self.client = AsyncIMAPClient('127.0.0.1', self.port)
+        return self.client
+
+
+def run_with_server(messages, scenario, uidvalidity=1):
+    async def main():
+        server = ScriptedIMAPServer(messages, uidvalidity)
+        port = await server.start()
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+class TestAsyncEmailConnector:
+    """Tests del conector asyncio contra un servidor IMAP local"""
+
+    def test_search_emails(self):
+        """Debe retornar los mismos EmailMessage que el conector bloqueante"""
+        async def scenario(server, port):
+            async with LocalAsyncConnector(port, fetch_chunk_size=2) as connector:
+                return await connector.search_emails("enviodigital@bancochile.cl")
+
+        emails = run_with_server({3: build_raw_email("Cargo en Cuenta"),
+                                  4: build_raw_email("Giro con Tarjeta de Débito"),
+                                  9: build_raw_email("Abono en tu cuenta")}, scenario)
+
+        assert [e.uid for e in emails] == ["3", "4", "9"]
+        assert emails[1].subject == "Giro con Tarjeta de Débito"
+        assert "$1.000" in emails[0].body_html
+
+    def test_sync_emails_incremental(self):
+        """La segunda sincronización solo debe pedir UIDs nuevos"""
+        async def scenario(server, port):
+            async with LocalAsyncConnector(port) as connector:
+                first = await connector.sync_emails("enviodigital@bancochile.cl")
+                server.messages[20] = build_raw_email("Cargo en Cuenta")
+                second = await connector.sync_emails("enviodigital@bancochile.cl")
+                return first, second, connector.sync_states
+
+        first, second, states = run_with_server({10: build_raw_email("Cargo en Cuenta")}, scenario, uidvalidity=5)
+
+        assert [e.uid for e in first] == ["10"]
+        assert [e.uid for e in second] == ["20"]
+        assert states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 20
+
+    def test_corte_de_conexion_no_avanza_el_estado(self):
+        """Si la conexión se cae durante el FETCH el error se propaga y no se guarda estado"""
+        async def scenario(server, port):
+            server.drop_on_fetch = True
+            connector = LocalAsyncConnector(port)
+            with pytest.raises(AsyncIMAPAbort):
+                await connector.sync_emails("enviodigital@bancochile.cl")
+            states = dict(connector.sync_states)
+            connector.connection = None
+            emails = await connector.sync_emails("enviodigital@bancochile.cl")
+            await connector.disconnect()
+            return states, emails
+
+        states, emails = run_with_server({10: build_raw_email("Cargo en Cuenta")}, scenario)
+
+        assert states == {}
+        assert [e.uid for e in emails] == ["10"]
+
+    def test_login_rechazado_cierra_el_socket(self):
+        """Un LOGIN con NO no debe dejar la conexión abierta"""
+        async def scenario(server, port):
+            server.reject_login = True
+            connector = LocalAsyncConnector(port)
+            with pytest.raises(AsyncIMAPError):
+                await connector.connect()
+            for _ in range(50):
+                if server.closed:
+                    break
+                await asyncio.sleep(0.01)
+            return connector.connection, server.closed
+
+        connection, closed = run_with_server({}, scenario)
+
+        assert connection is None
+        assert closed == 1
+
+    def test_headers_primero_con_parsers(self):
+        """Con parsers no debe descargar el cuerpo de la cartola"""
+        async def scenario(server, port):
+            async with LocalAsyncConnector(port) as connector:
+                emails = await connector.search_emails("enviodigital@bancochile.cl", parsers=[BancoChileParser()])
+                return emails, server.commands
+
+        emails, commands = run_with_server({1: build_raw_email("Cartola Cuenta Corriente"),
+                                            2: build_raw_email("Cargo en Cuenta")}, scenario)
+
+        assert [e.uid for e in emails] == ["2"]
+        assert "UID FETCH 2 (UID RFC822)" in commands
+
+    def test_varias_cuentas_en_paralelo(self):
+        """Varias cuentas deben poder sincronizarse a la vez en un solo event loop"""
+        async def scenario(server, port):
+            connectors = [LocalAsyncConnector(port) for _ in range(5)]
+            results = await asyncio.gather(*(c.sync_emails("enviodigital@bancochile.cl") for c in connectors))
+            await asyncio.gather(*(c.disconnect() for c in connectors))
+            return results
+
+        results = run_with_server({uid: build_raw_email("Cargo en Cuenta") for uid in range(1, 4)}, scenario)
+
+        assert [len(emails) for emails in results] == [3] * 5
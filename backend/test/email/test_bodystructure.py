@@ -0,0 +1,89 @@
+import base64
+
+from app.email.bodystructure import parse_fetch_response, find_text_part, decode_part
+
+
+# BODYSTRUCTURE típico de una notificación: alternative(plain, related(html, logo)) + PDF adjunto
+GMAIL_STRUCTURE = (
+    b'1 (UID 812 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL NIL)'
+    b'(("TEXT" "HTML" ("CHARSET" "ISO-8859-1") NIL NIL "BASE64" 2048 27 NIL NIL NIL NIL)'
+    b'("IMAGE" "PNG" ("NAME" "logo.png") "<logo>" NIL "BASE64" 9000 NIL ("INLINE" ("FILENAME" "logo.png")) NIL NIL)'
+    b' "RELATED" ("BOUNDARY" "b2") NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "cartola.pdf") NIL NIL "BASE64" 350000 NIL ("ATTACHMENT" ("FILENAME" "cartola.pdf")) NIL NIL)'
+    b' "MIXED" ("BOUNDARY" "b0") NIL NIL) BODY[HEADER.FIELDS (SUBJECT FROM DATE)] {24}'
+)
+
+
+class TestParseFetchResponse:
+    """Tests del parser de respuestas FETCH"""
+
+    def test_separa_items_y_literales(self):
+        """Debe separar UID, BODYSTRUCTURE y el literal de headers"""
+        data = [(GMAIL_STRUCTURE, b'Subject: Cargo en Cuenta\r\n'), b')']
+        [response] = parse_fetch_response(data)
+
+        assert response['UID'] == '812'
+        assert response['BODYSTRUCTURE'][-4] == 'MIXED'
+        assert response['BODY[HEADER.FIELDS (SUBJECT FROM DATE)]'] == b'Subject: Cargo en Cuenta\r\n'
+
+    def test_varios_mensajes_y_uid_despues_del_literal(self):
+        """Debe agrupar por mensaje aunque el UID venga después del literal"""
+        data = [
+            (b'1 (BODY[1] {5}', b'hola!'), b' UID 10)',
+            (b'2 (BODY[1] {5}', b'chao!'), b' UID 11)',
+        ]
+        responses = parse_fetch_response(data)
+
+        assert [(r['UID'], r['BODY[1]']) for r in responses] == [('10', b'hola!'), ('11', b'chao!')]
+
+    def test_strings_con_comillas_escapadas_y_nil(self):
+        """Debe interpretar NIL y comillas escapadas"""
+        [response] = parse_fetch_response([b'3 (UID 4 BODYSTRUCTURE ("TEXT" "PLAIN" ("NAME" "a \\"b\\"") NIL NIL "7BIT" 3 1))'])
+
+        assert response['BODYSTRUCTURE'][2] == ['NAME', 'a "b"']
+        assert response['BODYSTRUCTURE'][3] is None
+
+
+class TestFindTextPart:
+    """Tests de selección de la parte de texto"""
+
+    def test_prefiere_html_anidado(self):
+        """Debe ubicar el HTML dentro de multipart/related con su encoding y charset"""
+        [response] = parse_fetch_response([(GMAIL_STRUCTURE, b''), b')'])
+        part = find_text_part(response['BODYSTRUCTURE'])
+
+        assert part.section == '1.2.1'
+        assert part.subtype == 'html'
+        assert part.encoding == 'base64'
+        assert part.charset == 'ISO-8859-1'
+
+    def test_mensaje_simple_es_parte_1(self):
+        """Un mensaje no multipart solo tiene la parte 1"""
+        structure = ['TEXT', 'PLAIN', ['CHARSET', 'utf-8'], None, None, '7BIT', '42', '2']
+        part = find_text_part(structure)
+
+        assert part.section == '1'
+        assert part.subtype == 'plain'
+
+    def test_ignora_texto_adjunto(self):
+        """Un .txt adjunto no es el cuerpo del email"""
+        structure = [
+            ['TEXT', 'PLAIN', None, None, None, '7BIT', '10', '1', None, ['ATTACHMENT', ['FILENAME', 'a.txt']]],
+            ['IMAGE', 'PNG', None, None, None, 'BASE64', '100'],
+            'MIXED',
+        ]
+        assert find_text_part(structure) is None
+
+
+class TestDecodePart:
+    """Tests de decodificación de transfer encodings"""
+
+    def test_base64_latin1(self):
+        data = base64.b64encode("Cajero automático".encode('latin-1'))
+        assert decode_part(data, 'BASE64', 'iso-8859-1') == "Cajero automático"
+
+    def test_quoted_printable(self):
+        assert decode_part(b'D=C3=A9bito', 'quoted-printable', 'utf-8') == "Débito"
+
+    def test_charset_desconocido_usa_utf8(self):
+        assert decode_part("Débito".encode(), '8bit', 'x-desconocido') == "Débito"
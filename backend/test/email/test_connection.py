@@ -0,0 +1,725 @@
+import imaplib
+import re
+import socket
+import threading
+import pytest
+import email
+from datetime import datetime
+from email.message import EmailMessage as MIMEMessage
+from email.utils import format_datetime
+
+from app.email.connection import EmailConnector, SyncState, build_from_criteria, build_message_set
+from app.parsers.banco_chile import BancoChileParser
+from app.testing.imap_server import IMAPServer, body_section, bodystructure
+
+
+def build_raw_email(subject: str, sender: str = "enviodigital@bancochile.cl",
+                    html: str = "<p>Compra por $1.000</p>",
+                    date: datetime = datetime(2026, 1, 5, 10, 0),
+                    message_id: str = "") -> bytes:
+    """Construye un email RFC822 simple"""
+    msg = MIMEMessage()
+    msg['Subject'] = subject
+    msg['From'] = f"Banco de Chile <{sender}>"
+    msg['Date'] = format_datetime(date)
+    if message_id:
+        msg['Message-ID'] = message_id
+    msg.set_content("texto plano")
+    msg.add_alternative(html, subtype='html')
+    return msg.as_bytes()
+
+
+def build_broken_email() -> bytes:
+    """Email cuya parte HTML declara base64 pero no lo es (no se puede decodificar)"""
+    broken = build_raw_email("Cargo en Cuenta", html="<p>Compra por $1.00</p>")
+    broken = broken.replace(b'Content-Type: text/html; charset="utf-8"\nContent-Transfer-Encoding: 7bit',
+                            b'Content-Type: text/html; charset="utf-8"\nContent-Transfer-Encoding: base64')
+    assert b'base64' in broken
+    return broken
+
+
+def build_cartola_email() -> bytes:
+    """Construye una cartola con logo inline y PDF adjunto"""
+    msg = MIMEMessage()
+    msg['Subject'] = "Cartola Cuenta Corriente"
+    msg['From'] = "Banco de Chile <enviodigital@bancochile.cl>"
+    msg['Date'] = format_datetime(datetime(2026, 1, 3, 4, 31))
+    msg.set_content("Adjunto tu cartola")
+    msg.add_alternative("<p>Adjunto tu cartola de Cuenta Corriente. Atención: revísala</p>", subtype='html')
+    msg.get_payload()[1].add_related(b'\x89PNG' * 500, maintype='image', subtype='png', cid='<logo>')
+    msg.add_attachment(b'%PDF' * 5000, maintype='application', subtype='pdf', filename='cartola.pdf')
+    return msg.as_bytes()
+
+
+class FakeIMAP:
+    """Doble de imaplib.IMAP4_SSL con un buzón en memoria"""
+
+    def __init__(self, messages, uidvalidity=1):
+        # messages: {uid: raw_email}
+        self.messages = dict(messages)
+        self.uidvalidity = uidvalidity
+        self.commands = []
+        self._untagged = {}
+
+    def select(self, mailbox):
+        self.commands.append(('SELECT', mailbox))
+        uidnext = max(self.messages, default=0) + 1
+        self._untagged = {'UIDVALIDITY': [str(self.uidvalidity).encode()],
+                          'UIDNEXT': [str(uidnext).encode()]}
+        return 'OK', [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return code, self._untagged.pop(code, [None])
+
+    def uid(self, command, *args):
+        self.commands.append((command,) + args)
+        if command == 'SEARCH':
+            criteria = args[1]
+            uids = sorted(self.messages)
+            match = re.search(r'UID (\d+):\*', criteria)
+            if match:
+                # Como en un servidor real, "n:*" incluye siempre el último UID
+                start = int(match.group(1))
+                uids = [u for u in uids if u >= start] or uids[-1:]
+            return 'OK', [b' '.join(str(u).encode() for u in uids)]
+        if command == 'FETCH':
+            data = []
+            headers_only = 'HEADER.FIELDS' in args[1]
+            section = re.search(r'BODY\.PEEK\[([\d.]+)\]', args[1])
+            for seq, uid in enumerate(self._expand(args[0]), start=1):
+                if uid in self.messages:
+                    raw = self.messages[uid]
+                    item = 'RFC822'
+                    if section:
+                        raw = body_section(raw, section.group(1))
+                        item = f'BODY[{section.group(1)}]'
+                    elif 'BODYSTRUCTURE' in args[1]:
+                        structure = bodystructure(email.message_from_bytes(raw))
+                        raw = raw.split(b'\n\n', 1)[0] + b'\n\n'
+                        item = f'BODYSTRUCTURE {structure} BODY[HEADER.FIELDS (SUBJECT FROM DATE)]'
+                    elif headers_only:
+                        raw = raw.split(b'\n\n', 1)[0] + b'\n\n'
+                        item = 'BODY[HEADER.FIELDS (SUBJECT FROM DATE)]'
+                    data += [(f'{seq} (UID {uid} {item} {{{len(raw)}}}'.encode(), raw), b')']
+            return 'OK', data
+        raise AssertionError(f"Comando no esperado: {command}")
+
+    def _expand(self, message_set):
+        uids = []
+        for part in message_set.split(','):
+            start, _, end = part.partition(':')
+            uids += range(int(start), int(end or start) + 1)
+        return uids
+
+    def fetch_count(self):
+        return sum(1 for c in self.commands if c[0] == 'FETCH')
+
+    def body_fetches(self):
+        return [c[1] for c in self.commands if c[0] == 'FETCH' and 'RFC822' in c[2]]
+
+    def fetch_queries(self):
+        return [c[2] for c in self.commands if c[0] == 'FETCH']
+
+
+@pytest.fixture
+def connector():
+    return EmailConnector("usuario@gmail.com", "secreto")
+
+
+class TestSearchEmails:
+    """Tests de búsqueda simple"""
+
+    def test_search_usa_uids(self, connector):
+        """Los emails retornados deben identificarse por UID, no por número de secuencia"""
+        connector.connection = FakeIMAP({41: build_raw_email("Cargo en Cuenta"),
+                                         57: build_raw_email("Giro con Tarjeta de Débito")})
+        emails = connector.search_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["41", "57"]
+        assert emails[0].subject == "Cargo en Cuenta"
+        assert "$1.000" in emails[0].body_html
+
+    def test_no_repite_select(self, connector):
+        """Si el buzón ya está seleccionado en la sesión no debe repetir SELECT"""
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta")})
+        connector.connection = imap
+
+        connector.search_emails("enviodigital@bancochile.cl")
+        connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [c for c in imap.commands if c[0] == 'SELECT'] == [('SELECT', 'INBOX')]
+
+    def test_subject_filter(self, connector):
+        """Debe filtrar por asunto"""
+        connector.connection = FakeIMAP({1: build_raw_email("Cargo en Cuenta"),
+                                         2: build_raw_email("Cartola Cuenta Corriente")})
+        emails = connector.search_emails("enviodigital@bancochile.cl", subject_filter="cargo")
+
+        assert [e.subject for e in emails] == ["Cargo en Cuenta"]
+
+
+class TestMultipleSenders:
+    """Tests de búsqueda con varios remitentes"""
+
+    def test_build_from_criteria(self):
+        """OR de IMAP es binario y prefijo"""
+        assert build_from_criteria("a@x.cl") == 'FROM "a@x.cl"'
+        assert build_from_criteria(["a@x.cl", "b@y.cl", "@z.cl"]) == 'OR FROM "a@x.cl" OR FROM "b@y.cl" FROM "@z.cl"'
+        with pytest.raises(ValueError):
+            build_from_criteria([])
+
+    def test_un_solo_search_con_or(self, connector):
+        """Varios remitentes deben buscarse en un solo UID SEARCH"""
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta")})
+        connector.connection = imap
+
+        connector.search_emails(["enviodigital@bancochile.cl", "avisos@bancoestado.cl"])
+
+        searches = [c for c in imap.commands if c[0] == 'SEARCH']
+        assert len(searches) == 1
+        assert searches[0][2].startswith('(OR FROM "enviodigital@bancochile.cl" FROM "avisos@bancoestado.cl" SINCE ')
+
+    def test_sync_state_por_grupo_de_remitentes(self, connector):
+        """El estado incremental se guarda por grupo, sin importar orden ni mayúsculas"""
+        imap = FakeIMAP({10: build_raw_email("Cargo en Cuenta")}, uidvalidity=7)
+        connector.connection = imap
+        connector.sync_emails(["b@y.cl", "A@x.cl"])
+
+        connector.sync_emails(["a@x.cl", "b@y.cl"])
+
+        assert connector.sync_states[('INBOX', 'a@x.cl,b@y.cl')] == SyncState(uidvalidity=7, last_uid=10)
+        assert 'UID 11:*' in imap.commands[-1][2]
+
+
+class TestBatchFetch:
+    """Tests de descarga en lotes"""
+
+    def test_build_message_set(self):
+        """Debe comprimir IDs consecutivos en rangos"""
+        assert build_message_set([b"9", b"1", b"5", b"10", b"11", b"12"]) == "1,5,9:12"
+        assert build_message_set([b"3"]) == "3"
+
+    def test_un_fetch_por_lote(self):
+        """Debe pedir varios mensajes en un solo FETCH respetando el tamaño de lote"""
+        connector = EmailConnector("usuario@gmail.com", "secreto", fetch_chunk_size=2)
+        imap = FakeIMAP({uid: build_raw_email(f"Cargo en Cuenta {uid}") for uid in (1, 2, 3, 7, 8)})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["1", "2", "3", "7", "8"]
+        assert emails[3].subject == "Cargo en Cuenta 7"
+        assert [c[1] for c in imap.commands if c[0] == 'FETCH'] == ["1:2", "3,7", "8"]
+
+
+class TestIterEmails:
+    """Tests del generador de emails"""
+
+    def test_genera_a_medida_que_descarga(self, connector):
+        """No debe descargar el siguiente lote hasta que se consuma el actual"""
+        imap = FakeIMAP({uid: build_raw_email(f"Cargo en Cuenta {uid}") for uid in range(1, 6)})
+        connector.connection = imap
+
+        emails = connector.iter_emails("enviodigital@bancochile.cl", max_in_flight=2)
+        first = next(emails)
+
+        assert first.uid == "1"
+        assert imap.body_fetches() == ["1:2"]
+        assert [e.uid for e in emails] == ["2", "3", "4", "5"]
+        assert imap.body_fetches() == ["1:2", "3:4", "5"]
+
+    def test_keep_raw_false_descarta_raw_email(self, connector):
+        """Con keep_raw=False no se conservan los bytes originales"""
+        connector.connection = FakeIMAP({1: build_raw_email("Cargo en Cuenta")})
+
+        [email_msg] = connector.iter_emails("enviodigital@bancochile.cl", keep_raw=False)
+
+        assert email_msg.raw_email == b""
+        assert email_msg.body_html
+
+    def test_sin_limite_trae_todo(self, connector):
+        """Por defecto iter_emails no limita la cantidad de emails"""
+        connector.connection = FakeIMAP({uid: build_raw_email("Cargo en Cuenta") for uid in range(1, 81)})
+
+        assert sum(1 for _ in connector.iter_emails("enviodigital@bancochile.cl")) == 80
+
+    def test_message_id(self, connector):
+        """Se lee el Message-ID de los headers; vacío si el email no lo trae"""
+        connector.connection = FakeIMAP({
+            1: build_raw_email("Cargo en Cuenta", message_id="<abc@bancochile.cl>"),
+            2: build_raw_email("Cargo en Cuenta"),
+        })
+
+        first, second = connector.iter_emails("enviodigital@bancochile.cl")
+
+        assert first.message_id == "<abc@bancochile.cl>"
+        assert second.message_id == ""
+
+
+class TestHeaderFirstFetch:
+    """Tests de descarga en dos fases (headers y luego cuerpos)"""
+
+    def test_parsers_descartan_cartolas_antes_de_bajar_el_cuerpo(self, connector):
+        """La cartola no debe descargarse completa"""
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta"),
+                         2: build_raw_email("Cartola Cuenta Corriente"),
+                         3: build_raw_email("Giro con Tarjeta de Débito")})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl", parsers=[BancoChileParser()])
+
+        assert [e.uid for e in emails] == ["1", "3"]
+        assert imap.body_fetches() == ["1,3"]
+        assert emails[0].body_html
+
+    def test_subject_filter_se_aplica_sobre_headers(self, connector):
+        """El filtro de asunto no debe requerir bajar los cuerpos descartados"""
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta"),
+                         2: build_raw_email("Abono en tu cuenta")})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl", subject_filter="abono")
+
+        assert [e.uid for e in emails] == ["2"]
+        assert imap.body_fetches() == ["2"]
+
+
+class TestPartialFetch:
+    """Tests de descarga parcial guiada por BODYSTRUCTURE"""
+
+    def test_descarga_solo_la_parte_html(self):
+        """Debe pedir solo BODY.PEEK[<parte html>] y decodificarla localmente"""
+        connector = EmailConnector("usuario@gmail.com", "secreto", partial_fetch=True)
+        html = "<p>Te informamos que se ha realizado una compra por $5.390 en CAFÉ ÑUÑOA</p>"
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta", html=html),
+                         2: build_raw_email("Giro con Tarjeta de Débito")})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl")
+
+        assert emails[0].body_html.strip() == html
+        assert emails[0].raw_email == b""
+        assert emails[1].subject == "Giro con Tarjeta de Débito"
+        assert not any('RFC822' in q for q in imap.fetch_queries())
+        assert '(UID BODY.PEEK[2])' in imap.fetch_queries()
+
+    def test_adjuntos_nunca_se_descargan(self):
+        """En un email con logo y PDF solo debe bajarse el HTML"""
+        connector = EmailConnector("usuario@gmail.com", "secreto", partial_fetch=True)
+        imap = FakeIMAP({5: build_cartola_email()})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl")
+
+        assert "Atención: revísala" in emails[0].body_html
+        assert '(UID BODY.PEEK[1.2.1])' in imap.fetch_queries()
+        assert len(imap.fetch_queries()) == 2
+
+    def test_parsers_filtran_en_la_misma_ronda(self):
+        """Los parsers deciden con los headers que llegan junto al BODYSTRUCTURE"""
+        connector = EmailConnector("usuario@gmail.com", "secreto", partial_fetch=True)
+        imap = FakeIMAP({1: build_raw_email("Cargo en Cuenta"), 2: build_cartola_email()})
+        connector.connection = imap
+
+        emails = connector.search_emails("enviodigital@bancochile.cl", parsers=[BancoChileParser()])
+
+        assert [e.uid for e in emails] == ["1"]
+        assert len(imap.fetch_queries()) == 2
+
+    def test_parte_mal_codificada_no_corta_el_lote(self):
+        """Un base64 mal formado descarta solo ese email, el resto del lote se entrega"""
+        connector = EmailConnector("usuario@gmail.com", "secreto", partial_fetch=True)
+        imap = FakeIMAP({1: build_broken_email(), 2: build_raw_email("Giro con Tarjeta de Débito")})
+        connector.connection = imap
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["2"]
+        # Fallaría igual en cada intento: cuenta como procesado
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 2
+
+
+class TestSyncEmails:
+    """Tests de sincronización incremental por UID"""
+
+    def test_primera_sincronizacion_es_completa(self, connector):
+        """Sin estado previo debe buscar por fecha y registrar el UID más alto"""
+        imap = FakeIMAP({10: build_raw_email("Cargo en Cuenta"),
+                         11: build_raw_email("Abono en tu cuenta")}, uidvalidity=7)
+        connector.connection = imap
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert len(emails) == 2
+        assert 'SINCE' in imap.commands[1][2]
+        state = connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')]
+        assert state == SyncState(uidvalidity=7, last_uid=11)
+
+    def test_sincronizacion_incremental_sin_novedades(self, connector):
+        """Si no hay UIDs nuevos no debe descargar nada"""
+        imap = FakeIMAP({10: build_raw_email("Cargo en Cuenta")}, uidvalidity=7)
+        connector.connection = imap
+        connector.sync_emails("enviodigital@bancochile.cl")
+        fetches = imap.fetch_count()
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert emails == []
+        assert imap.fetch_count() == fetches
+        assert 'UID 11:*' in imap.commands[-1][2]
+
+    def test_sincronizacion_incremental_trae_solo_nuevos(self, connector):
+        """Solo debe descargar los UIDs mayores al último visto"""
+        imap = FakeIMAP({10: build_raw_email("Cargo en Cuenta")}, uidvalidity=7)
+        connector.connection = imap
+        connector.sync_emails("enviodigital@bancochile.cl")
+
+        imap.messages[12] = build_raw_email("Giro con Tarjeta de Débito")
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["12"]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 12
+
+    def test_cambio_de_uidvalidity_fuerza_resincronizacion(self, connector):
+        """Si cambia el UIDVALIDITY debe volver a buscar por fecha"""
+        connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')] = SyncState(uidvalidity=1, last_uid=500)
+        imap = FakeIMAP({3: build_raw_email("Cargo en Cuenta")}, uidvalidity=2)
+        connector.connection = imap
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["3"]
+        assert 'SINCE' in imap.commands[1][2]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')] == SyncState(uidvalidity=2, last_uid=3)
+
+    def test_corte_de_conexion_no_avanza_el_estado(self, connector):
+        """Si el FETCH se corta, el error se propaga y los emails se piden en la próxima sincronización"""
+        imap = FlakyIMAP({4: build_raw_email("Cargo en Cuenta"),
+                          5: build_raw_email("Abono en tu cuenta"),
+                          6: build_raw_email("Giro con Tarjeta de Débito")}, uidvalidity=7)
+        imap.aborts = 1
+        connector.connection = imap
+
+        with pytest.raises(imaplib.IMAP4.abort):
+            connector.sync_emails("enviodigital@bancochile.cl")
+        assert ('INBOX', 'enviodigital@bancochile.cl') not in connector.sync_states
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["4", "5", "6"]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 6
+
+    def test_email_indecodificable_no_frena_la_sincronizacion(self):
+        """Un email que no se puede decodificar no vuelve a traer a los siguientes en cada sync"""
+        with IMAPServer(users={"usuario@gmail.com": "secreto"}) as server:
+            for raw in (build_raw_email("Cargo en Cuenta"), build_broken_email(),
+                        build_raw_email("Giro con Tarjeta de Débito")):
+                server.deliver(raw)
+            with server.connector("usuario@gmail.com", "secreto", partial_fetch=True) as connector:
+                syncs = [[e.uid for e in connector.sync_emails("enviodigital@bancochile.cl",
+                                                               since_date=datetime(2000, 1, 1))]
+                         for _ in range(3)]
+                state = connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')]
+
+        assert syncs == [["1", "3"], [], []]
+        assert state.last_uid == 3
+
+    def test_email_no_retornado_se_vuelve_a_pedir(self, connector):
+        """El estado avanza solo hasta el UID anterior al primer email que no llegó"""
+        imap = FlakyIMAP({10: build_raw_email("Cargo en Cuenta"),
+                          11: build_raw_email("Abono en tu cuenta"),
+                          12: build_raw_email("Giro con Tarjeta de Débito")}, uidvalidity=7)
+        imap.missing = {11}
+        connector.connection = imap
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["10", "12"]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 10
+
+        imap.missing = set()
+        emails = connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert [e.uid for e in emails] == ["11", "12"]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 12
+
+    def test_descartados_por_headers_cuentan_como_procesados(self, connector):
+        """Una cartola descartada por los parsers no debe frenar el avance del estado"""
+        imap = FakeIMAP({10: build_raw_email("Cargo en Cuenta"),
+                         11: build_cartola_email()}, uidvalidity=7)
+        connector.connection = imap
+
+        emails = connector.sync_emails("enviodigital@bancochile.cl", parsers=[BancoChileParser()])
+
+        assert [e.uid for e in emails] == ["10"]
+        assert connector.sync_states[('INBOX', 'enviodigital@bancochile.cl')].last_uid == 11
+
+    def test_search_fallido_no_guarda_estado(self, connector):
+        """Un SEARCH rechazado no debe confundirse con que no hay emails nuevos"""
+        imap = FlakyIMAP({10: build_raw_email("Cargo en Cuenta")}, uidvalidity=7)
+        imap.search_status = 'NO'
+        connector.connection = imap
+
+        with pytest.raises(imaplib.IMAP4.error):
+            connector.sync_emails("enviodigital@bancochile.cl")
+
+        assert connector.sync_states == {}
+
+
+class FlakyIMAP(FakeIMAP):
+    """FakeIMAP que puede cortar la conexión, omitir emails o rechazar el SEARCH"""
+
+    aborts = 0
+    missing = frozenset()
+    search_status = 'OK'
+
+    def uid(self, command, *args):
+        if command == 'SEARCH' and self.search_status != 'OK':
+            self.commands.append((command,) + args)
+            return self.search_status, [b'SEARCH rechazado']
+        if command == 'FETCH' and 'RFC822' in args[1]:
+            if self.aborts:
+                self.aborts -= 1
+                raise imaplib.IMAP4.abort("socket error: EOF")
+            wanted = [u for u in self._expand(args[0]) if u not in self.missing]
+            if not wanted:
+                return 'OK', []
+            args = (build_message_set([str(u).encode() for u in wanted]),) + args[1:]
+        return super().uid(command, *args)
+
+
+class FakeIdleIMAP(FakeIMAP):
+    """FakeIMAP que además simula IDLE y NOOP
+
+    arrivals: un dict {uid: raw_email} (o None) por cada IDLE/NOOP; esos
+    mensajes "llegan" mientras el cliente espera.
+    fetch_arrivals: igual, pero por cada UID FETCH; el EXISTS viaja con la
+    respuesta del FETCH, como en un servidor real.
+    """
+
+    def __init__(self, messages, arrivals, idle=True, fetch_arrivals=()):
+        super().__init__(messages)
+        self.capabilities = ('IMAP4REV1', 'IDLE') if idle else ('IMAP4REV1',)
+        self.arrivals = list(arrivals)
+        self.fetch_arrivals = list(fetch_arrivals)
+        self.tagged_commands = {}
+        self.lines = []
+        self.idle_response = b'+ idling\r\n'
+        self._tag = 0
+
+    def _new_tag(self):
+        self._tag += 1
+        tag = f'A{self._tag}'.encode()
+        self.tagged_commands[tag] = None
+        return tag
+
+    def _arrive(self):
+        arrived = self.arrivals.pop(0) if self.arrivals else None
+        if arrived:
+            self.messages.update(arrived)
+        return arrived
+
+    def send(self, data):
+        command = data.split()[-1].decode()
+        self.commands.append((command,))
+        if command == 'IDLE':
+            self._idle_tag = data.split()[0]
+            self.lines.append(self.idle_response)
+            if self._arrive():
+                self.lines.append(f'* {len(self.messages)} EXISTS\r\n'.encode())
+        elif command == 'DONE':
+            self.lines.append(self._idle_tag + b' OK IDLE terminated\r\n')
+
+    def readline(self):
+        return self.lines.pop(0)
+
+    def login(self, user, password):
+        self.commands.append(('LOGIN',))
+        return 'OK', [b'']
+
+    def noop(self):
+        self.commands.append(('NOOP',))
+        if self._arrive():
+            self._untagged['EXISTS'] = [str(len(self.messages)).encode()]
+        return 'OK', [b'']
+
+    def uid(self, command, *args):
+        result = super().uid(command, *args)
+        arrived = self.fetch_arrivals.pop(0) if command == 'FETCH' and self.fetch_arrivals else None
+        if arrived:
+            self.messages.update(arrived)
+            self._untagged['EXISTS'] = [str(len(self.messages)).encode()]
+        return result
+
+
+class WatchConnector(EmailConnector):
+    """Conector que lee del FakeIdleIMAP sin esperar en un socket
+
+    reconnects: lo que entrega cada reconexión, en orden (una conexión o
+    una excepción que simula el servidor caído).
+    """
+
+    reconnects = ()
+
+    def _open_connection(self):
+        result = self.reconnects.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _readable(self, timeout):
+        return bool(self.connection.lines)
+
+
+class TestWatch:
+    """Tests del modo watch (IDLE / NOOP)"""
+
+    def watch(self, imap, reconnects=(), until=1, **kwargs):
+        """Corre el watch hasta recibir `until` emails (o a lo más 5 segundos)"""
+        connector = WatchConnector("usuario@gmail.com", "secreto")
+        connector.connection = imap
+        connector.reconnects = list(reconnects)
+        stop = threading.Event()
+        received = []
+
+        def handler(message):
+            received.append(message)
+            if len(received) >= until:
+                stop.set()
+
+        timer = threading.Timer(5, stop.set)
+        timer.start()
+        try:
+            connector.watch("enviodigital@bancochile.cl", handler, stop_event=stop,
+                            catch_up=False, idle_timeout=0.01, **kwargs)
+        finally:
+            timer.cancel()
+        return received
+
+    def test_idle_entrega_emails_nuevos(self):
+        """Al recibir EXISTS durante IDLE debe sincronizar y entregar solo el email nuevo"""
+        imap = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta")},
+                            arrivals=[{11: build_raw_email("Giro con Tarjeta de Débito")}])
+
+        received = self.watch(imap)
+
+        assert [(m.uid, m.subject) for m in received] == [("11", "Giro con Tarjeta de Débito")]
+        assert ('IDLE',) in imap.commands and ('DONE',) in imap.commands
+        assert imap.tagged_commands == {}
+
+    def test_idle_se_renueva_al_vencer(self):
+        """Si el IDLE vence sin novedades debe terminarlo y volver a entrar, sin sincronizar"""
+        imap = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta")},
+                            arrivals=[None, None, {11: build_raw_email("Cargo en Cuenta")}])
+
+        received = self.watch(imap)
+
+        assert [m.uid for m in received] == ["11"]
+        assert imap.commands.count(('IDLE',)) == 3
+        assert imap.fetch_count() == 1
+
+    def test_email_que_llega_durante_la_sincronizacion(self):
+        """Un EXISTS recibido con el FETCH no se descarta: se vuelve a sincronizar sin esperar otro IDLE"""
+        imap = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta")},
+                            arrivals=[{11: build_raw_email("Cargo en Cuenta")}],
+                            fetch_arrivals=[{12: build_raw_email("Giro con Tarjeta de Débito")}])
+
+        received = self.watch(imap, until=2)
+
+        assert [m.uid for m in received] == ["11", "12"]
+        assert imap.commands.count(('IDLE',)) == 1
+
+    def test_sin_idle_usa_noop(self):
+        """Si el servidor no soporta IDLE debe hacer polling con NOOP"""
+        imap = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta")},
+                            arrivals=[None, {11: build_raw_email("Cargo en Cuenta")}], idle=False)
+
+        received = self.watch(imap, poll_interval=0)
+
+        assert [m.uid for m in received] == ["11"]
+        assert imap.commands.count(('NOOP',)) == 2
+        assert ('IDLE',) not in imap.commands
+
+    def test_readable_con_datos_en_el_buffer(self):
+        """Si imaplib ya leyó el EXISTS junto al "+ idling", select() no avisa pero hay datos"""
+        client, server = socket.socketpair()
+
+        class Connection:
+            file = client.makefile('rb')
+
+            def socket(self):
+                return client
+
+        connector = EmailConnector("usuario@gmail.com", "secreto")
+        connector.connection = Connection()
+        try:
+            assert not connector._readable(0)
+            server.sendall(b'+ idling\r\n* 11 EXISTS\r\n')
+            assert connector.connection.file.readline() == b'+ idling\r\n'
+            assert connector._readable(0)
+            assert connector.connection.file.readline() == b'* 11 EXISTS\r\n'
+            assert not connector._readable(0)
+        finally:
+            client.close()
+            server.close()
+
+    def test_reconexion_fallida_no_usa_la_conexion(self):
+        """Si reconectar falla debe reintentar sin tocar la conexión (antes: AttributeError en noop)"""
+        imap = DroppingIMAP({10: build_raw_email("Cargo en Cuenta")}, arrivals=[], idle=False)
+        recovered = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta"),
+                                  11: build_raw_email("Giro con Tarjeta de Débito")}, arrivals=[])
+
+        received = self.watch(imap, reconnects=[ConnectionRefusedError("servidor caído"), recovered],
+                              poll_interval=0)
+
+        assert [m.uid for m in received] == ["11"]
+        assert ('LOGIN',) in recovered.commands
+
+    def test_login_rechazado_al_reconectar(self):
+        """Un LOGIN rechazado no debe dejar una conexión sin autenticar en uso"""
+        imap = DroppingIMAP({10: build_raw_email("Cargo en Cuenta")}, arrivals=[])
+        rejected = RejectingIMAP({}, arrivals=[])
+        recovered = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta"),
+                                  11: build_raw_email("Giro con Tarjeta de Débito")}, arrivals=[])
+
+        received = self.watch(imap, reconnects=[rejected, recovered], poll_interval=0)
+
+        assert [m.uid for m in received] == ["11"]
+        assert rejected.commands == [('LOGIN',), ('SHUTDOWN',)]
+
+    def test_idle_rechazado_reconecta(self):
+        """Un error IMAP (ej: IDLE rechazado) no debe terminar el watch"""
+        imap = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta")}, arrivals=[])
+        imap.idle_response = b'A1 BAD IDLE no disponible\r\n'
+        recovered = FakeIdleIMAP({10: build_raw_email("Cargo en Cuenta"),
+                                  11: build_raw_email("Giro con Tarjeta de Débito")}, arrivals=[])
+
+        received = self.watch(imap, reconnects=[recovered], poll_interval=0)
+
+        assert [m.uid for m in received] == ["11"]
+
+
+class DroppingIMAP(FakeIdleIMAP):
+    """Conexión que se corta en el primer IDLE o en el segundo NOOP"""
+
+    noops = 0
+
+    def send(self, data):
+        raise OSError("conexión perdida")
+
+    def noop(self):
+        self.noops += 1
+        if self.noops > 1:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        return super().noop()
+
+
+class RejectingIMAP(FakeIdleIMAP):
+    """Servidor que rechaza el LOGIN"""
+
+    def login(self, user, password):
+        self.commands.append(('LOGIN',))
+        raise imaplib.IMAP4.error("[AUTHENTICATIONFAILED] Invalid credentials")
+
+    def shutdown(self):
+        self.commands.append(('SHUTDOWN',))
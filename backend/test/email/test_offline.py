@@ -0,0 +1,122 @@
+import mailbox
+import pytest
+from datetime import datetime
+from email.message import EmailMessage as MIMEMessage
+from email.utils import format_datetime
+
+import app.email.offline as offline
+from app.email.offline import OfflineSource, detect_format, mbox_offsets
+from app.parsers.banco_chile import BancoChileParser
+
+
+def build_message(subject: str, sender: str = "enviodigital@bancochile.cl",
+                  html: str = "<p>Compra por $1.000</p>", day: int = 5) -> MIMEMessage:
+    msg = MIMEMessage()
+    msg['Subject'] = subject
+    msg['From'] = f"Remitente <{sender}>"
+    msg['Date'] = format_datetime(datetime(2026, 1, day, 10, 0))
+    msg.set_content("texto plano\nFrom la oficina")
+    msg.add_alternative(html, subtype='html')
+    return msg
+
+
+MESSAGES = [
+    ("Cargo en Cuenta", "enviodigital@bancochile.cl"),
+    ("Newsletter de ofertas", "ofertas@tienda.cl"),
+    ("Giro con Tarjeta de Débito", "enviodigital@bancochile.cl"),
+    ("Cartola Cuenta Corriente", "enviodigital@bancochile.cl"),
+]
+
+
+@pytest.fixture
+def messages():
+    return [build_message(subject, sender, day=i + 1) for i, (subject, sender) in enumerate(MESSAGES)]
+
+
+@pytest.fixture
+def mbox_path(tmp_path, messages):
+    path = tmp_path / "takeout.mbox"
+    box = mailbox.mbox(str(path))
+    for message in messages:
+        box.add(message)
+    box.close()
+    return str(path)
+
+
+@pytest.fixture
+def maildir_path(tmp_path, messages):
+    path = tmp_path / "Maildir"
+    box = mailbox.Maildir(str(path))
+    for message in messages:
+        box.add(message)
+    box.close()
+    return str(path)
+
+
+@pytest.fixture
+def eml_path(tmp_path, messages):
+    path = tmp_path / "emls"
+    (path / "2026").mkdir(parents=True)
+    for i, message in enumerate(messages):
+        (path / "2026" / f"{i}.eml").write_bytes(message.as_bytes())
+    (path / "notas.txt").write_text("no es un email")
+    return str(path)
+
+
+class TestOfflineSource:
+    """Tests para la lectura de emails desde mbox, Maildir y .eml"""
+
+    @pytest.mark.parametrize("fixture", ["mbox_path", "maildir_path", "eml_path"])
+    def test_formatos(self, request, fixture):
+        source = OfflineSource(request.getfixturevalue(fixture))
+        emails = sorted(source.iter_emails(), key=lambda e: e.date)
+
+        assert [e.subject for e in emails] == [subject for subject, _ in MESSAGES]
+        assert emails[0].body_html == "<p>Compra por $1.000</p>\n"
+        assert emails[0].body_text.startswith("texto plano")
+        assert emails[0].raw_email == b""
+
+    def test_detecta_formato(self, mbox_path, maildir_path, eml_path):
+        assert detect_format(mbox_path) == "mbox"
+        assert detect_format(maildir_path) == "maildir"
+        assert detect_format(eml_path) == "eml"
+        assert detect_format("correo.EML") == "eml"
+
+    def test_mbox_igual_que_mailbox(self, mbox_path):
+        """Los límites de mensajes coinciden con los del módulo mailbox"""
+        with open(mbox_path, 'rb') as f:
+            data = f.read()
+        ours = [data[start:end] for start, end in mbox_offsets(data)]
+        theirs = [message.as_bytes() for message in mailbox.mbox(mbox_path)]
+        assert len(ours) == len(theirs) == 4
+        # "From " dentro del cuerpo viene escapado como ">From " y no corta el mensaje
+        assert all(b"\n>From la oficina" in raw for raw in ours)
+
+    def test_filtra_antes_de_decodificar(self, mbox_path, monkeypatch):
+        """Los emails descartados por headers no se decodifican"""
+        decoded = []
+        original = offline.parse_email
+        monkeypatch.setattr(offline, "parse_email", lambda *args: decoded.append(args[0]) or original(*args))
+        source = OfflineSource(mbox_path)
+
+        emails = list(source.iter_emails(sender="@BancoChile.cl", parsers=[BancoChileParser()]))
+        assert [e.subject for e in emails] == ["Cargo en Cuenta", "Giro con Tarjeta de Débito"]
+        assert len(decoded) == 2
+
+        emails = list(source.iter_emails(sender=["ofertas@tienda.cl", "otro@x.cl"], keep_raw=True))
+        assert [e.subject for e in emails] == ["Newsletter de ofertas"]
+        assert emails[0].raw_email.startswith(b"Subject: Newsletter")
+
+    def test_filtro_asunto(self, eml_path):
+        source = OfflineSource(eml_path)
+        subjects = [e.subject for e in source.iter_emails(subject_filter="cargo")]
+        assert subjects == ["Cargo en Cuenta"]
+
+    def test_mbox_vacio(self, tmp_path):
+        path = tmp_path / "vacio.mbox"
+        path.write_bytes(b"")
+        assert list(OfflineSource(str(path)).iter_emails()) == []
+
+    def test_formato_invalido(self, tmp_path):
+        with pytest.raises(ValueError):
+            OfflineSource(str(tmp_path), format="pst")
@@ -0,0 +1,160 @@
+import imaplib
+import threading
+import pytest
+
+from app.email.connection import EmailConnector
+from app.email.pool import ConnectionPool
+
+
+class FakeSession:
+    """Sesión IMAP falsa que solo responde NOOP"""
+
+    def __init__(self):
+        self.alive = True
+
+    def noop(self):
+        if not self.alive:
+            raise imaplib.IMAP4.abort("socket cerrado")
+        return 'OK', [b'']
+
+    def select(self, mailbox):
+        if not self.alive:
+            raise imaplib.IMAP4.abort("socket cerrado")
+        return 'OK', [b'0']
+
+    def close(self):
+        pass
+
+    def logout(self):
+        pass
+
+
+class CountingConnector(EmailConnector):
+    """Conector que cuenta los logins en vez de conectarse de verdad"""
+    logins = []
+
+    def connect(self):
+        CountingConnector.logins.append(self.email_address)
+        self.connection = FakeSession()
+
+
+@pytest.fixture
+def pool():
+    CountingConnector.logins = []
+    return ConnectionPool(max_sessions_per_provider=2, acquire_timeout=0.05, connector_factory=CountingConnector)
+
+
+class TestConnectionPool:
+    """Tests del pool de sesiones IMAP"""
+
+    def test_reutiliza_la_sesion(self, pool):
+        """Dos ciclos de la misma cuenta deben hacer un solo LOGIN"""
+        with pool.session("a@gmail.com", "x") as first:
+            pass
+        with pool.session("a@gmail.com", "x") as second:
+            pass
+
+        assert first is second
+        assert CountingConnector.logins == ["a@gmail.com"]
+
+    def test_reconecta_si_noop_falla(self, pool):
+        """Una sesión muerta debe reconectarse de forma transparente"""
+        with pool.session("a@gmail.com", "x") as connector:
+            connector.connection.alive = False
+        with pool.session("a@gmail.com", "x") as connector:
+            assert connector.noop()
+
+        assert CountingConnector.logins == ["a@gmail.com", "a@gmail.com"]
+
+    def test_error_de_conexion_descarta_la_sesion(self, pool):
+        """Si la conexión se cae durante el uso, la sesión no vuelve al pool"""
+        with pytest.raises(imaplib.IMAP4.abort):
+            with pool.session("a@gmail.com", "x"):
+                raise imaplib.IMAP4.abort("caída")
+
+        assert pool.stats() == {'gmail': 0}
+
+    def test_limite_por_proveedor(self, pool):
+        """No debe abrir más sesiones que el límite del proveedor"""
+        with pool.session("a@gmail.com", "x"), pool.session("b@gmail.com", "x"):
+            with pytest.raises(TimeoutError):
+                with pool.session("c@gmail.com", "x"):
+                    pass
+            # Otro proveedor tiene su propio límite
+            with pool.session("d@outlook.com", "x", provider="outlook"):
+                pass
+
+        assert pool.stats() == {'gmail': 2, 'outlook': 1}
+
+    def test_limite_libera_sesion_ociosa_de_otra_cuenta(self, pool):
+        """Al llegar al límite se cierra una sesión ociosa para dar paso a otra cuenta"""
+        with pool.session("a@gmail.com", "x"):
+            pass
+        with pool.session("b@gmail.com", "x"):
+            pass
+        with pool.session("c@gmail.com", "x"):
+            pass
+
+        assert pool.stats() == {'gmail': 2}
+
+    def test_espera_a_que_se_libere_una_sesion(self):
+        """Un llamador bloqueado por el límite debe recibir la sesión liberada"""
+        pool = ConnectionPool(max_sessions_per_provider=1, acquire_timeout=2, connector_factory=CountingConnector)
+        results = []
+
+        def worker():
+            with pool.session("a@gmail.com", "x") as connector:
+                results.append(connector)
+
+        with pool.session("a@gmail.com", "x") as held:
+            thread = threading.Thread(target=worker)
+            thread.start()
+        thread.join(timeout=2)
+
+        assert results == [held]
+
+    def test_run_reintenta_con_sesion_nueva(self, pool):
+        """run debe reintentar una vez si la conexión se cae"""
+        calls = []
+
+        def sync(connector):
+            calls.append(connector)
+            if len(calls) == 1:
+                raise imaplib.IMAP4.abort("caída")
+            return "ok"
+
+        assert pool.run("a@gmail.com", "x", sync) == "ok"
+        assert calls[0] is not calls[1]
+
+    def test_otra_contrasena_no_reutiliza_la_sesion(self, pool):
+        """Una sesión autenticada no se entrega a quien pide la cuenta con otra contraseña"""
+        with pool.session("a@gmail.com", "x") as first:
+            pass
+        with pool.session("A@gmail.com", "otra") as second:
+            pass
+
+        assert first is not second
+        assert second.password == "otra"
+        assert CountingConnector.logins == ["a@gmail.com", "A@gmail.com"]
+
+    def test_otras_opciones_no_reutilizan_la_sesion(self, pool):
+        """Las opciones del conector deben respetarse al reutilizar"""
+        with pool.session("a@gmail.com", "x", fetch_chunk_size=10) as first:
+            pass
+        with pool.session("a@gmail.com", "x", fetch_chunk_size=20) as second:
+            pass
+        with pool.session("a@gmail.com", "x", fetch_chunk_size=20) as third:
+            pass
+
+        assert first is not second and second is third
+        assert second.fetch_chunk_size == 20
+        assert pool.stats() == {'gmail': 1}
+
+    def test_error_de_conexion_del_conector_descarta_la_sesion(self, pool):
+        """search_emails propaga los errores de conexión para que el pool descarte la sesión"""
+        with pytest.raises(imaplib.IMAP4.abort):
+            with pool.session("a@gmail.com", "x") as connector:
+                connector.connection.alive = False
+                connector.search_emails("enviodigital@bancochile.cl")
+
+        assert pool.stats() == {'gmail': 0}
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.orm import Session
+from app.models.base import create_tables
+from app.models.transaction import TransactionRecord, message_hash, upsert_transactions
+
+
+class TestTransactionStore:
+    """Tests para la persistencia de transacciones (SQLite)"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine("sqlite://")
+        create_tables(engine)
+        return engine
+
+    @pytest.fixture
+    def session(self, engine):
+        with Session(engine) as session:
+            yield session
+
+    def count(self, session):
+        return session.scalar(select(func.count()).select_from(TransactionRecord))
+
+    def test_indices(self, engine):
+        indexes = {index['name']: index for index in inspect(engine).get_indexes('transactions')}
+        assert indexes['ix_transactions_dedup']['unique']
+        assert indexes['ix_transactions_dedup']['column_names'] == ['account', 'message_id']
+        assert indexes['ix_transactions_user_date']['column_names'] == ['user_id', 'date']
+        assert indexes['ix_transactions_user_category']['column_names'] == ['user_id', 'category']
+
+    def test_upsert_no_duplica(self, session, make_transaction):
+        """Volver a guardar el mismo email actualiza en vez de duplicar"""
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<1@banco>"),
+                      make_transaction(email_id="2", message_id="<2@banco>")],
+            user_id="u1", account="Yo@Gmail.com", uidvalidity=7
+        )
+        upsert_transactions(
+            session, [make_transaction(email_id="2", message_id="<2@banco>", amount=9990),
+                      make_transaction(email_id="3", message_id="<3@banco>")],
+            user_id="u1", account="yo@gmail.com", uidvalidity=7
+        )
+        session.commit()
+
+        assert self.count(session) == 3
+        record = session.scalars(select(TransactionRecord).where(TransactionRecord.email_id == "2")).one()
+        assert record.amount == 9990
+        assert record.account == "yo@gmail.com"
+        expected = make_transaction(email_id="2", message_id="<2@banco>", amount=9990)
+        assert record.to_transaction().to_dict() == expected.to_dict()
+
+    def test_mismo_uid_en_otro_buzon(self, session, make_transaction):
+        """El mismo UID en otro buzón es otro email"""
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<1@banco>")],
+            user_id="u1", account="yo@gmail.com", mailbox="INBOX", uidvalidity=7
+        )
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<2@banco>")],
+            user_id="u1", account="yo@gmail.com", mailbox="Bancos", uidvalidity=7
+        )
+        assert self.count(session) == 2
+
+    def test_cambio_de_uidvalidity_no_duplica(self, session, make_transaction):
+        """Tras un cambio de UIDVALIDITY el re-sync trae el mismo email con otro UID: se actualiza la fila"""
+        upsert_transactions(
+            session, [make_transaction(email_id="10", message_id="<1@banco>", amount=10000)],
+            user_id="u1", account="a@b.cl", uidvalidity=1
+        )
+        upsert_transactions(
+            session, [make_transaction(email_id="3", message_id="<1@banco>", amount=10000)],
+            user_id="u1", account="a@b.cl", uidvalidity=2
+        )
+        session.commit()
+
+        assert self.count(session) == 1
+        assert session.scalar(select(func.sum(TransactionRecord.amount))) == 10000
+        record = session.scalars(select(TransactionRecord)).one()
+        assert (record.uidvalidity, record.email_id) == (2, "3")
+
+    def test_cambio_de_uidvalidity_sin_message_id(self, session, make_transaction):
+        """Sin Message-ID la identidad es el contenido, que tampoco depende del UID"""
+        upsert_transactions(session, [make_transaction(email_id="10")], user_id="u1", account="a@b.cl", uidvalidity=1)
+        upsert_transactions(session, [make_transaction(email_id="3")], user_id="u1", account="a@b.cl", uidvalidity=2)
+        assert self.count(session) == 1
+
+    def test_uid_reasignado_no_pisa_filas(self, session, make_transaction):
+        """Tras un cambio de UIDVALIDITY el mismo UID puede ser otro email: no reemplaza al anterior"""
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<1@banco>", merchant="LIDER")],
+            user_id="u1", account="a@b.cl", uidvalidity=7
+        )
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<2@banco>", merchant="JUMBO")],
+            user_id="u1", account="a@b.cl", uidvalidity=8
+        )
+        session.commit()
+
+        assert self.count(session) == 2
+        assert set(session.scalars(select(TransactionRecord.merchant))) == {"LIDER", "JUMBO"}
+
+    def test_uid_sin_uidvalidity(self, session, make_transaction):
+        with pytest.raises(ValueError):
+            upsert_transactions(session, [make_transaction(email_id="1")], user_id="u1", account="a@b.cl")
+
+    def test_conserva_categoria(self, session, make_transaction):
+        """Un re-sync sin categoría no borra la que asignó el usuario"""
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<1@banco>", category="supermercado")],
+            user_id="u1", account="a@b.cl", uidvalidity=7
+        )
+        upsert_transactions(
+            session, [make_transaction(email_id="1", message_id="<1@banco>")],
+            user_id="u1", account="a@b.cl", uidvalidity=7
+        )
+        assert session.scalar(select(TransactionRecord.category)) == "supermercado"
+
+    def test_sin_message_id(self, session, make_transaction):
+        """Sin Message-ID ni UID se usa el hash del contenido"""
+        transaction = make_transaction(email_id=None)
+        upsert_transactions(session, [transaction, make_transaction(email_id=None)], user_id="u1", account="a@b.cl")
+        assert self.count(session) == 1
+        assert session.scalar(select(TransactionRecord.message_id)) == message_hash(transaction)
+
+    def test_lotes(self, session, make_transaction):
+        """Los lotes grandes se dividen en varias sentencias"""
+        sent = upsert_transactions(
+            session, [make_transaction(email_id=str(i), message_id=f"<{i}@banco>", amount=i + 1) for i in range(25)],
+            user_id="u1", account="a@b.cl", uidvalidity=7, batch_size=10
+        )
+        assert sent == 25
+        assert self.count(session) == 25
+        assert session.scalar(select(func.sum(TransactionRecord.amount))) == sum(range(1, 26))
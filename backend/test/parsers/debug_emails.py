@@ -5,19 +5,16 @@ import os
 import re
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 
 from app.email.connection import EmailConnector
+from app.parsers.text import extract_text
 
 def extract_text_from_html(html):
     """Extrae texto legible del HTML"""
     if not html:
         return "(vacío)"
-    soup = BeautifulSoup(html, 'html.parser')
-    # Eliminar scripts y estilos
-    for tag in soup(['script', 'style', 'head']):
-        tag.decompose()
-    text = soup.get_text(separator='\n', strip=True)
+    # Sin scripts, estilos ni head
+    text = extract_text(html, separator='\n')
     # Limpiar líneas vacías múltiples
     text = re.sub(r'\n{3,}', '\n\n', text)
     return text
@@ -3,6 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 from app.parsers.banco_chile import BancoChileParser
 from app.parsers.base import TransactionType
+from app.parsers.text import BACKENDS, extract_text
 from app.email.connection import EmailMessage
 
 
@@ -146,6 +147,15 @@ class TestBancoChileParser:
         """No debe parsear emails de otros bancos"""
         assert parser.can_parse(email_otro_banco) is False
 
+    def test_should_fetch_transaccion(self, parser, email_cargo_cuenta):
+        """Debe pedir el cuerpo de emails transaccionales"""
+        assert parser.should_fetch(email_cargo_cuenta) is True
+
+    def test_should_fetch_ignora_cartola(self, parser, email_cartola, email_otro_banco):
+        """No debe pedir el cuerpo de cartolas ni de otros bancos"""
+        assert parser.should_fetch(email_cartola) is False
+        assert parser.should_fetch(email_otro_banco) is False
+
     # =========================================================================
     # Tests de parsing - Cargo en Cuenta (Compra)
     # =========================================================================
@@ -187,6 +197,16 @@ class TestBancoChileParser:
         assert transaction.bank == "banco_chile"
         assert transaction.date == datetime(2025, 12, 13, 14, 18)
 
+    @pytest.mark.parametrize("backend", sorted(BACKENDS))
+    @pytest.mark.parametrize("fixture", [
+        "email_cargo_cuenta", "email_giro_cajero", "email_cartola",
+        "email_otro_banco", "email_mal_formateado", "email_compra_online",
+    ])
+    def test_backends_de_texto_equivalentes(self, request, fixture, backend):
+        """Cada backend de extracción debe dar el mismo texto que bs4"""
+        html = request.getfixturevalue(fixture).body_html
+        assert extract_text(html, backend=backend) == extract_text(html, backend='bs4')
+
     # =========================================================================
     # Tests de emails ignorados
     # =========================================================================
@@ -278,3 +298,67 @@ class TestBancoChileParser:
 
         assert transaction is not None
         assert transaction.amount == Decimal("108885")
+
+    # =========================================================================
+    # Tests de extracción en una sola pasada
+    # =========================================================================
+
+    def test_parse_transferencia_destinatario_alternativo(self, parser):
+        """Sin "a X por" debe usar el patrón "Destinatario: X" """
+        email = EmailMessage(
+            uid="333",
+            subject="Transferencia realizada",
+            sender="enviodigital@bancochile.cl",
+            date=datetime(2026, 1, 10, 12, 0),
+            body_html="""
+            <html><body>
+            <p>Monto: $25.000 desde Cuenta ****1234 el 10/01/2026 11:58.</p>
+            <p>Destinatario: MARIA PEREZ</p>
+            </body></html>
+            """,
+            body_text="",
+            raw_email=b""
+        )
+        transaction = parser.parse(email)
+
+        assert transaction.type == TransactionType.TRANSFERENCIA
+        assert transaction.amount == Decimal("25000")
+        assert transaction.merchant == "MARIA PEREZ"
+        assert transaction.date == datetime(2026, 1, 10, 11, 58)
+
+    def test_parse_abono(self, parser):
+        """Debe extraer el origen del abono"""
+        email = EmailMessage(
+            uid="444",
+            subject="Abono en tu cuenta",
+            sender="enviodigital@bancochile.cl",
+            date=datetime(2026, 1, 11, 9, 0),
+            body_html="<p>Recibiste un abono DE EMPRESA SPA por $150.000 en Cuenta ****1234 el 11/01/2026 08:59.</p>",
+            body_text="",
+            raw_email=b""
+        )
+        transaction = parser.parse(email)
+
+        assert transaction.type == TransactionType.ABONO
+        assert transaction.merchant == "EMPRESA SPA"
+        assert transaction.amount == Decimal("150000")
+        assert transaction.last_digits == "1234"
+
+    def test_campos_solapados(self, parser):
+        """El comercio ("en X el DD/MM") no debe ocultar la fecha que contiene"""
+        fields = parser._scan_fields(
+            "compra por $1.000 con cargo a Cuenta ****1234 en LIDER el 05/01/2026 10:00.",
+            TransactionType.COMPRA
+        )
+        values = parser._field_values(fields)
+
+        assert parser._parse_counterparty(values) == "LIDER"
+        assert parser._parse_date(values) == datetime(2026, 1, 5, 10, 0)
+        assert parser._parse_amount(values) == Decimal("1000")
+        assert parser._parse_account(values) == "1234"
+
+    def test_tipo_respeta_orden_de_patrones(self, parser):
+        """Si el asunto calza con dos tipos, gana el primero de SUBJECT_PATTERNS"""
+        assert parser._detect_type("abono en tu cuenta - cargo en cuenta") == TransactionType.COMPRA
+        assert parser._detect_type("giro con tarjeta de débito") == TransactionType.GIRO
+        assert parser._detect_type("cartola cuenta corriente") is None
@@ -0,0 +1,35 @@
+import pickle
+import pytest
+from decimal import Decimal
+from app.parsers.base import Transaction
+
+
+class TestTransaction:
+    """Tests para la representación compacta y la serialización de Transaction"""
+
+    @pytest.mark.parametrize("amount", [5390, Decimal("12.50")])
+    def test_ida_y_vuelta(self, amount, make_transaction):
+        transaction = make_transaction(amount=amount, email_id="1", raw_data={'subject': 'x'})
+        copy = Transaction.from_dict(transaction.to_dict())
+        assert copy.to_dict() == transaction.to_dict()
+        assert type(copy.amount) is type(amount)
+
+    def test_slots(self, make_transaction):
+        """Sin __dict__ por instancia y raw_data vacío no se guarda"""
+        transaction = make_transaction()
+        assert not hasattr(transaction, '__dict__')
+        assert transaction._raw_data is None
+        transaction.raw_data['subject'] = 'Cargo en Cuenta'
+        assert transaction.raw_data == {'subject': 'Cargo en Cuenta'}
+
+    def test_interning(self, make_transaction):
+        """Los textos repetidos se comparten entre transacciones"""
+        a = make_transaction(merchant="".join(["HIPER ", "LIDER"]))
+        b = make_transaction(merchant="".join(["HIPER ", "LI", "DER"]))
+        assert a.merchant is b.merchant
+        assert a.description is b.description
+
+    def test_pickle(self, make_transaction):
+        """Se puede enviar a otro proceso (parse_batch)"""
+        transaction = make_transaction(raw_data={'subject': 'x'})
+        assert pickle.loads(pickle.dumps(transaction)).to_dict() == transaction.to_dict()
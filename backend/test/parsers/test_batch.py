@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.batch import BatchResult, parse_batch
+from app.parsers.registry import ParserRegistry
+from app.email.connection import EmailMessage
+
+
+class FailingParser(BancoChileParser):
+    """Falla con los emails cuyo asunto pide fallar"""
+
+    def parse(self, email_message):
+        if "falla" in email_message.subject:
+            raise RuntimeError("email corrupto")
+        return super().parse(email_message)
+
+
+def failing_registry() -> ParserRegistry:
+    return ParserRegistry([FailingParser()])
+
+
+def make_email(i: int, subject: str = "Cargo en Cuenta") -> EmailMessage:
+    return EmailMessage(
+        uid=str(i),
+        subject=subject,
+        sender="Banco de Chile <enviodigital@bancochile.cl>",
+        date=datetime(2025, 12, 18, 22, 0, 26),
+        body_html=f"""
+        <p>Te informamos que se ha realizado una compra por ${i + 1}
+        con cargo a Cuenta ****3204 en COMERCIO {i} el 18/12/2025 19:00.</p>
+        """,
+        body_text="",
+        raw_email=b"x" * 1000
+    )
+
+
+class TestParseBatch:
+    """Tests para el parseo en lote con pool de procesos"""
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_orden(self, workers):
+        """Los resultados vuelven en el orden de entrada"""
+        emails = [make_email(i) for i in range(20)]
+        results = parse_batch(emails, workers=workers, chunk_size=3)
+
+        assert [r.index for r in results] == list(range(20))
+        assert [r.email_id for r in results] == [str(i) for i in range(20)]
+        assert all(r.ok for r in results)
+        assert [r.transaction.amount for r in results] == [Decimal(i + 1) for i in range(20)]
+        assert results[7].transaction.merchant == "COMERCIO 7"
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_errores_por_email(self, workers):
+        """Un email que falla no corta el lote"""
+        emails = [make_email(0), make_email(1, subject="Cargo en Cuenta falla"), make_email(2)]
+        results = parse_batch(emails, workers=workers, registry_factory=failing_registry)
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert results[1] == BatchResult(index=1, email_id="1", error="RuntimeError: email corrupto")
+        assert results[2].transaction.amount == Decimal(3)
+
+    def test_lote_vacio(self):
+        assert parse_batch([], workers=4) == []
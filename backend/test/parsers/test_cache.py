@@ -0,0 +1,132 @@
+import sqlite3
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.cache import ParseCache
+from app.parsers.registry import ParserRegistry
+from app.email.connection import EmailMessage
+
+
+def make_email(uid="758", subject="Cargo en Cuenta", amount="$5.390") -> EmailMessage:
+    return EmailMessage(
+        uid=uid,
+        subject=subject,
+        sender="Banco de Chile <enviodigital@bancochile.cl>",
+        date=datetime(2025, 12, 18, 22, 0, 26),
+        body_html=f"""
+        <p>Te informamos que se ha realizado una compra por {amount}
+        con cargo a Cuenta ****3204 en HIPER VINA CENTRO el 18/12/2025 19:00.</p>
+        """,
+        body_text="",
+        raw_email=b""
+    )
+
+
+class CountingParser(BancoChileParser):
+    """Cuenta las llamadas a parse para verificar los hits del cache"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def parse(self, email_message):
+        self.calls += 1
+        return super().parse(email_message)
+
+
+class TestParseCache:
+    """Tests para el cache de resultados de parseo"""
+
+    @pytest.fixture
+    def parser(self):
+        return CountingParser()
+
+    def test_hit_en_memoria(self, parser):
+        """El mismo contenido con otro UID no se vuelve a parsear"""
+        cache = ParseCache()
+        first = cache.parse(parser, make_email(uid="1"))
+        second = cache.parse(parser, make_email(uid="2"))
+
+        assert parser.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert second.amount == first.amount == Decimal("5390")
+        # Cada llamada recibe su copia con el UID del email actual
+        assert second is not first
+        assert (first.email_id, second.email_id) == ("1", "2")
+
+    def test_guarda_none(self, parser):
+        """Los emails descartados también se guardan"""
+        cache = ParseCache()
+        email = make_email(subject="Cartola Cuenta Corriente")
+        assert cache.parse(parser, email) is None
+        assert cache.parse(parser, email) is None
+        assert parser.calls == 1
+
+    def test_lru(self, parser):
+        """Se desaloja el resultado menos usado al superar max_entries"""
+        cache = ParseCache(max_entries=2)
+        a, b, c = (make_email(amount=amount) for amount in ("$1", "$2", "$3"))
+        cache.parse(parser, a)
+        cache.parse(parser, b)
+        cache.parse(parser, a)
+        cache.parse(parser, c)
+
+        assert len(cache) == 2
+        assert cache.get(cache.key(parser, b)) == (False, None)
+        assert cache.get(cache.key(parser, a))[0]
+
+    def test_version_invalida(self, parser):
+        """Otra versión del parser no usa los resultados anteriores"""
+        cache = ParseCache()
+        cache.parse(parser, make_email())
+
+        parser.VERSION = BancoChileParser.VERSION + 1
+        cache.parse(parser, make_email())
+        assert parser.calls == 2
+
+    def test_sqlite(self, parser, tmp_path):
+        """El nivel en disco sobrevive a un cache nuevo y prune borra versiones viejas"""
+        path = str(tmp_path / "parse_cache.db")
+        cache = ParseCache(path=path)
+        cache.parse(parser, make_email())
+        cache.parse(parser, make_email(subject="Cartola Cuenta Corriente"))
+        cache.close()
+
+        cache = ParseCache(path=path)
+        assert cache.parse(parser, make_email(uid="9")).email_id == "9"
+        assert cache.parse(parser, make_email(subject="Cartola Cuenta Corriente")) is None
+        assert parser.calls == 2
+
+        parser.VERSION = BancoChileParser.VERSION + 1
+        assert cache.prune(parser) == 2
+        cache.close()
+
+    def test_commit_por_lotes(self, parser, tmp_path):
+        """Las escrituras a disco se confirman cada commit_every resultados o en flush"""
+        path = str(tmp_path / "parse_cache.db")
+        cache = ParseCache(path=path, commit_every=3)
+        reader = sqlite3.connect(path)
+
+        def count():
+            return reader.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+
+        for amount in ("$1", "$2"):
+            cache.parse(parser, make_email(amount=amount))
+        assert count() == 0
+        cache.parse(parser, make_email(amount="$3"))
+        assert count() == 3
+        cache.parse(parser, make_email(amount="$4"))
+        cache.flush()
+        assert count() == 4
+        reader.close()
+        cache.close()
+
+    def test_registry(self, parser):
+        """El registry usa el cache si se le pasa uno"""
+        registry = ParserRegistry([parser], cache=ParseCache())
+        registry.parse(make_email(uid="1"))
+        transaction = registry.parse(make_email(uid="2"))
+
+        assert parser.calls == 1
+        assert transaction.email_id == "2"
@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime
+from typing import Optional
+
+from app.email.connection import EmailMessage
+from app.parsers.base import BaseParser, Transaction
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.registry import ParserRegistry, default_registry, sender_address
+from app.testing.corpus import generate_corpus
+from app.testing.imap_server import IMAPServer
+
+
+def build_email(sender: str, subject: str = "Cargo en Cuenta") -> EmailMessage:
+    return EmailMessage(
+        uid="1",
+        subject=subject,
+        sender=sender,
+        date=datetime(2026, 1, 5, 10, 0),
+        body_html="<p>Te informamos que se ha realizado una compra por $1.000 con cargo a Cuenta ****1234 en LIDER el 05/01/2026 10:00.</p>",
+        body_text="",
+        raw_email=b""
+    )
+
+
+class DomainParser(BaseParser):
+    """Parser de prueba que atiende un dominio completo"""
+    SENDER_DOMAINS = ("bancoestado.cl",)
+
+    def can_parse(self, email_message) -> bool:
+        raise AssertionError("No debe llamarse: el despacho es por dominio")
+
+    def parse(self, email_message) -> Optional[Transaction]:
+        return None
+
+
+class CustomParser(BaseParser):
+    """Parser de prueba sin remitentes declarados"""
+
+    def can_parse(self, email_message) -> bool:
+        return "tenpo" in email_message.sender.lower()
+
+    def parse(self, email_message) -> Optional[Transaction]:
+        return None
+
+
+class TestParserRegistry:
+    """Tests del despacho de emails a parsers"""
+
+    @pytest.fixture
+    def registry(self):
+        return ParserRegistry([BancoChileParser(), DomainParser(), CustomParser()])
+
+    def test_sender_address(self):
+        """Debe extraer la dirección del From"""
+        assert sender_address("Banco de Chile <EnvioDigital@BancoChile.cl>") == "enviodigital@bancochile.cl"
+        assert sender_address("") == ""
+
+    def test_despacho_por_direccion(self, registry):
+        parser = registry.get_parser(build_email("Banco de Chile <enviodigital@bancochile.cl>"))
+        assert isinstance(parser, BancoChileParser)
+
+    def test_despacho_por_dominio_y_subdominio(self, registry):
+        assert isinstance(registry.get_parser(build_email("avisos@bancoestado.cl")), DomainParser)
+        assert isinstance(registry.get_parser(build_email("BE <no-reply@mail.bancoestado.cl>")), DomainParser)
+
+    def test_fallback_con_can_parse(self, registry):
+        assert isinstance(registry.get_parser(build_email("Tenpo <hola@tenpo.cl>")), CustomParser)
+        assert registry.get_parser(build_email("otro@ejemplo.cl")) is None
+
+    def test_parse_delega_en_el_parser(self, registry):
+        transaction = registry.parse(build_email("Banco de Chile <enviodigital@bancochile.cl>"))
+        assert transaction.amount == 1000
+        assert transaction.merchant == "LIDER"
+
+    def test_should_fetch(self, registry):
+        """Debe aplicar el should_fetch del parser del remitente"""
+        assert registry.should_fetch(build_email("enviodigital@bancochile.cl"))
+        assert not registry.should_fetch(build_email("enviodigital@bancochile.cl", "Cartola Cuenta Corriente"))
+        assert not registry.should_fetch(build_email("otro@ejemplo.cl"))
+
+    def test_senders_para_search(self, registry):
+        assert registry.senders() == ["enviodigital@bancochile.cl", "@bancoestado.cl"]
+
+    def test_remitente_duplicado(self):
+        """Un remitente no puede quedar en dos parsers"""
+        with pytest.raises(ValueError):
+            ParserRegistry([BancoChileParser(), BancoChileParser()])
+
+    def test_default_registry(self):
+        assert default_registry().senders() == ["enviodigital@bancochile.cl"]
+
+    def test_registry_como_parsers_del_conector(self):
+        """El conector acepta el registry como `parsers` y solo baja los cuerpos que quiere"""
+        registry = default_registry()
+        corpus = generate_corpus(30, seed=3)
+        with IMAPServer(users={"usuario@gmail.com": "secreto"}) as server:
+            for synthetic in corpus:
+                server.deliver(synthetic.raw)
+            with server.connector("usuario@gmail.com", "secreto") as connector:
+                emails = connector.search_emails(registry.senders(), since_date=datetime(2000, 1, 1),
+                                                 parsers=registry)
+
+        assert len(emails) == sum(1 for m in corpus if m.expected is not None)
+        assert all(registry.parse(e) is not None for e in emails)
@@ -7,7 +7,8 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 from app.email.connection import EmailConnector
-from app.parsers.banco_chile import BancoChileParser
+from app.parsers.registry import default_registry
+from app.analytics.frame import TransactionFrame
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -28,36 +29,44 @@ def main():
     # Conectar y buscar emails
     logger.info(f"Conectando a {email_provider}...")
     
+    registry = default_registry()
+    
     with EmailConnector(email_address, email_password, email_provider) as connector:
-        # Buscar emails del Banco de Chile de los últimos 30 días
-        emails = connector.search_emails(
-            sender="enviodigital@bancochile.cl",
-            since_date=datetime.now() - timedelta(days=30)
+        # Buscar emails de todos los bancos soportados de los últimos 30 días
+        # (un solo SEARCH) y parsearlos a medida que se descargan. Con el
+        # registry como parsers solo se bajan los cuerpos que algún parser
+        # quiere según los headers (no las cartolas con PDF)
+        emails = connector.iter_emails(
+            sender=registry.senders(),
+            since_date=datetime.now() - timedelta(days=30),
+            limit=50,
+            parsers=registry,
+            keep_raw=False
         )
         
-        logger.info(f"Encontrados {len(emails)} emails del Banco de Chile")
-        
         # Parsear emails
-        parser = BancoChileParser()
         transactions = []
+        total_emails = 0
         
         for email_msg in emails:
-            if parser.can_parse(email_msg):
-                transaction = parser.parse(email_msg)
-                if transaction:
-                    transactions.append(transaction)
-                    logger.info(f"✓ Parseado: {transaction}")
-                else:
-                    logger.warning(f"✗ No se pudo parsear: {email_msg.subject}")
+            total_emails += 1
+            transaction = registry.parse(email_msg)
+            if transaction:
+                transactions.append(transaction)
+                logger.info(f"✓ Parseado: {transaction}")
+            else:
+                logger.warning(f"✗ No se pudo parsear: {email_msg.subject}")
         
         # Resumen
         logger.info(f"\nResumen:")
-        logger.info(f"- Total emails: {len(emails)}")
+        logger.info(f"- Total emails: {total_emails}")
         logger.info(f"- Transacciones parseadas: {len(transactions)}")
         
         if transactions:
-            total = sum(t.amount for t in transactions)
-            logger.info(f"- Total gastado: ${total:,.0f}")
+            frame = TransactionFrame.from_transactions(transactions)
+            logger.info(f"- Total gastado: ${frame.total():,.0f}")
+            for group in frame.monthly():
+                logger.info(f"  {group.key}: ${group.total:,.0f} ({group.count} transacciones)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import re
+import pytest
+from datetime import datetime
+from app.parsers.banco_chile import BancoChileParser
+from app.parsers.templates import TemplateCache, fingerprint, learn_extractor
+from app.email.connection import EmailMessage
+
+
+COMPRA_HTML = """
+<html>
+<body>
+    <p>Etienne Rojas Calderon:</p>
+    <p>Te informamos que se ha realizado una compra por {amount}
+    con cargo a Cuenta ****{account} en {merchant} el {date}.</p>
+    <img src="https://tracking.bancochile.cl/open.gif?id={tracking}">
+</body>
+</html>
+"""
+
+
+def compra_email(amount="$5.390", account="3204", merchant="HIPER VINA CENTRO",
+                 date="18/12/2025 19:00", tracking="123") -> EmailMessage:
+    return EmailMessage(
+        uid="1",
+        subject="Cargo en Cuenta",
+        sender="Banco de Chile <enviodigital@bancochile.cl>",
+        date=datetime(2025, 12, 18, 22, 0, 26),
+        body_html=COMPRA_HTML.format(
+            amount=amount, account=account, merchant=merchant, date=date, tracking=tracking
+        ),
+        body_text="",
+        raw_email=b""
+    )
+
+
+class TestFingerprint:
+    """Tests para el fingerprint de plantillas"""
+
+    def test_mismo_esqueleto(self):
+        """Emails que solo difieren en texto y dígitos tienen el mismo fingerprint"""
+        a = compra_email().body_html
+        b = compra_email(amount="$30.000", merchant="LIDER", tracking="98765").body_html
+        assert fingerprint(a, 'compra') == fingerprint(b, 'compra')
+
+    def test_distinta_clave_o_estructura(self):
+        """La clave y la estructura del HTML cambian el fingerprint"""
+        html = compra_email().body_html
+        assert fingerprint(html, 'compra') != fingerprint(html, 'giro')
+        assert fingerprint(html) != fingerprint(html.replace('<p>', '<div>'))
+
+
+class TestLearnExtractor:
+    """Tests para el aprendizaje de extractores"""
+
+    def test_aprende_y_extrae(self):
+        """El extractor aprendido corta los campos de otro email de la plantilla"""
+        values = {'amount': '$5.390', 'account': '****3204', 'party': 'HIPER VINA CENTRO',
+                  'date': '18/12/2025 19:00'}
+        extractor = learn_extractor(compra_email().body_html, values)
+        assert extractor is not None
+        assert extractor.names == ('amount', 'account', 'party', 'date')
+
+        other = compra_email(amount="$12.000", account="1111", merchant="UBER *TRIP",
+                             date="01/02/2026 08:30")
+        assert extractor.extract(other.body_html) == {
+            'amount': '$12.000', 'account': '****1111', 'party': 'UBER *TRIP',
+            'date': '01/02/2026 08:30',
+        }
+
+    def test_valor_repetido(self):
+        """Un valor que aparece más de una vez no tiene posición única"""
+        html = compra_email(merchant="HIPER", tracking="HIPER").body_html
+        assert learn_extractor(html, {'party': 'HIPER'}) is None
+
+    def test_valor_ausente(self):
+        """Un valor que no está literal en el HTML (ej: con entidades) no se aprende"""
+        html = compra_email(merchant="H&amp;M").body_html
+        assert learn_extractor(html, {'party': 'H&M'}) is None
+
+
+class TestTemplateCache:
+    """Tests para el cache de plantillas"""
+
+    def test_lru(self):
+        """Al superar el máximo se desaloja la plantilla menos usada"""
+        cache = TemplateCache(max_templates=2)
+        for key in ('a', 'b'):
+            assert cache.learn(compra_email().body_html, {'party': 'HIPER VINA CENTRO'}, key)
+        # Usar 'a' deja a 'b' como la menos reciente
+        assert cache.extract(compra_email().body_html, 'a') is not None
+        cache.learn(compra_email().body_html, {'party': 'HIPER VINA CENTRO'}, 'c')
+
+        assert len(cache) == 2
+        assert cache.extract(compra_email().body_html, 'b') is None
+        assert cache.extract(compra_email().body_html, 'a') is not None
+
+    def test_validadores(self):
+        """Un valor que no pasa el validador es un miss"""
+        cache = TemplateCache(validators={'amount': re.compile(r'\$[\d.]+')})
+        cache.learn(compra_email().body_html, {'amount': '$5.390'})
+
+        assert cache.extract(compra_email(amount="$7.500").body_html) == {'amount': '$7.500'}
+        assert cache.extract(compra_email(amount="USD 7").body_html) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+class TestBancoChileTemplates:
+    """Tests del camino rápido por plantillas en BancoChileParser"""
+
+    @pytest.fixture
+    def parser(self):
+        return BancoChileParser()
+
+    def test_segundo_email_usa_plantilla(self, parser):
+        """El segundo email de la misma plantilla se parsea por slicing"""
+        parser.parse(compra_email())
+        assert (parser.templates.hits, len(parser.templates)) == (0, 1)
+
+        email = compra_email(amount="$12.345", account="9876", merchant="DP     *IKEA.COM",
+                             date="02/01/2026 10:05", tracking="555")
+        result = parser.parse(email)
+        assert parser.templates.hits == 1
+
+        # Mismo resultado que el camino completo
+        parser.templates.clear()
+        expected = parser.parse(email)
+        assert result.to_dict() == expected.to_dict()
+
+    def test_validador_falla_usa_camino_completo(self, parser):
+        """Si el corte no pasa los validadores se usa el camino completo"""
+        parser.parse(compra_email())
+        # El comercio trae un salto de línea: la plantilla corta mal y se descarta
+        result = parser.parse(compra_email(merchant="CASA\nMATRIZ"))
+
+        assert parser.templates.hits == 0
+        assert result.amount == 5390
+
+    def test_cache_desactivado(self):
+        """TEMPLATE_CACHE_SIZE = 0 desactiva el camino rápido"""
+        class SinPlantillas(BancoChileParser):
+            TEMPLATE_CACHE_SIZE = 0
+
+        parser = SinPlantillas()
+        assert parser.templates is None
+        assert parser.parse(compra_email()).merchant == "HIPER VINA CENTRO"
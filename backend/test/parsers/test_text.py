@@ -0,0 +1,83 @@
+import pytest
+
+from app.parsers import text
+from app.parsers.text import extract_text, register_backend, BACKENDS
+
+
+NOTIFICATION = """
+<html>
+<head><title>Aviso</title><style>p { color: red; }</style></head>
+<body>
+    <p>Etienne Rojas Calderon:</p>
+    <p>Te informamos que se ha realizado una compra por $5.390
+    con cargo a Cuenta ****3204 en HIPER VINA CENTRO el 18/12/2025 19:00.</p>
+    <!-- pie -->
+    <p>Revisa Saldos y Movimientos en App Mi Banco o Banco en L&iacute;nea.</p>
+    <script>track();</script>
+</body>
+</html>
+"""
+
+# HTML que libxml2 repara distinto que html.parser
+TRICKY = [
+    "<p>a<!-- c -->b</p>",
+    "texto</html>después",
+    "<head><div>oculto</div></head>visible",
+    "<p>&amp &unknown; 5 < 6</p>",
+    "<style>p{}</style><td>&euro;",
+    "<br>a</br>b",
+    "<![CDATA[x]]><p>y</p>",
+    "<title>fuera</title><p>cuerpo</p>",
+    "<p>sin cerrar <texto",
+]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+class TestExtractText:
+    """Todos los backends deben dar lo mismo que bs4"""
+
+    def test_notificacion(self, backend):
+        assert extract_text(NOTIFICATION, backend=backend) == extract_text(NOTIFICATION, backend='bs4')
+        assert extract_text(NOTIFICATION, backend=backend).startswith("Etienne Rojas Calderon: Te informamos")
+
+    @pytest.mark.parametrize("html", TRICKY)
+    def test_html_irregular(self, backend, html):
+        assert extract_text(html, backend=backend) == extract_text(html, backend='bs4')
+
+    def test_separador(self, backend):
+        assert extract_text("<p>uno</p><p>dos</p>", separator='\n', backend=backend) == "uno\ndos"
+
+    def test_vacio(self, backend):
+        assert extract_text("", backend=backend) == ""
+        assert extract_text(None, backend=backend) == ""
+
+
+class TestFallback:
+    """Tests del encadenamiento de backends"""
+
+    def test_backend_que_falla_usa_el_siguiente(self, monkeypatch):
+        calls = []
+
+        def broken(html):
+            calls.append(html)
+            raise ValueError("no soportado")
+
+        monkeypatch.setitem(text.BACKENDS, 'stream', broken)
+        assert extract_text("<p>hola</p>", backend='stream') == "hola"
+        assert calls == ["<p>hola</p>"]
+
+    def test_register_backend(self, monkeypatch):
+        monkeypatch.setattr(text, 'BACKENDS', dict(text.BACKENDS))
+        register_backend('mayusculas', lambda html: iter([html.upper()]))
+        assert extract_text("abc", backend='mayusculas') == "ABC"
+
+    @pytest.mark.skipif('lxml' not in BACKENDS, reason="lxml no instalado")
+    def test_lxml_no_cae_en_plantillas_simples(self):
+        """Las notificaciones bien formadas no deben pasar al backend lento"""
+        strings = [s.strip() for s in text._lxml_strings(NOTIFICATION) if s.strip()]
+        assert strings[0] == "Etienne Rojas Calderon:"
+
+    @pytest.mark.skipif('lxml' not in BACKENDS, reason="lxml no instalado")
+    def test_lxml_rechaza_html_ambiguo(self):
+        with pytest.raises(ValueError):
+            list(text._lxml_strings("<head><div>oculto</div></head>visible"))
@@ -0,0 +1,57 @@
+import pytest
+
+from app.email.connection import parse_email
+from app.parsers.banco_chile import BancoChileParser
+from app.testing.corpus import DEFAULT_MIX, CorpusGenerator, generate_corpus
+
+
+def actual_fields(transaction):
+    return {
+        'type': transaction.type,
+        'amount': transaction.amount,
+        'last_digits': transaction.last_digits,
+        'merchant': transaction.merchant,
+        'date': transaction.date,
+    }
+
+
+class TestCorpusGenerator:
+    """Tests para el generador de notificaciones sintéticas"""
+
+    def test_same_seed_same_bytes(self):
+        """Con la misma semilla el corpus debe ser idéntico"""
+        first = [m.raw for m in generate_corpus(50, seed=7)]
+        second = [m.raw for m in generate_corpus(50, seed=7)]
+        assert first == second
+        assert first != [m.raw for m in generate_corpus(50, seed=8)]
+
+    def test_dates_are_increasing(self):
+        """Los emails se generan en orden cronológico"""
+        dates = [m.date for m in generate_corpus(200, seed=1)]
+        assert dates == sorted(dates)
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            CorpusGenerator().email('no_existe')
+
+    @pytest.mark.parametrize('kind', list(DEFAULT_MIX))
+    def test_parser_matches_expected(self, kind):
+        """El parser debe obtener exactamente los campos esperados de cada formato"""
+        generator = CorpusGenerator(seed=3)
+        parser = BancoChileParser()
+        for i in range(20):
+            synthetic = generator.email(kind)
+            message = parse_email(str(i), synthetic.raw)
+            transaction = parser.parse(message) if parser.can_parse(message) else None
+            if synthetic.expected is None:
+                assert transaction is None
+            else:
+                assert transaction is not None
+                assert actual_fields(transaction) == synthetic.expected
+
+    def test_cartola_has_attachments(self):
+        """Las cartolas traen imagen y PDF además del HTML"""
+        synthetic = CorpusGenerator(seed=0).email('cartola')
+        assert b'application/pdf' in synthetic.raw
+        assert b'image/png' in synthetic.raw
+        assert len(synthetic.raw) > 40_000
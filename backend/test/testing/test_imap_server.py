@@ -0,0 +1,120 @@
+import imaplib
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.parsers.registry import default_registry
+from app.testing.corpus import CorpusGenerator, generate_corpus
+from app.testing.imap_server import IMAPServer
+
+BANK = "enviodigital@bancochile.cl"
+
+
+@pytest.fixture
+def corpus():
+    return generate_corpus(120, seed=5)
+
+
+@pytest.fixture
+def server(corpus):
+    with IMAPServer(users={"usuario@gmail.com": "secreto"}) as server:
+        for synthetic in corpus:
+            server.deliver(synthetic.raw)
+        yield server
+
+
+def expected_transactions(corpus):
+    return [m.expected for m in corpus if m.expected is not None]
+
+
+class TestIMAPServer:
+    """Tests del servidor IMAP local con imaplib y EmailConnector reales"""
+
+    def test_login_failure(self, server):
+        """Credenciales inválidas deben fallar el connect"""
+        connector = server.connector("usuario@gmail.com", "otra")
+        with pytest.raises(imaplib.IMAP4.error):
+            connector.connect()
+
+    def test_search_and_fetch(self, server, corpus):
+        """UID SEARCH y UID FETCH deben devolver los emails del banco"""
+        client = imaplib.IMAP4(*server.address)
+        client.login("usuario@gmail.com", "secreto")
+        client.select("INBOX")
+        typ, data = client.uid('SEARCH', None, f'(FROM "{BANK}")')
+        uids = data[0].split()
+        assert typ == 'OK'
+        assert len(uids) == sum(1 for m in corpus if BANK in m.sender)
+
+        typ, data = client.uid('FETCH', uids[0], '(RFC822)')
+        assert data[0][1] == corpus[int(uids[0]) - 1].raw
+        client.logout()
+
+    def test_uid_range_includes_last(self, server, corpus):
+        """"n:*" con n mayor al último UID debe incluir el último (RFC 3501)"""
+        client = imaplib.IMAP4(*server.address)
+        client.login("usuario@gmail.com", "secreto")
+        client.select("INBOX")
+        _, data = client.uid('SEARCH', None, f'UID {len(corpus) + 10}:*')
+        assert data[0].split() == [str(len(corpus)).encode()]
+        client.logout()
+
+    @pytest.mark.parametrize('partial_fetch', [False, True])
+    def test_sync_parses_corpus(self, server, corpus, partial_fetch):
+        """La sincronización completa debe parsear todas las transacciones esperadas"""
+        registry = default_registry()
+        with server.connector("usuario@gmail.com", "secreto", partial_fetch=partial_fetch) as connector:
+            emails = connector.sync_emails(BANK, since_date=datetime(2000, 1, 1))
+            transactions = [t for t in (registry.parse(e) for e in emails) if t]
+            assert len(transactions) == len(expected_transactions(corpus))
+            assert [t.amount for t in transactions] == [e['amount'] for e in expected_transactions(corpus)]
+
+            # Sin emails nuevos la sincronización incremental no trae nada
+            assert connector.sync_emails(BANK) == []
+            uid = server.deliver(CorpusGenerator(seed=99).email('cargo_cuenta').raw)
+            assert [e.uid for e in connector.sync_emails(BANK)] == [str(uid)]
+
+    def test_partial_fetch_skips_attachments(self, server):
+        """Con BODYSTRUCTURE solo se descarga el HTML de la cartola, no el PDF"""
+        synthetic = CorpusGenerator(seed=1).email('cartola')
+        uid = server.deliver(synthetic.raw)
+        with server.connector("usuario@gmail.com", "secreto", partial_fetch=True) as connector:
+            emails = connector.sync_emails(BANK, since_date=datetime(2000, 1, 1))
+        cartola = next(e for e in emails if e.uid == str(uid))
+        assert cartola.body_html
+        assert cartola.raw_email == b""
+
+    def test_watch_receives_delivered_email(self, server):
+        """Un email entregado durante IDLE debe llegar al handler"""
+        received = []
+        stop = threading.Event()
+        delivered = threading.Event()
+
+        def handler(message):
+            received.append(message)
+            stop.set()
+
+        connector = server.connector("usuario@gmail.com", "secreto")
+        watcher = threading.Thread(
+            target=connector.watch,
+            args=(BANK, handler),
+            kwargs={'stop_event': stop, 'catch_up': False},
+        )
+        original_idle = connector._idle
+
+        def idle(timeout, stop_event):
+            delivered.set()
+            return original_idle(timeout, stop_event)
+
+        connector._idle = idle
+        watcher.start()
+        assert delivered.wait(5)
+        uid = server.deliver(CorpusGenerator(seed=42).email('cargo_cuenta').raw)
+        watcher.join(5)
+        stop.set()
+        watcher.join(5)
+        connector.disconnect()
+
+        assert not watcher.is_alive()
+        assert [m.uid for m in received] == [str(uid)]